@@ -9,8 +9,10 @@ import os
 import re
 import subprocess
 import sys
+import threading
 import time
 import traceback
+from contextlib import nullcontext
 from typing import Optional, Dict, Any
 from datetime import datetime
 
@@ -20,6 +22,9 @@ from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel, Field
 import logging
 from utils.call_mobile_agent_e import GUIOwlWrapper
+from utils.device_session import get_device_session, session_stats
+from utils.llm_clients import client_stats
+from utils.endpoint_group import endpoint_group_stats
 
 # 配置日志
 logging.basicConfig(
@@ -115,7 +120,7 @@ class MobileAgentRequest(BaseModel):
     base_url: str = Field(
         default="http://10.142.18.204:8006/v1",
         title="API Base URL",
-        description="LLM API 的基础 URL"
+        description="LLM API 的基础 URL，多个服务副本用逗号分隔，请求在副本间负载均衡"
     )
     model: str = Field(
         default="owl32b",
@@ -146,6 +151,11 @@ class MobileAgentRequest(BaseModel):
         title="请求 ID",
         description="请求的唯一标识符"
     )
+    in_process: bool = Field(
+        default=False,
+        title="进程内执行",
+        description="在服务进程内执行任务，复用缓存的设备会话（uiautomator2 连接、输入法状态），省去每个任务的冷启动握手"
+    )
 
 
 class MobileAgentResponse(BaseModel):
@@ -266,6 +276,7 @@ async def summarize_clipboard_content(
     
     def _call_llm():
         try:
+            # 包装器很轻量，底层客户端和连接池按 (base_url, api_key) 在进程内共享
             bot = GUIOwlWrapper(api_key=api_key, base_url=base_url, model_name=model)
             text, _, _ = bot.predict_mm("", [], messages=prompt_messages)
             return text
@@ -350,7 +361,8 @@ async def execute_mobile_agent(
         "--base_url", base_url,
         "--model", model,
         "--instruction", instruction,
-        "--add_info", add_info
+        "--add_info", add_info,
+        "--time_budget", str(timeout)
     ]
     
     logger.info(f"执行命令: {' '.join(cmd)}")
@@ -422,6 +434,51 @@ async def execute_mobile_agent(
         raise
 
 
+async def execute_mobile_agent_in_process(
+    adb_path: str,
+    api_key: str,
+    base_url: str,
+    model: str,
+    instruction: str,
+    add_info: str,
+    timeout: int
+) -> Optional[Dict[str, Any]]:
+    """
+    在服务进程内执行 Mobile Agent 任务
+    设备会话（uiautomator2 连接、输入法状态、设备序列号）在进程内缓存，跨任务复用；
+    同一设备上的任务串行执行
+    
+    Returns:
+        任务结果（task_result.json 的内容），未产生结果时返回 None
+    """
+    from run_mobileagentv3 import run_instruction
+    
+    stop_event = threading.Event()
+    deadline = time.time() + timeout
+    
+    def _run():
+        session = get_device_session(adb_path)
+        with (session.task_lock if session is not None else nullcontext()):
+            if stop_event.is_set():
+                return None
+            return run_instruction(
+                adb_path, None, api_key, base_url, model, instruction, add_info,
+                "abs", False, stop_event=stop_event,
+                time_budget=max(1.0, deadline - time.time())
+            )
+    
+    logger.info("="*80)
+    logger.info("开始执行任务（进程内模式）")
+    logger.info("="*80)
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(_run), timeout=timeout)
+    except asyncio.TimeoutError:
+        # 线程无法强制终止，通知任务在下一步开始前退出
+        stop_event.set()
+        logger.warning(f"任务执行超时（{timeout}秒），已通知任务停止")
+        raise TimeoutError(f"任务执行超时（{timeout}秒）")
+
+
 @app.post(
     "/mobile_agent/execute",
     summary="执行移动设备自动化任务",
@@ -448,32 +505,47 @@ async def execute_task(request: MobileAgentRequest):
     logger.info("="*80)
     
     try:
-        # 执行任务
-        stdout, stderr, returncode = await execute_mobile_agent(
-            adb_path=request.adb_path,
-            api_key=request.api_key,
-            base_url=request.base_url,
-            model=request.model,
-            instruction=request.instruction,
-            add_info=request.add_info,
-            timeout=request.timeout
-        )
-        
-        execution_time = time.time() - start_time
-        
-        # 检查返回码
-        if returncode != 0:
-            logger.error(f"任务执行失败，返回码: {returncode}")
-            logger.error(f"stderr: {stderr}")
-            return ExecutionErrorResponse(f"返回码: {returncode}, stderr: {stderr[:500]}")
-        
-        # 解析粘贴板内容
-        clipboard_content = parse_clipboard_content(stdout)
-        
-        if clipboard_content is None:
-            logger.warning("未能从输出中解析到粘贴板内容")
-            # 尝试从 stderr 中查找
-            clipboard_content = parse_clipboard_content(stderr)
+        if request.in_process:
+            # 进程内执行，直接使用任务返回的结果
+            task_result = await execute_mobile_agent_in_process(
+                adb_path=request.adb_path,
+                api_key=request.api_key,
+                base_url=request.base_url,
+                model=request.model,
+                instruction=request.instruction,
+                add_info=request.add_info,
+                timeout=request.timeout
+            )
+            execution_time = time.time() - start_time
+            stdout = ""
+            clipboard_content = task_result.get("clipboard_content") if task_result else None
+        else:
+            # 执行任务
+            stdout, stderr, returncode = await execute_mobile_agent(
+                adb_path=request.adb_path,
+                api_key=request.api_key,
+                base_url=request.base_url,
+                model=request.model,
+                instruction=request.instruction,
+                add_info=request.add_info,
+                timeout=request.timeout
+            )
+            
+            execution_time = time.time() - start_time
+            
+            # 检查返回码
+            if returncode != 0:
+                logger.error(f"任务执行失败，返回码: {returncode}")
+                logger.error(f"stderr: {stderr}")
+                return ExecutionErrorResponse(f"返回码: {returncode}, stderr: {stderr[:500]}")
+            
+            # 解析粘贴板内容
+            clipboard_content = parse_clipboard_content(stdout)
+            
+            if clipboard_content is None:
+                logger.warning("未能从输出中解析到粘贴板内容")
+                # 尝试从 stderr 中查找
+                clipboard_content = parse_clipboard_content(stderr)
         
         # 准备返回数据
         response_data = {
@@ -553,6 +625,18 @@ async def health_check():
     )
 
 
+@app.get("/device_sessions", summary="设备会话", description="查看进程内缓存的设备会话状态")
+async def device_sessions():
+    """设备会话状态接口"""
+    return {"sessions": session_stats()}
+
+
+@app.get("/llm_clients", summary="模型客户端", description="查看进程内共享的模型客户端连接池状态")
+async def llm_clients():
+    """模型客户端连接池状态接口"""
+    return {"clients": client_stats(), "endpoint_groups": endpoint_group_stats()}
+
+
 @app.get("/", summary="API 信息", description="获取 API 基本信息")
 async def root():
     """根路径，返回 API 信息"""
@@ -563,6 +647,8 @@ async def root():
         "endpoints": {
             "execute": "/mobile_agent/execute",
             "health": "/health",
+            "device_sessions": "/device_sessions",
+            "llm_clients": "/llm_clients",
             "docs": "/docs",
             "redoc": "/redoc"
         }
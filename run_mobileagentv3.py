@@ -4,8 +4,8 @@ import json
 import time
 import argparse
 import ast
-from PIL import Image
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.mobile_agent_e import (
     InfoPool, 
@@ -16,20 +16,40 @@ from utils.mobile_agent_e import (
     INPUT_KNOW
 )
 import utils.controller as controller
-from utils.call_mobile_agent_e import GUIOwlWrapper
+from utils.call_mobile_agent_e import GUIOwlWrapper, LOSSY_ROLE_CODECS
+from utils.screen_settle import wait_for_stable_screen
+from utils.settle_model import SettleTimeModel, normalize_action, LAUNCH_ACTION
+from utils.frame_diff import NoChangeDetector, reflector_crop_inputs
 
-def run_instruction(adb_path, hdc_path, api_key, base_url, model, instruction, add_info, coor_type, if_notetaker, max_step=25, log_path="./logs"):
+def run_instruction(adb_path, hdc_path, api_key, base_url, model, instruction, add_info, coor_type, if_notetaker, max_step=25, log_path="./logs", screenshot_mode="u2", frame_stream=False, save_screenshots=True, stop_event=None, settle_mode="detect", settle_wait=(0.3, 3.0), first_step_settle_wait=(1.0, 10.0), settle_stats_path=None, skip_reflector_on_no_change=True, no_change_thresholds=(0, 0.0005), no_change_audit=True, reflector_input="full", ui_quiet_ms=300, image_codec=None, role_codecs=None, token_budgets=None, time_budget=None, stream_roles=(), role_max_tokens=None, speculative=False, prompt_layout="legacy", routing="least_outstanding", sticky=False):
     if adb_path and hdc_path:
         raise ValueError("adb_path and hdc_path cannot be provided at the same time. Please specify only one of them.")
     if adb_path:
         from utils.android_controller import AndroidController
-        controller = AndroidController(adb_path)
+        controller = AndroidController(adb_path, screenshot_mode=screenshot_mode)
+        if frame_stream:
+            controller.start_frame_stream()
     else:
         from utils.harmonyos_controller import HarmonyOSController
         controller = HarmonyOSController(hdc_path)
 
     if not os.path.exists(log_path):
         os.makedirs(log_path, exist_ok=True)
+
+    if settle_mode == "events":
+        # 订阅无障碍事件流；设备不支持时回退到截图轮询
+        if not (hasattr(controller, "start_ui_events") and controller.start_ui_events()):
+            print("UI event listener unavailable, fallback to settle_mode 'detect'")
+            settle_mode = "detect"
+
+    settle_model = None
+    current_package = None
+    if settle_mode in ("detect", "events"):
+        # 按 (前台应用, 动作类型) 学习界面稳定时间，跨任务持久化
+        settle_model = SettleTimeModel(settle_stats_path or os.path.join(log_path, "settle_stats.json"))
+        # open_app 只等待应用进入前台，界面稳定由主循环检测
+        controller.launch_settle = False
+        current_package = controller.get_foreground_package()
     
     now = datetime.now()
     time_str = now.strftime("%Y%m%d_%H%M%S")
@@ -54,7 +74,18 @@ def run_instruction(adb_path, hdc_path, api_key, base_url, model, instruction, a
         err_to_manager_thresh=2
     )
     
-    vllm = GUIOwlWrapper(api_key, base_url, model)
+    vllm = GUIOwlWrapper(api_key, base_url, model, codec=image_codec, role_codecs=role_codecs, role_token_budgets=token_budgets,
+                         stream_roles=stream_roles, role_max_tokens=role_max_tokens, routing=routing, sticky=sticky)
+    # LLM 重试不超过任务剩余时间
+    vllm.set_time_budget(time_budget)
+    no_change_detector = None
+    if skip_reflector_on_no_change:
+        # 操作前后截图实质相同时直接记为 C，跳过 Reflector 调用
+        no_change_detector = NoChangeDetector(
+            hash_threshold=no_change_thresholds[0],
+            changed_ratio_threshold=no_change_thresholds[1],
+            audit_path=os.path.join(save_path, "no_change_audit.jsonl") if no_change_audit else None,
+        )
     manager = Manager()
     executor = Executor()
     notetaker = Notetaker()
@@ -62,338 +93,491 @@ def run_instruction(adb_path, hdc_path, api_key, base_url, model, instruction, a
     message_manager, message_operator, message_reflector, message_notekeeper = None, None, None, None
     info_pool.instruction = instruction
 
-    for step in range(max_step):
-        if step == max_step:
-            task_result_path = os.path.join(save_path, "task_result.json")
-            current_time = datetime.now()
-            formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-            task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 1.0}
-            with open(task_result_path, 'w', encoding='utf-8') as json_file:
-                json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
-            break
-        
-        if step == 0:
-            current_time = datetime.now()
-            formatted_time = current_time.strftime(f'%Y-%m-%d-{current_time.hour * 3600 + current_time.minute * 60 + current_time.second}-{str(uuid.uuid4().hex[:8])}')
-            local_image_dir = os.path.join(image_save_path, f"screenshot_{formatted_time}.png")
-        else:
-            local_image_dir = local_image_dir2
+    # Manager 与 Executor 的推测并行执行
+    speculative_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SpeculativeExecutor") if speculative else None
+    speculation_stats = {"attempted": 0, "hits": 0, "misses": 0, "wasted_calls": 0, "cancelled": 0, "skipped_busy": 0}
+    # 被丢弃但已在执行的推测调用；它占用着唯一的工作线程，完成前不再发起新的推测
+    stale_speculation = None
+
+    def discard_speculation(future):
+        """丢弃推测结果：尚未开始的直接取消；已在执行的无法中断，返回该 future 以便等待其结束"""
+        if future.cancel():
+            speculation_stats["cancelled"] += 1
+            return None
+        speculation_stats["wasted_calls"] += 1
+        return future
+
+    def agent_request(agent, images):
+        """
+        构造 predict_mm 的 (text_prompt, images, messages) 参数
+        cached 布局：角色固定内容作为 system 消息在最前，随后是任务内容、步骤内容，图像放在最后，便于服务端前缀缓存复用
+        """
+        if prompt_layout == "cached":
+            return "", [], agent.get_messages(info_pool, images)
+        return agent.get_prompt(info_pool), images, None
+
+    task_result_data = None
+    try:
+        for step in range(max_step):
+            if stop_event is not None and stop_event.is_set():
+                print("Stop requested, abort the task.")
+                break
+            if step == max_step:
+                task_result_path = os.path.join(save_path, "task_result.json")
+                current_time = datetime.now()
+                formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
+                task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 1.0}
+                with open(task_result_path, 'w', encoding='utf-8') as json_file:
+                    json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
+                break
         
-        # get the screenshot
-        for _ in range(5):
-            if not controller.get_screenshot(local_image_dir):
-                print("Get screenshot failed, retry.")
-                time.sleep(5)
+            if step == 0:
+                current_time = datetime.now()
+                formatted_time = current_time.strftime(f'%Y-%m-%d-{current_time.hour * 3600 + current_time.minute * 60 + current_time.second}-{str(uuid.uuid4().hex[:8])}')
+                local_image_dir = os.path.join(image_save_path, f"screenshot_{formatted_time}.png")
             else:
-                break
+                local_image_dir = local_image_dir2
         
-        width, height = Image.open(local_image_dir).size
+            # get the screenshot
+            for _ in range(5):
+                screen = controller.capture()
+                if screen is None:
+                    print("Get screenshot failed, retry.")
+                    time.sleep(5)
+                else:
+                    break
+            if save_screenshots:
+                screen.save_async(local_image_dir)
         
-        info_pool.error_flag_plan = False
-        err_to_manager_thresh = info_pool.err_to_manager_thresh
-        if len(info_pool.action_outcomes) >= err_to_manager_thresh:
-            # check if the last err_to_manager_thresh actions are all errors
-            latest_outcomes = info_pool.action_outcomes[-err_to_manager_thresh:]
-            count = 0
-            for outcome in latest_outcomes:
-                if outcome in ["B", "C"]:
-                    count += 1
-            if count == err_to_manager_thresh:
-                info_pool.error_flag_plan = True
+            width, height = screen.size
+        
+            info_pool.error_flag_plan = False
+            err_to_manager_thresh = info_pool.err_to_manager_thresh
+            if len(info_pool.action_outcomes) >= err_to_manager_thresh:
+                # check if the last err_to_manager_thresh actions are all errors
+                latest_outcomes = info_pool.action_outcomes[-err_to_manager_thresh:]
+                count = 0
+                for outcome in latest_outcomes:
+                    if outcome in ["B", "C"]:
+                        count += 1
+                if count == err_to_manager_thresh:
+                    info_pool.error_flag_plan = True
 
-        skip_manager = False
-        ## if previous action is invalid, skip the manager and try again first ##
-        if not info_pool.error_flag_plan and len(info_pool.action_history) > 0:
-            if info_pool.action_history[-1]['action'] == 'invalid':
-                skip_manager = True
+            skip_manager = False
+            ## if previous action is invalid, skip the manager and try again first ##
+            if not info_pool.error_flag_plan and len(info_pool.action_history) > 0:
+                if info_pool.action_history[-1]['action'] == 'invalid':
+                    skip_manager = True
         
-        if not skip_manager:
-            print("\n### Manager ... ###\n")
-            prompt_planning = manager.get_prompt(info_pool)
-            output_planning, message_manager, raw_response = vllm.predict_mm(
-                prompt_planning,
-                [local_image_dir]
-            )
+            speculative_future = None
+            if not skip_manager:
+                if stale_speculation is not None and stale_speculation.done():
+                    stale_speculation = None
+                if speculative_executor is not None and info_pool.plan and stale_speculation is not None:
+                    # 新的推测会排在过期请求之后，既拿不到加速又增加服务端负载
+                    speculation_stats["skipped_busy"] += 1
+                    print("[SPECULATION] previous discarded speculation still running, skip speculating this step")
+                elif speculative_executor is not None and info_pool.plan:
+                    # 用当前计划在后台先跑 Executor；Manager 给出的计划不变时直接采用其结果
+                    speculative_prompt = executor.get_prompt(info_pool)
+                    speculative_future = speculative_executor.submit(
+                        vllm.predict_mm, *agent_request(executor, [screen]), role="executor"
+                    )
+                    speculation_stats["attempted"] += 1
+                print("\n### Manager ... ###\n")
+                output_planning, message_manager, raw_response = vllm.predict_mm(
+                    *agent_request(manager, [screen]),
+                    role="manager",
+                )
         
-        message_save_path = os.path.join(save_path, f"step_{step+1}")
-        os.makedirs(message_save_path, exist_ok=True)
-        message_file = os.path.join(message_save_path, "manager.json")
-        message_data = {"name": "manager", "messages": message_manager, "response": output_planning, "step_id": step+1}
-        with open(message_file, 'w', encoding='utf-8') as json_file:
-            json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+            message_save_path = os.path.join(save_path, f"step_{step+1}")
+            os.makedirs(message_save_path, exist_ok=True)
+            message_file = os.path.join(message_save_path, "manager.json")
+            message_data = {"name": "manager", "messages": message_manager, "response": output_planning, "step_id": step+1}
+            with open(message_file, 'w', encoding='utf-8') as json_file:
+                json.dump(message_data, json_file, ensure_ascii=False, indent=4)
 
-        parsed_result_planning = manager.parse_response(output_planning)
-        info_pool.completed_plan = parsed_result_planning['completed_subgoal']
-        info_pool.plan = parsed_result_planning['plan']
-        if not raw_response:
-            raise RuntimeError('Error calling vLLM in planning phase.')
+            parsed_result_planning = manager.parse_response(output_planning)
+            info_pool.completed_plan = parsed_result_planning['completed_subgoal']
+            info_pool.plan = parsed_result_planning['plan']
+            if not raw_response:
+                raise RuntimeError('Error calling vLLM in planning phase.')
         
-        print('Completed subgoal: ' + info_pool.completed_plan)
-        print('Planning thought: ' + parsed_result_planning['thought'])
-        print('Plan: ' + info_pool.plan, "\n")
+            print('Completed subgoal: ' + info_pool.completed_plan)
+            print('Planning thought: ' + parsed_result_planning['thought'])
+            print('Plan: ' + info_pool.plan, "\n")
         
-        if "Finished" in info_pool.plan.strip() and len(info_pool.plan.strip()) < 15:
-            print("Instruction finished, stop the process.")
-            task_result_path = os.path.join(save_path, "task_result.json")
-            current_time = datetime.now()
-            formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-            task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 0.0}
-            with open(task_result_path, 'w', encoding='utf-8') as json_file:
-                json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
-            break
-        else:
-            print("\n### Operator ... ###\n")
+            if "Finished" in info_pool.plan.strip() and len(info_pool.plan.strip()) < 15:
+                if speculative_future is not None:
+                    discard_speculation(speculative_future)
+                print("Instruction finished, stop the process.")
+                task_result_path = os.path.join(save_path, "task_result.json")
+                current_time = datetime.now()
+                formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
+                task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 0.0}
+                with open(task_result_path, 'w', encoding='utf-8') as json_file:
+                    json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
+                break
+            else:
+                print("\n### Operator ... ###\n")
 
-            prompt_action = executor.get_prompt(info_pool)
-            output_action, message_operator, raw_response = vllm.predict_mm(
-                prompt_action,
-                [local_image_dir],
-            )
+                prompt_action = executor.get_prompt(info_pool)
+                speculative_result = None
+                if speculative_future is not None:
+                    if prompt_action == speculative_prompt:
+                        speculative_result = speculative_future.result()
+                        if speculative_result[2]:
+                            speculation_stats["hits"] += 1
+                            print("[SPECULATION] plan unchanged, use the speculative executor result")
+                        else:
+                            speculation_stats["wasted_calls"] += 1
+                            speculative_result = None
+                    else:
+                        speculation_stats["misses"] += 1
+                        stale_speculation = discard_speculation(speculative_future)
+                        print("[SPECULATION] plan changed, discard the speculative executor result")
+                if speculative_result is not None:
+                    output_action, message_operator, raw_response = speculative_result
+                else:
+                    output_action, message_operator, raw_response = vllm.predict_mm(
+                        *agent_request(executor, [screen]),
+                        role="executor",
+                    )
+                # 模型看到的截图相对屏幕的缩放比例（设置了视觉 token 预算时不为 1）
+                executor_scale = vllm.input_scale(screen, role="executor")
             
-            if not raw_response:
-                raise RuntimeError('Error calling LLM in operator phase.')
-            parsed_result_action = executor.parse_response(output_action)
-            action_thought, action_object_str, action_description = parsed_result_action['thought'], parsed_result_action['action'], parsed_result_action['description']
+                if not raw_response:
+                    raise RuntimeError('Error calling LLM in operator phase.')
+                parsed_result_action = executor.parse_response(output_action)
+                action_thought, action_object_str, action_description = parsed_result_action['thought'], parsed_result_action['action'], parsed_result_action['description']
             
-            info_pool.last_action_thought = action_thought
-            info_pool.last_summary = action_description
+                info_pool.last_action_thought = action_thought
+                info_pool.last_summary = action_description
             
-            if (not action_thought) or (not action_object_str):
-                print('Action prompt output is not in the correct format.')
-                info_pool.last_action = {"action": "invalid"}
-                info_pool.action_history.append({"action": "invalid"})
-                info_pool.summary_history.append(action_description)
-                info_pool.action_outcomes.append("C")
-                info_pool.error_descriptions.append("invalid action format, do nothing.")
-                continue
+                if (not action_thought) or (not action_object_str):
+                    print('Action prompt output is not in the correct format.')
+                    info_pool.last_action = {"action": "invalid"}
+                    info_pool.action_history.append({"action": "invalid"})
+                    info_pool.summary_history.append(action_description)
+                    info_pool.action_outcomes.append("C")
+                    info_pool.error_descriptions.append("invalid action format, do nothing.")
+                    continue
         
-        action_object_str = action_object_str.replace("```", "").replace("json", "").strip()
-        print('Thought: ' + action_thought)
-        print('Action: ' + action_object_str)
-        print('Action description: ' + action_description)
+            action_object_str = action_object_str.replace("```", "").replace("json", "").strip()
+            print('Thought: ' + action_thought)
+            print('Action: ' + action_object_str)
+            print('Action description: ' + action_description)
 
-        try:
-            action_object_raw = action_object_str
-            print(f"[ACTION_PARSE] raw: {action_object_raw}")
-            # 首先尝试 JSON 解析（标准格式，双引号）
             try:
-                action_object = json.loads(action_object_str)
-                print(f"[ACTION_PARSE] json.loads success: {action_object}")
-            except Exception as e_json:
-                print(f"[ACTION_PARSE] json.loads failed: {e_json}")
-                # 尝试使用 ast.literal_eval 解析 Python 字面量（支持单引号）
+                action_object_raw = action_object_str
+                print(f"[ACTION_PARSE] raw: {action_object_raw}")
+                # 首先尝试 JSON 解析（标准格式，双引号）
                 try:
-                    action_object = ast.literal_eval(action_object_str)
-                    print(f"[ACTION_PARSE] ast.literal_eval success: {action_object}")
-                except Exception as e_ast:
-                    print(f"[ACTION_PARSE] literal_eval failed: {e_ast}")
-                    raise
-            operator_response = f'''### Thought ###
-{action_thought}
-
-### Action ###
-{action_object}
-
-### Description ###
-{action_description}'''
+                    action_object = json.loads(action_object_str)
+                    print(f"[ACTION_PARSE] json.loads success: {action_object}")
+                except Exception as e_json:
+                    print(f"[ACTION_PARSE] json.loads failed: {e_json}")
+                    # 尝试使用 ast.literal_eval 解析 Python 字面量（支持单引号）
+                    try:
+                        action_object = ast.literal_eval(action_object_str)
+                        print(f"[ACTION_PARSE] ast.literal_eval success: {action_object}")
+                    except Exception as e_ast:
+                        print(f"[ACTION_PARSE] literal_eval failed: {e_ast}")
+                        raise
+                operator_response = "\n".join([
+                    "### Thought ###",
+                    f"{action_thought}",
+                    "",
+                    "### Action ###",
+                    f"{action_object}",
+                    "",
+                    "### Description ###",
+                    f"{action_description}",
+                ])
             
-            if action_object['action'] == "answer":
-                message_file = os.path.join(message_save_path, "operator.json")
-                message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
-                with open(message_file, 'w', encoding='utf-8') as json_file:
-                    json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+                if action_object['action'] == "answer":
+                    message_file = os.path.join(message_save_path, "operator.json")
+                    message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
+                    with open(message_file, 'w', encoding='utf-8') as json_file:
+                        json.dump(message_data, json_file, ensure_ascii=False, indent=4)
 
-                answer_content = action_object['text']
-                print(f"Instruction finished, answer: {answer_content}, stop the process.")
-                task_result_path = os.path.join(save_path, "task_result.json")
-                current_time = datetime.now()
-                formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-                task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 0.0}
-                with open(task_result_path, 'w', encoding='utf-8') as json_file:
-                    json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
-                break
+                    answer_content = action_object['text']
+                    print(f"Instruction finished, answer: {answer_content}, stop the process.")
+                    task_result_path = os.path.join(save_path, "task_result.json")
+                    current_time = datetime.now()
+                    formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
+                    task_result_data = {"goal": instruction, "finish_dtime": formatted_time, "hit_step_limit": 0.0}
+                    with open(task_result_path, 'w', encoding='utf-8') as json_file:
+                        json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
+                    break
             
-            if coor_type != "abs":
-                if "coordinate" in action_object:
-                    cx, cy = action_object['coordinate']
-                    sx, sy = int(cx / 1000 * width), int(cy / 1000 * height)
-                    print(f"[COOR] scale from rel ({cx},{cy}) to abs ({sx},{sy}) with screen ({width}x{height})")
-                    action_object['coordinate'] = [sx, sy]
-                if "coordinate2" in action_object:
-                    cx2, cy2 = action_object['coordinate2']
-                    sx2, sy2 = int(cx2 / 1000 * width), int(cy2 / 1000 * height)
-                    print(f"[COOR] scale2 from rel ({cx2},{cy2}) to abs ({sx2},{sy2}) with screen ({width}x{height})")
-                    action_object['coordinate2'] = [sx2, sy2]
+                if coor_type != "abs":
+                    if "coordinate" in action_object:
+                        cx, cy = action_object['coordinate']
+                        sx, sy = int(cx / 1000 * width), int(cy / 1000 * height)
+                        print(f"[COOR] scale from rel ({cx},{cy}) to abs ({sx},{sy}) with screen ({width}x{height})")
+                        action_object['coordinate'] = [sx, sy]
+                    if "coordinate2" in action_object:
+                        cx2, cy2 = action_object['coordinate2']
+                        sx2, sy2 = int(cx2 / 1000 * width), int(cy2 / 1000 * height)
+                        print(f"[COOR] scale2 from rel ({cx2},{cy2}) to abs ({sx2},{sy2}) with screen ({width}x{height})")
+                        action_object['coordinate2'] = [sx2, sy2]
+                elif vllm.role_token_budgets.get("executor"):
+                    # 绝对坐标位于缩小后的图像空间，按缩放比例映射回屏幕坐标
+                    fx, fy = executor_scale
+                    for key in ("coordinate", "coordinate2"):
+                        if key in action_object:
+                            cx, cy = action_object[key]
+                            action_object[key] = [int(cx * fx), int(cy * fy)]
+                            print(f"[COOR] {key} from model ({cx},{cy}) to screen {action_object[key]} with scale ({fx:.3f},{fy:.3f})")
             
-            if action_object['action'] == "click":
-                x_exec, y_exec = action_object['coordinate'][0], action_object['coordinate'][1]
-                # 边界检查并记录
-                if x_exec < 0 or y_exec < 0 or x_exec >= width or y_exec >= height:
-                    print(f"[COOR] Warning: click out of screen: ({x_exec},{y_exec}) not in [0,{width})x[0,{height})")
-                print(f"[EXEC] click -> controller.tap({x_exec}, {y_exec}) | desc: {action_description}")
-                controller.tap(x_exec, y_exec)
+                if action_object['action'] == "click":
+                    x_exec, y_exec = action_object['coordinate'][0], action_object['coordinate'][1]
+                    # 边界检查并记录
+                    if x_exec < 0 or y_exec < 0 or x_exec >= width or y_exec >= height:
+                        print(f"[COOR] Warning: click out of screen: ({x_exec},{y_exec}) not in [0,{width})x[0,{height})")
+                    print(f"[EXEC] click -> controller.tap({x_exec}, {y_exec}) | desc: {action_description}")
+                    controller.tap(x_exec, y_exec)
                 
-                # 检测是否点击了复制按钮
-                copy_keywords = ["复制", "copy", "复制按钮", "复制内容", "点击复制", "Click on the copy icon", "Click the copy button"]
-                action_desc_lower = action_description.lower()
-                is_copy_action = any(keyword.lower() in action_desc_lower or keyword in action_description for keyword in copy_keywords)
+                    # 检测是否点击了复制按钮
+                    copy_keywords = ["复制", "copy", "复制按钮", "复制内容", "点击复制", "Click on the copy icon", "Click the copy button"]
+                    action_desc_lower = action_description.lower()
+                    is_copy_action = any(keyword.lower() in action_desc_lower or keyword in action_description for keyword in copy_keywords)
                 
-                if is_copy_action:
-                    # 等待复制操作完成
-                    time.sleep(1)
+                    if is_copy_action:
+                        # 等待复制操作完成
+                        time.sleep(1)
                     
-                    # 获取粘贴板内容
-                    clipboard_content = None
-                    if hasattr(controller, 'get_clipboard'):
-                        clipboard_content = controller.get_clipboard()
-                    else:
-                        print("警告：当前控制器不支持获取粘贴板内容（需要 Android 设备）。")
+                        # 获取粘贴板内容
+                        clipboard_content = None
+                        if hasattr(controller, 'get_clipboard'):
+                            clipboard_content = controller.get_clipboard()
+                        else:
+                            print("警告：当前控制器不支持获取粘贴板内容（需要 Android 设备）。")
                     
-                    if clipboard_content:
-                        print("\n" + "="*80)
-                        print("检测到复制操作，粘贴板内容如下：")
-                        print("="*80)
-                        print(clipboard_content)
-                        print("="*80 + "\n")
+                        if clipboard_content:
+                            print("\n" + "="*80)
+                            print("检测到复制操作，粘贴板内容如下：")
+                            print("="*80)
+                            print(clipboard_content)
+                            print("="*80 + "\n")
                         
-                        # 保存 operator.json（在停止操作前保存）
-                        message_file = os.path.join(message_save_path, "operator.json")
-                        message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
-                        with open(message_file, 'w', encoding='utf-8') as json_file:
-                            json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+                            # 保存 operator.json（在停止操作前保存）
+                            message_file = os.path.join(message_save_path, "operator.json")
+                            message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
+                            with open(message_file, 'w', encoding='utf-8') as json_file:
+                                json.dump(message_data, json_file, ensure_ascii=False, indent=4)
                         
-                        # 保存粘贴板内容到结果文件
-                        task_result_path = os.path.join(save_path, "task_result.json")
-                        current_time = datetime.now()
-                        formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-                        task_result_data = {
-                            "goal": instruction, 
-                            "finish_dtime": formatted_time, 
-                            "hit_step_limit": 0.0,
-                            "clipboard_content": clipboard_content
-                        }
-                        with open(task_result_path, 'w', encoding='utf-8') as json_file:
-                            json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
+                            # 保存粘贴板内容到结果文件
+                            task_result_path = os.path.join(save_path, "task_result.json")
+                            current_time = datetime.now()
+                            formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S.%f")
+                            task_result_data = {
+                                "goal": instruction, 
+                                "finish_dtime": formatted_time, 
+                                "hit_step_limit": 0.0,
+                                "clipboard_content": clipboard_content
+                            }
+                            with open(task_result_path, 'w', encoding='utf-8') as json_file:
+                                json.dump(task_result_data, json_file, ensure_ascii=False, indent=4)
                         
-                        print("已获取粘贴板内容并停止操作。")
-                        break
-                    else:
-                        print("警告：无法获取粘贴板内容，请确保已安装 uiautomator2。")
-            elif action_object['action'] == "swipe":
-                controller.slide(action_object['coordinate'][0], action_object['coordinate'][1], action_object['coordinate2'][0], action_object['coordinate2'][1])
-            elif action_object['action'] == "type":
-                controller.type(action_object['text'])
-            elif action_object['action'] == "system_button":
-                if action_object['button'] == "Back":
-                    controller.back()
-                elif action_object['button'] == "Home":
-                    controller.home()
-            elif action_object['action'] == "open_app" or action_object['action'] == "open":
-                # 尝试直接打开应用，如果失败则跳过（后续可能通过点击图标的方式）
-                app_name = action_object.get('text', '')
-                if app_name:
-                    success = controller.open_app(app_name)
-                    if not success:
-                        print(f"无法直接打开应用 {app_name}，请确保应用已安装或使用点击图标方式")
-            elif action_object['action'] == "wait":
-                # 等待指定的秒数
-                wait_time = action_object.get('time', 2)
-                print(f"等待 {wait_time} 秒...")
-                time.sleep(wait_time)
+                            print("已获取粘贴板内容并停止操作。")
+                            break
+                        else:
+                            print("警告：无法获取粘贴板内容，请确保已安装 uiautomator2。")
+                elif action_object['action'] == "swipe":
+                    controller.slide(action_object['coordinate'][0], action_object['coordinate'][1], action_object['coordinate2'][0], action_object['coordinate2'][1])
+                elif action_object['action'] == "type":
+                    controller.type(action_object['text'])
+                elif action_object['action'] == "system_button":
+                    if action_object['button'] == "Back":
+                        controller.back()
+                    elif action_object['button'] == "Home":
+                        controller.home()
+                elif action_object['action'] == "open_app" or action_object['action'] == "open":
+                    # 尝试直接打开应用，如果失败则跳过（后续可能通过点击图标的方式）
+                    app_name = action_object.get('text', '')
+                    if app_name:
+                        success = controller.open_app(app_name)
+                        if not success:
+                            print(f"无法直接打开应用 {app_name}，请确保应用已安装或使用点击图标方式")
+                elif action_object['action'] == "wait":
+                    # 等待指定的秒数
+                    wait_time = action_object.get('time', 2)
+                    print(f"等待 {wait_time} 秒...")
+                    time.sleep(wait_time)
             
-        except:
-            info_pool.last_action = {"action": "invalid"}
-            info_pool.action_history.append({"action": "invalid"})
-            info_pool.summary_history.append(action_description)
-            info_pool.action_outcomes.append("C")
-            info_pool.error_descriptions.append("invalid action format, do nothing.")
-            local_image_dir2 = local_image_dir
-            continue
+            except:
+                info_pool.last_action = {"action": "invalid"}
+                info_pool.action_history.append({"action": "invalid"})
+                info_pool.summary_history.append(action_description)
+                info_pool.action_outcomes.append("C")
+                info_pool.error_descriptions.append("invalid action format, do nothing.")
+                local_image_dir2 = local_image_dir
+                screen2 = screen
+                continue
         
-        message_file = os.path.join(message_save_path, "operator.json")
-        message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
-        with open(message_file, 'w', encoding='utf-8') as json_file:
-            json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+            message_file = os.path.join(message_save_path, "operator.json")
+            message_data = {"name": "operator", "messages": message_operator, "response": operator_response, "step_id": step+1}
+            with open(message_file, 'w', encoding='utf-8') as json_file:
+                json.dump(message_data, json_file, ensure_ascii=False, indent=4)
 
-        # 使用已解析的动作对象，避免单引号字符串再次 json.loads 失败
-        info_pool.last_action = action_object
+            # 使用已解析的动作对象，避免单引号字符串再次 json.loads 失败
+            info_pool.last_action = action_object
         
-        if step == 0:
-            time.sleep(8) # maybe a pop-up when first open an app
-        time.sleep(2)
+            screen2 = None
+            if settle_mode in ("detect", "events"):
+                # 等待窗口取自该应用该动作的历史稳定时间（p50 开始检测，p99 封顶）
+                settle_action = normalize_action(action_object['action'])
+                if step == 0:
+                    # maybe a pop-up when first open an app
+                    # 第一步包含启动、开屏和弹窗等待，单独按 launch 统计，不影响该应用普通动作的窗口；
+                    # first_step_settle_wait 作为下限
+                    stats_action = LAUNCH_ACTION
+                    learned_min, learned_max = settle_model.window(current_package, stats_action, first_step_settle_wait)
+                    settle_min = max(learned_min, first_step_settle_wait[0])
+                    settle_max = max(learned_max, first_step_settle_wait[1])
+                else:
+                    stats_action = settle_action
+                    default_window = None if settle_action == "open_app" else settle_wait
+                    settle_min, settle_max = settle_model.window(current_package, stats_action, default_window)
+                ui_quiet = None
+                if settle_mode == "events" and settle_action != "wait":
+                    # 等待界面事件出现并安静下来；事件监听已退出时返回 None，改用截图轮询
+                    ui_quiet = controller.wait_for_ui_quiet(quiet_ms=ui_quiet_ms, timeout=settle_max)
+                    if ui_quiet is not None:
+                        changed, quiet_time = ui_quiet
+                        if changed and quiet_time < settle_max:
+                            # 与截图检测相同，只记录在窗口内安静下来的稳定时间
+                            settle_model.record(current_package, stats_action, quiet_time)
+                        elif not changed:
+                            print("[UI_EVENTS] the last action produced no UI event")
+                if ui_quiet is None:
+                    # 轮询截图直到界面稳定，稳定帧直接作为操作后的截图
+                    screen2, settle_elapsed, settled = wait_for_stable_screen(controller, min_wait=settle_min, max_wait=settle_max)
+                    if settled and settle_action != "wait":
+                        settle_model.record(current_package, stats_action, settle_elapsed)
+                current_package = controller.get_foreground_package() or current_package
+            else:
+                if step == 0:
+                    time.sleep(8) # maybe a pop-up when first open an app
+                time.sleep(2)
         
-        current_time = datetime.now()
-        formatted_time = current_time.strftime(f'%Y-%m-%d-{current_time.hour * 3600 + current_time.minute * 60 + current_time.second}-{str(uuid.uuid4().hex[:8])}')
-        local_image_dir2 = os.path.join(image_save_path, f"screenshot_{formatted_time}.png")
+            current_time = datetime.now()
+            formatted_time = current_time.strftime(f'%Y-%m-%d-{current_time.hour * 3600 + current_time.minute * 60 + current_time.second}-{str(uuid.uuid4().hex[:8])}')
+            local_image_dir2 = os.path.join(image_save_path, f"screenshot_{formatted_time}.png")
         
-        # get the screenshot
-        for _ in range(5):
-            if not controller.get_screenshot(local_image_dir2):
-                print("Get screenshot failed, retry.")
-                time.sleep(5)
-            else:
-                break
+            # get the screenshot
+            for _ in range(5):
+                if screen2 is not None:
+                    break
+                screen2 = controller.capture()
+                if screen2 is None:
+                    print("Get screenshot failed, retry.")
+                    time.sleep(5)
+                else:
+                    break
+            if save_screenshots:
+                screen2.save_async(local_image_dir2)
         
-        print("\n### Action Reflector ... ###\n")
-        prompt_action_reflect = action_reflector.get_prompt(info_pool)
-        output_action_reflect, message_reflector, raw_response = vllm.predict_mm(
-            prompt_action_reflect,
-            [
-                local_image_dir,
-                local_image_dir2,
-            ],
-        )
+            print("\n### Action Reflector ... ###\n")
+            unchanged = False
+            if no_change_detector is not None:
+                unchanged, no_change_metrics = no_change_detector.check(action_object, screen, screen2, step=step+1)
+            if unchanged:
+                # 界面没有任何变化：本地判定为 C，不再调用 LLM
+                print(f"[REFLECT] screen unchanged ({no_change_metrics}), skip reflector call")
+                output_action_reflect = (
+                    "### Outcome ###\nC\n\n"
+                    "### Error Description ###\n"
+                    "The screen did not change after the last action (before and after screenshots are identical). "
+                    "The target may not be interactive, the tap may have missed it, or the page cannot scroll further.\n"
+                )
+                message_reflector = None
+            else:
+                reflect_images, info_pool.reflector_regions = [screen, screen2], []
+                if reflector_input == "crops":
+                    # 缩小的操作后整屏 + 变化区域的高清裁剪；没有局部变化区域（如整页跳转）时仍发送两张整图
+                    crop_images, crop_regions = reflector_crop_inputs(screen, screen2)
+                    if crop_regions:
+                        reflect_images, info_pool.reflector_regions = crop_images, crop_regions
+                        print(f"[REFLECT] send {len(crop_regions)} changed region(s) as crops: {crop_regions}")
+                output_action_reflect, message_reflector, raw_response = vllm.predict_mm(
+                    *agent_request(action_reflector, reflect_images),
+                    role="reflector",
+                )
         
-        message_file = os.path.join(message_save_path, "reflector.json")
-        message_data = {"name": "reflector", "messages": message_reflector, "response": output_action_reflect, "step_id": step+1}
-        with open(message_file, 'w', encoding='utf-8') as json_file:
-            json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+            message_file = os.path.join(message_save_path, "reflector.json")
+            message_data = {"name": "reflector", "messages": message_reflector, "response": output_action_reflect, "step_id": step+1}
+            with open(message_file, 'w', encoding='utf-8') as json_file:
+                json.dump(message_data, json_file, ensure_ascii=False, indent=4)
         
-        parsed_result_action_reflect = action_reflector.parse_response(output_action_reflect)
-        outcome, error_description = (
-            parsed_result_action_reflect['outcome'], 
-            parsed_result_action_reflect['error_description']
-        )
-        progress_status = info_pool.completed_plan
+            parsed_result_action_reflect = action_reflector.parse_response(output_action_reflect)
+            outcome, error_description = (
+                parsed_result_action_reflect['outcome'], 
+                parsed_result_action_reflect['error_description']
+            )
+            progress_status = info_pool.completed_plan
         
-        if "A" in outcome: # Successful. The result of the last action meets the expectation.
-          action_outcome = "A"
-        elif "B" in outcome: # Failed. The last action results in a wrong page. I need to return to the previous state.
-            action_outcome = "B"
-        elif "C" in outcome: # Failed. The last action produces no changes.
-            action_outcome = "C"
-        else:
-            raise ValueError("Invalid outcome:", outcome)
+            if "A" in outcome: # Successful. The result of the last action meets the expectation.
+              action_outcome = "A"
+            elif "B" in outcome: # Failed. The last action results in a wrong page. I need to return to the previous state.
+                action_outcome = "B"
+            elif "C" in outcome: # Failed. The last action produces no changes.
+                action_outcome = "C"
+            else:
+                raise ValueError("Invalid outcome:", outcome)
         
-        print('Action reflection outcome: ' + action_outcome)
-        print('Action reflection error description: ' + error_description)
-        print('Action reflection progress status: ' + progress_status, "\n")
+            print('Action reflection outcome: ' + action_outcome)
+            print('Action reflection error description: ' + error_description)
+            print('Action reflection progress status: ' + progress_status, "\n")
         
-        # 记录历史时也使用已解析对象
-        info_pool.action_history.append(action_object)
-        info_pool.summary_history.append(action_description)
-        info_pool.action_outcomes.append(action_outcome)
-        info_pool.error_descriptions.append(error_description)
-        info_pool.progress_status = progress_status
+            # 记录历史时也使用已解析对象
+            info_pool.action_history.append(action_object)
+            info_pool.summary_history.append(action_description)
+            info_pool.action_outcomes.append(action_outcome)
+            info_pool.error_descriptions.append(error_description)
+            info_pool.progress_status = progress_status
         
-        if action_outcome == "A" and if_notetaker:
-            print("\n### NoteKeeper ... ###\n")
-            prompt_note = notetaker.get_prompt(info_pool)
-            output_note, message_notekeeper, raw_response = vllm.predict_mm(
-                prompt_note,
-                [local_image_dir2],
-            )
+            if action_outcome == "A" and if_notetaker:
+                print("\n### NoteKeeper ... ###\n")
+                output_note, message_notekeeper, raw_response = vllm.predict_mm(
+                    *agent_request(notetaker, [screen2]),
+                    role="notetaker",
+                )
             
-            message_file = os.path.join(message_save_path, "notekeeper.json")
-            message_data = {"name": "notekeeper", "messages": message_notekeeper, "response": output_note, "step_id": step+1}
-            with open(message_file, 'w', encoding='utf-8') as json_file:
-                json.dump(message_data, json_file, ensure_ascii=False, indent=4)
+                message_file = os.path.join(message_save_path, "notekeeper.json")
+                message_data = {"name": "notekeeper", "messages": message_notekeeper, "response": output_note, "step_id": step+1}
+                with open(message_file, 'w', encoding='utf-8') as json_file:
+                    json.dump(message_data, json_file, ensure_ascii=False, indent=4)
             
-            parsed_result_note = notetaker.parse_response(output_note)
-            important_notes = parsed_result_note['important_notes']
-            info_pool.important_notes = important_notes
+                parsed_result_note = notetaker.parse_response(output_note)
+                important_notes = parsed_result_note['important_notes']
+                info_pool.important_notes = important_notes
+
+                print('Important notes: ' + important_notes, "\n")
+    finally:
+        # 前缀缓存命中情况（需服务端在 usage 中返回 cached_tokens）
+        cache_calls = [stats for stats in vllm.call_stats if stats.get("cached_tokens") is not None]
+        if cache_calls:
+            prompt_tokens = sum(stats["prompt_tokens"] or 0 for stats in cache_calls)
+            cached_tokens = sum(stats["cached_tokens"] for stats in cache_calls)
+            print(f"[PREFIX CACHE] layout={prompt_layout}, {cached_tokens}/{prompt_tokens} prompt tokens cached ({cached_tokens / max(prompt_tokens, 1):.0%}) over {len(cache_calls)} call(s)")
+        if len(vllm.endpoints.endpoints) > 1:
+            print(f"[ENDPOINT] {vllm.endpoints.stats()}")
+        if speculative_executor is not None:
+            # 取消尚未开始的推测；已在执行的调用无法中断，不等待其结束
+            speculative_executor.shutdown(wait=False, cancel_futures=True)
+            attempted = speculation_stats["attempted"]
+            hit_rate = speculation_stats["hits"] / attempted if attempted else 0.0
+            print(f"[SPECULATION] {speculation_stats}, hit rate {hit_rate:.0%}")
+            with open(os.path.join(save_path, "speculation_stats.json"), 'w', encoding='utf-8') as json_file:
+                json.dump(dict(speculation_stats, hit_rate=hit_rate), json_file, ensure_ascii=False, indent=4)
+        # 释放帧流和常驻 shell 会话（设备会话本身在进程内缓存，供后续任务复用）
+        if hasattr(controller, "close"):
+            controller.close()
+    return task_result_data
 
-            print('Important notes: ' + important_notes, "\n")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -402,12 +586,51 @@ if __name__ == '__main__':
     parser.add_argument("--adb_path", type=str)
     parser.add_argument("--hdc_path", type=str)   
     parser.add_argument("--api_key", type=str)
-    parser.add_argument("--base_url", type=str)
+    parser.add_argument("--base_url", type=str, help="LLM base URL; comma-separate several replicas to load-balance across them")
     parser.add_argument("--model", type=str)
     parser.add_argument("--instruction", type=str)
     parser.add_argument("--add_info", type=str, default="")
     parser.add_argument("--coor_type", type=str, default="abs")
     parser.add_argument("--notetaker", type=bool, default=False)
+    parser.add_argument("--screenshot_mode", type=str, default="u2", choices=["u2", "exec-out", "raw"])
+    parser.add_argument("--frame_stream", action="store_true", help="Android: keep a background frame stream and use its latest frame as screenshot")
+    parser.add_argument("--no_save_screenshots", action="store_true", help="do not write step screenshots to the log directory")
+    parser.add_argument("--settle_mode", type=str, default="detect", choices=["detect", "events", "fixed"], help="detect: wait until the screen is stable after each action; events: (Android) wait until accessibility events go quiet, fallback to detect; fixed: legacy fixed sleeps")
+    parser.add_argument("--ui_quiet_ms", type=int, default=300, help="events mode: quiet period after the last UI event")
+    parser.add_argument("--settle_min", type=float, default=0.3)
+    parser.add_argument("--settle_max", type=float, default=3.0)
+    parser.add_argument("--no_reflector_shortcut", action="store_true", help="always call the reflector, even when the screen did not change")
+    parser.add_argument("--no_change_hash_threshold", type=int, default=0, help="max differing dHash bits (of 256) to treat two screenshots as identical")
+    parser.add_argument("--no_change_ratio_threshold", type=float, default=0.0005, help="max ratio of changed thumbnail pixels to treat two screenshots as identical")
+    parser.add_argument("--reflector_input", type=str, default="full", choices=["full", "crops"], help="full: before/after screenshots; crops: downscaled after screenshot plus crops of changed regions")
+    parser.add_argument("--image_codec", type=str, default=None, help="image codec for all roles: png, jpeg:<quality>, webp:<quality> or webp-lossless; default: png")
+    parser.add_argument("--role_codecs", type=str, default="", help="per-role image codecs, e.g. 'reflector=jpeg:80,notetaker=webp:75', or 'lossy' for the preset (jpeg for manager/reflector/notetaker, png for executor)")
+    parser.add_argument("--token_budgets", type=str, default="", help="per-role vision token budget per call, e.g. 'manager=1200,executor=2000,reflector=1500,notetaker=1200'")
+    parser.add_argument("--time_budget", type=float, default=None, help="task time budget in seconds; LLM retries stop when it runs out")
+    parser.add_argument("--stream_roles", type=str, default="", help="roles that use streaming completions with early stop, e.g. 'executor,reflector'")
+    parser.add_argument("--max_tokens", type=str, default="", help="per-role max output tokens, e.g. 'executor=400,reflector=200'")
+    parser.add_argument("--speculative", action="store_true", help="run the executor with the current plan in parallel with the manager, keep the result if the plan is unchanged")
+    parser.add_argument("--prompt_layout", type=str, default="legacy", choices=["legacy", "cached"], help="cached: role-static system message first, then task and step content, images last (prefix-cache friendly)")
+    parser.add_argument("--routing", type=str, default="least_outstanding", choices=["least_outstanding", "latency"], help="routing across several base URLs")
+    parser.add_argument("--sticky", action="store_true", help="keep all LLM calls of a task on the same replica (prefix-cache locality)")
+    parser.add_argument("--settle_stats_path", type=str, default=None, help="persistent settle-time statistics file, default: <log_path>/settle_stats.json")
     args = parser.parse_args()
+    def parse_role_values(spec):
+        # 'executor=400,reflector=200' -> {"executor": 400, "reflector": 200}
+        values = {}
+        for item in filter(None, spec.split(",")):
+            role, _, value = item.partition("=")
+            values[role.strip()] = int(value)
+        return values
+    if args.role_codecs.strip() == "lossy":
+        role_codecs = dict(LOSSY_ROLE_CODECS)
+    else:
+        role_codecs = {}
+        for item in filter(None, args.role_codecs.split(",")):
+            role, _, codec = item.partition("=")
+            role_codecs[role.strip()] = codec.strip()
+    token_budgets = parse_role_values(args.token_budgets)
+    role_max_tokens = parse_role_values(args.max_tokens)
+    stream_roles = [role.strip() for role in args.stream_roles.split(",") if role.strip()]
     
-    run_instruction(args.adb_path, args.hdc_path, args.api_key, args.base_url, args.model, args.instruction, args.add_info, args.coor_type, args.notetaker)
+    run_instruction(args.adb_path, args.hdc_path, args.api_key, args.base_url, args.model, args.instruction, args.add_info, args.coor_type, args.notetaker, screenshot_mode=args.screenshot_mode, frame_stream=args.frame_stream, save_screenshots=not args.no_save_screenshots, settle_mode=args.settle_mode, settle_wait=(args.settle_min, args.settle_max), settle_stats_path=args.settle_stats_path, skip_reflector_on_no_change=not args.no_reflector_shortcut, no_change_thresholds=(args.no_change_hash_threshold, args.no_change_ratio_threshold), reflector_input=args.reflector_input, ui_quiet_ms=args.ui_quiet_ms, image_codec=args.image_codec, role_codecs=role_codecs, token_budgets=token_budgets, time_budget=args.time_budget, stream_roles=stream_roles, role_max_tokens=role_max_tokens, speculative=args.speculative, prompt_layout=args.prompt_layout, routing=args.routing, sticky=args.sticky)
@@ -0,0 +1,109 @@
+"""
+本地模拟的 OpenAI 兼容服务：实现 /v1/chat/completions 与 /v1/models，
+可设置响应延迟、返回错误状态码，并记录收到的请求数和最大并发数
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOpenAIServer:
+
+    def __init__(self, name, delay=0.0, status=200):
+        """
+        :param name: 服务名称，作为补全结果的内容返回，便于判断请求落在哪个服务上
+        :param delay: 每个补全请求的处理延迟（秒）
+        :param status: 非 200 时补全和 /models 都返回该状态码
+        """
+        self.name = name
+        self.delay = delay
+        self.status = status
+        self.completions = 0
+        self.model_probes = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # 设置 hold 后补全请求会阻塞，直到调用 release()
+        self.hold = None
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.hold is not None:
+            self.hold.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def block(self):
+        self.hold = threading.Event()
+
+    def release(self):
+        if self.hold is not None:
+            self.hold.set()
+            self.hold = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if not self.path.rstrip("/").endswith("/models"):
+                    return self._send(404, {"error": {"message": "not found"}})
+                with server._lock:
+                    server.model_probes += 1
+                if server.status != 200:
+                    return self._send(server.status, {"error": {"message": "unavailable"}})
+                self._send(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": server.name}]})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                with server._lock:
+                    server.completions += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    hold = server.hold
+                    if hold is not None:
+                        hold.wait(10)
+                    if server.delay:
+                        time.sleep(server.delay)
+                    if server.status != 200:
+                        return self._send(server.status, {"error": {"message": "unavailable"}})
+                    self._send(200, {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": "mock",
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": server.name}}],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+                    })
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
@@ -0,0 +1,58 @@
+import stat
+import sys
+
+import pytest
+
+from utils.adb_shell import AdbShellSession
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+
+
+@pytest.fixture
+def session(tmp_path):
+    # 用本机 /bin/sh 代替 `adb shell`，会话协议（stdin 写命令、stdout 读结束标记）完全相同
+    fake_adb = tmp_path / "adb"
+    fake_adb.write_text("#!/bin/sh\nexec /bin/sh\n")
+    fake_adb.chmod(fake_adb.stat().st_mode | stat.S_IEXEC)
+    session = AdbShellSession(str(fake_adb), device_id="emulator-5554", command_timeout=5)
+    yield session
+    session.close()
+
+
+def test_output_and_exit_code(session):
+    assert session.run("echo hello; echo world") == (0, "hello\nworld\n")
+    code, output = session.run("echo oops >&2; exit_code() { return 3; }; exit_code")
+    assert code == 3
+    assert output == "oops\n"
+
+
+def test_output_without_trailing_newline(session):
+    # 结束标记与最后一段输出在同一行
+    assert session.run("printf abc") == (0, "abc")
+    assert session.run("printf 'a\\nb'") == (0, "a\nb")
+
+
+def test_marker_text_in_output_does_not_end_command(session):
+    code, output = session.run("echo __MA_DONE_; echo done")
+    assert code == 0
+    assert output == "__MA_DONE_\ndone\n"
+
+
+def test_session_is_reused_between_commands(session):
+    session.run("true")
+    pid = session.process.pid
+    session.run("true")
+    assert session.process.pid == pid
+
+
+def test_exited_session_returns_none_and_restarts(session):
+    assert session.run("exit 0")[0] is None
+    assert not session.is_alive()
+    assert session.run("echo back") == (0, "back\n")
+
+
+def test_timeout_discards_session(session):
+    code, _ = session.run("sleep 2", timeout=0.3)
+    assert code is None
+    assert session.process is None
+    assert session.run("echo ok") == (0, "ok\n")
@@ -0,0 +1,53 @@
+from PIL import Image
+
+from utils.android_controller import AndroidController
+
+
+class SlowStream:
+    """帧流在运行但一直没有新帧：每次 wait_for_frame 都会等满超时"""
+
+    def __init__(self):
+        self.waits = 0
+
+    def is_running(self):
+        return True
+
+    def wait_for_frame(self, newer_than=None, timeout=None):
+        self.waits += 1
+        return None, None
+
+
+def make_controller(stream):
+    controller = AndroidController.__new__(AndroidController)
+    controller.frame_stream = stream
+    controller.last_action_time = 0.0
+    controller.screenshot_mode = "raw"
+    controller.u2_device = None
+    controller.session = None
+    controller.direct_captures = 0
+
+    def get_screenshot_raw():
+        controller.direct_captures += 1
+        return Image.new("RGB", (8, 16))
+
+    controller.get_screenshot_raw = get_screenshot_raw
+    return controller
+
+
+def test_capture_asks_frame_stream_once_on_miss():
+    stream = SlowStream()
+    controller = make_controller(stream)
+    frame = controller.capture()
+    assert frame is not None
+    assert stream.waits == 1
+    assert controller.direct_captures == 1
+
+
+def test_capture_preview_asks_frame_stream_once_on_miss():
+    stream = SlowStream()
+    controller = make_controller(stream)
+    controller.get_screenshot_raw = lambda: None
+    controller._capture_png_image = lambda: Image.new("RGB", (8, 16))
+    frame = controller.capture_preview()
+    assert frame is not None
+    assert stream.waits == 1
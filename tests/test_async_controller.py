@@ -0,0 +1,141 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from utils import async_controller
+from utils.async_controller import AsyncAndroidController, AsyncHarmonyOSController
+
+
+def png_bytes(color=(10, 20, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 16), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeProcess:
+    def __init__(self, returncode, stdout, stderr):
+        self.returncode = returncode
+        self._stdout = stdout
+        self._stderr = stderr
+
+    async def communicate(self):
+        return self._stdout, self._stderr
+
+    def kill(self):
+        pass
+
+    async def wait(self):
+        return self.returncode
+
+
+@pytest.fixture
+def fake_exec(monkeypatch):
+    """替换 asyncio.create_subprocess_exec：记录 argv，由 handler(argv) 返回 (returncode, stdout, stderr)"""
+    calls = []
+    state = {"handler": lambda argv: (0, b"", b"")}
+
+    async def create_subprocess_exec(*argv, stdout=None, stderr=None):
+        calls.append(list(argv))
+        return FakeProcess(*state["handler"](list(argv)))
+
+    monkeypatch.setattr(async_controller.asyncio, "create_subprocess_exec", create_subprocess_exec)
+
+    def install(handler):
+        state["handler"] = handler
+        return calls
+
+    return install
+
+
+def test_android_commands_are_argv_lists(fake_exec):
+    calls = fake_exec(lambda argv: (0, b"", b""))
+    controller = AsyncAndroidController("adb", device_id="emulator-5554")
+
+    async def run():
+        await controller.tap(100, 200)
+        await controller.back()
+        await controller.slide(1, 2, 3, 4)
+
+    asyncio.run(run())
+    prefix = ["adb", "-s", "emulator-5554", "shell"]
+    assert calls == [
+        prefix + ["input swipe 100 200 102 202 200"],
+        prefix + ["input keyevent 4"],
+        prefix + ["input swipe 1 2 3 4 500"],
+    ]
+
+
+def test_android_screenshot_saves_to_path(fake_exec, tmp_path):
+    data = png_bytes()
+    calls = fake_exec(lambda argv: (0, data, b"") if argv[-2:] == ["screencap", "-p"] else (1, b"", b""))
+    controller = AsyncAndroidController("adb", screenshot_mode="png")
+    save_path = str(tmp_path / "shot.png")
+
+    assert asyncio.run(controller.get_screenshot(save_path))
+    assert calls == [["adb", "exec-out", "screencap", "-p"]]
+    with Image.open(save_path) as image:
+        assert image.size == (8, 16)
+
+
+def test_harmonyos_screenshot_receives_remote_file(fake_exec, tmp_path):
+    data = png_bytes()
+
+    def handler(argv):
+        if argv[1:3] == ["file", "recv"]:
+            with open(argv[4], "wb") as f:
+                f.write(data)
+        return 0, b"", b""
+
+    calls = fake_exec(handler)
+    controller = AsyncHarmonyOSController("hdc")
+    save_path = str(tmp_path / "shot.png")
+
+    assert asyncio.run(controller.get_screenshot(save_path))
+    remote = AsyncHarmonyOSController.REMOTE_SCREENSHOT_PATH
+    assert calls[0] == ["hdc", "shell", f"rm -f {remote}; uitest screenCap -p {remote}"]
+    assert calls[1][:4] == ["hdc", "file", "recv", remote]
+    local = calls[1][4]
+    # 本机临时文件用完即删
+    assert not os.path.exists(local)
+    assert os.path.exists(save_path)
+
+
+def test_open_app_waits_for_foreground_instead_of_sleeping(fake_exec):
+    polls = []
+
+    def handler(argv):
+        command = argv[-1]
+        if command.startswith("monkey"):
+            return 0, b"Events injected: 1", b""
+        if "mCurrentFocus" in command:
+            polls.append(command)
+            if len(polls) < 3:
+                return 0, b"mCurrentFocus=null", b""
+            return 0, b"mCurrentFocus=Window{1a2b u0 com.tencent.mm/com.tencent.mm.ui.LauncherUI}", b""
+        return 0, b"", b""
+
+    calls = fake_exec(handler)
+    controller = AsyncAndroidController("adb")
+    controller.launch_settle = False
+
+    assert asyncio.run(controller.open_app("微信"))
+    assert calls[0] == ["adb", "shell", "monkey -p com.tencent.mm -c android.intent.category.LAUNCHER 1"]
+    assert len(polls) == 3
+    assert controller.last_launch_latency is not None
+    assert controller.last_launch_latency < 3
+
+
+def test_harmonyos_foreground_package_parses_ability_dump(fake_exec):
+    dump = b"""
+    bundle name [com.huawei.hmos.photos]
+    state #BACKGROUND
+    bundle name [com.sina.weibo]
+    state #FOREGROUND
+    """
+    calls = fake_exec(lambda argv: (0, dump, b""))
+    controller = AsyncHarmonyOSController("hdc", device_id="ABC")
+    assert asyncio.run(controller.get_foreground_package()) == "com.sina.weibo"
+    assert calls == [["hdc", "-t", "ABC", "shell", "aa dump -l"]]
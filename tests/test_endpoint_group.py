@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from mock_openai_server import MockOpenAIServer
+from utils.endpoint_group import EndpointGroup, get_endpoint_group, parse_base_urls
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def make(name, **kwargs):
+        server = MockOpenAIServer(name, **kwargs).start()
+        started.append(server)
+        return server
+
+    yield make
+    for server in started:
+        server.stop()
+
+
+def complete(group, session=None):
+    create = lambda client: client.chat.completions.create(
+        model="mock", messages=[{"role": "user", "content": "hi"}], timeout=5)
+    result, endpoint = group.call(create, session=session)
+    return result.choices[0].message.content
+
+
+def try_complete(group, session=None):
+    try:
+        return complete(group, session)
+    except Exception:
+        return None
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_least_outstanding_routes_around_busy_endpoint(servers):
+    a, b = servers("a"), servers("b")
+    a.block()
+    b.block()
+    group = EndpointGroup([a.base_url, b.base_url], "key")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(complete(group))) for _ in range(2)]
+    threads[0].start()
+    assert wait_until(lambda: a.in_flight + b.in_flight == 1)
+    threads[1].start()
+    assert wait_until(lambda: a.in_flight + b.in_flight == 2)
+    # 第二个请求避开了已有在途请求的端点
+    assert (a.in_flight, b.in_flight) == (1, 1)
+    a.release()
+    b.release()
+    for thread in threads:
+        thread.join(5)
+    assert sorted(results) == ["a", "b"]
+    assert all(endpoint.outstanding == 0 for endpoint in group.endpoints)
+
+
+def test_latency_routing_prefers_faster_endpoint(servers):
+    slow, fast = servers("slow", delay=0.2), servers("fast")
+    group = EndpointGroup([slow.base_url, fast.base_url], "key", routing="latency")
+    results = [complete(group) for _ in range(10)]
+    # 每个端点先各试一次取得延迟样本，之后都发往较快的端点
+    assert slow.completions == 1
+    assert results.count("fast") == 9
+    slow_endpoint, fast_endpoint = group.endpoints
+    assert slow_endpoint.latency > fast_endpoint.latency
+
+
+def test_eject_after_consecutive_retryable_failures(servers):
+    bad, good = servers("bad", status=503), servers("good")
+    group = EndpointGroup([bad.base_url, good.base_url], "key", eject_after=3, probe_interval=60)
+    for _ in range(20):
+        if not group.endpoints[0].healthy:
+            break
+        try_complete(group)
+    assert not group.endpoints[0].healthy
+    assert bad.completions == 3
+    assert [complete(group) for _ in range(5)] == ["good"] * 5
+    assert bad.completions == 3
+
+
+def test_non_retryable_errors_do_not_eject():
+    class BadRequest(Exception):
+        status_code = 400
+
+    group = EndpointGroup(["http://127.0.0.1:9/v1"], "key", eject_after=1)
+    endpoint = group.acquire()
+    group.release(endpoint, error=BadRequest())
+    assert endpoint.healthy
+    assert endpoint.consecutive_failures == 0
+
+
+def test_probe_readmits_recovered_endpoint(servers):
+    bad, good = servers("bad", status=503), servers("good")
+    group = EndpointGroup([bad.base_url, good.base_url], "key", eject_after=3, probe_interval=0.1)
+    for _ in range(20):
+        if not group.endpoints[0].healthy:
+            break
+        try_complete(group)
+    bad_endpoint = group.endpoints[0]
+    assert not bad_endpoint.healthy
+
+    # 仍然失败时探活不会重新加入
+    time.sleep(0.15)
+    complete(group)
+    assert wait_until(lambda: bad.model_probes >= 1 and not bad_endpoint.probing)
+    assert not bad_endpoint.healthy
+
+    bad.status = 200
+    time.sleep(0.15)
+    complete(group)
+    assert wait_until(lambda: bad_endpoint.healthy)
+    assert bad.model_probes >= 2
+    results = {complete(group) for _ in range(4)}
+    assert "bad" in results
+
+
+def test_sticky_sessions_stay_on_one_endpoint(servers):
+    a, b = servers("a"), servers("b")
+    group = EndpointGroup([a.base_url, b.base_url], "key", sticky=True, eject_after=3, probe_interval=60)
+    first = {complete(group, session="task-1") for _ in range(6)}
+    second = {complete(group, session="task-2") for _ in range(6)}
+    assert len(first) == 1 and len(second) == 1
+    # 新会话按负载选择了另一个端点
+    assert first != second
+
+    # 粘滞的端点被摘除后，会话改选其他端点并继续粘滞
+    sticky_server = a if first == {"a"} else b
+    sticky_server.status = 503
+    for _ in range(3):
+        assert try_complete(group, session="task-1") is None
+    moved = {complete(group, session="task-1") for _ in range(4)}
+    assert moved == second
+
+
+def test_get_endpoint_group_is_shared_per_url_list(servers):
+    a, b = servers("a"), servers("b")
+    spec = f"{a.base_url}, {b.base_url},{a.base_url}"
+    assert parse_base_urls(spec) == [a.base_url, b.base_url]
+    group = get_endpoint_group(spec, "key")
+    assert get_endpoint_group([a.base_url, b.base_url], "key") is group
+    assert get_endpoint_group([a.base_url, b.base_url], "key", routing="latency") is not group
+    assert group.base_urls == [a.base_url, b.base_url]
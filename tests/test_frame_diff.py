@@ -0,0 +1,86 @@
+import json
+
+from PIL import Image, ImageDraw
+
+from utils.frame import Frame
+from utils.frame_diff import NoChangeDetector, STATUS_BAR_RATIO, frame_dhash, hash_distance
+
+SIZE = (1080, 2400)
+
+
+def screen(status_text="12:00", battery=0.9, checkbox=False, scroll=0):
+    image = Image.new("RGB", SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    # 状态栏
+    draw.rectangle((0, 0, SIZE[0], int(SIZE[1] * STATUS_BAR_RATIO) - 1), fill=(30, 30, 30))
+    draw.text((40, 30), status_text, fill="white")
+    draw.rectangle((600, 20, 600 + int(440 * battery), 70), fill="white")
+    # 列表内容
+    for i in range(12):
+        top = 200 + i * 180 - scroll
+        draw.rectangle((60, top, 1020, top + 120), fill=(200 - i * 10, 180, 160 + i * 5))
+    if checkbox:
+        draw.rectangle((900, 1200, 960, 1260), fill="black")
+    return Frame(image)
+
+
+def test_identical_frames():
+    a, b = screen(), screen()
+    assert hash_distance(a, b) == 0
+    unchanged, metrics = NoChangeDetector().check({"action": "click"}, a, b)
+    assert unchanged
+    assert metrics == {"hash_distance": 0, "changed_ratio": 0.0}
+
+
+def test_status_bar_changes_are_ignored():
+    a, b = screen(status_text="12:00", battery=0.9), screen(status_text="12:01 5G", battery=0.2)
+    # 不排除状态栏时，这样的变化足以改变哈希
+    assert (frame_dhash(a, ignore_top=0) != frame_dhash(b, ignore_top=0)).any()
+    assert hash_distance(a, b) == 0
+    assert NoChangeDetector().check({"action": "click"}, a, b)[0]
+
+
+def test_small_control_change_is_detected():
+    a, b = screen(), screen(checkbox=True)
+    unchanged, metrics = NoChangeDetector().check({"action": "click"}, a, b)
+    assert not unchanged
+    assert metrics["changed_ratio"] > 0
+
+
+def test_scroll_changes_hash():
+    a, b = screen(), screen(scroll=90)
+    assert hash_distance(a, b) > 0
+    assert not NoChangeDetector().check({"action": "swipe"}, a, b)[0]
+
+
+def test_hash_threshold_allows_small_distances():
+    a, b = screen(), screen(scroll=90)
+    distance = hash_distance(a, b)
+    detector = NoChangeDetector(hash_threshold=distance, changed_ratio_threshold=1.0)
+    assert detector.check({"action": "swipe"}, a, b)[0]
+    detector = NoChangeDetector(hash_threshold=distance - 1, changed_ratio_threshold=1.0)
+    assert not detector.check({"action": "swipe"}, a, b)[0]
+
+
+def test_dhash_is_cached_on_frame():
+    frame = screen()
+    assert frame_dhash(frame) is frame_dhash(frame)
+    assert frame_dhash(frame).size == 256
+
+
+def test_skipped_actions_and_mismatched_frames():
+    detector = NoChangeDetector()
+    a = screen()
+    assert detector.check({"action": "wait"}, a, screen()) == (False, None)
+    assert detector.check("click", a, None) == (False, None)
+    small = Frame(Image.new("RGB", (540, 1200), "white"))
+    assert detector.check({"action": "click"}, a, small) == (False, None)
+
+
+def test_audit_log(tmp_path):
+    path = tmp_path / "audit" / "no_change.jsonl"
+    detector = NoChangeDetector(audit_path=str(path))
+    detector.check({"action": "click"}, screen(), screen(), step=3)
+    detector.check({"action": "click"}, screen(), screen(checkbox=True), step=4)
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["step"], r["reflector_skipped"]) for r in records] == [(3, True), (4, False)]
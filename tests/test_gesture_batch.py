@@ -0,0 +1,72 @@
+import base64
+import subprocess
+import sys
+
+import pytest
+
+from utils.gesture_batch import GestureBatch
+
+# 把设备端命令替换为打印参数的 shell 函数，检查脚本经设备 shell 解析后的实际参数
+DEVICE_STUBS = (
+    "input() { printf '%s\\n' \"input $*\"; }; "
+    "am() { printf '%s\\n' \"am $*\"; }; "
+    "uitest() { printf '%s\\n' \"uitest $*\"; }; "
+    "sleep() { printf '%s\\n' \"sleep $*\"; }; "
+)
+
+
+def run_on_shell(script):
+    result = subprocess.run(["/bin/sh", "-c", DEVICE_STUBS + script], capture_output=True, text=True, timeout=10)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.splitlines()
+
+
+def test_android_commands():
+    batch = GestureBatch("android").tap(10, 20).tap(1, 2, duration_ms=200).swipe(0, 0, 5, 5).keyevent(4).sleep(0.1)
+    assert batch.to_commands() == [
+        "input tap 10 20",
+        "input swipe 1 2 3 4 200",
+        "input swipe 0 0 5 5 500",
+        "input keyevent 4",
+        "sleep 0.1",
+    ]
+    assert batch.to_script() == " ; ".join(batch.to_commands())
+
+
+def test_empty_text_and_zero_sleep_are_dropped():
+    assert len(GestureBatch().text("").ime_text("").sleep(0)) == 0
+
+
+def test_unknown_dialect():
+    with pytest.raises(ValueError):
+        GestureBatch("ios")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+def test_android_text_is_quoted_for_device_shell():
+    text = "a b;rm -rf /tmp/x 'q' \"d\" $HOME `id` |&"
+    batch = GestureBatch("android").text(text).tap(1, 1)
+    lines = run_on_shell(batch.to_script())
+    # 空格转为 %s，其余字符原样到达 input text，后续命令照常执行
+    assert lines == ["input text " + text.replace(" ", "%s"), "input tap 1 1"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+def test_android_non_ascii_text_uses_base64_broadcast():
+    lines = run_on_shell(GestureBatch("android").text("你好 world").ime_text("ok").to_script())
+    assert len(lines) == 2
+    for line, expected in zip(lines, ["你好 world", "ok"]):
+        prefix = "am broadcast -a ADB_INPUT_B64 --es msg "
+        assert line.startswith(prefix)
+        assert base64.b64decode(line[len(prefix):]).decode("utf-8") == expected
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+def test_harmonyos_commands_and_quoting():
+    batch = GestureBatch("harmonyos").tap(1, 2).tap(3, 4, duration_ms=800).keyevent("Back").text("中文 a;b 'c'")
+    assert run_on_shell(batch.to_script()) == [
+        "uitest uiInput click 1 2",
+        "uitest uiInput longClick 3 4",
+        "uitest uiInput keyEvent Back",
+        "uitest uiInput inputText 1 1 中文 a;b 'c'",
+    ]
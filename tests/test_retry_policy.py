@@ -0,0 +1,124 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import utils.retry_policy as retry_policy
+from utils.retry_policy import RetryPolicy, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(retry_policy.time, "sleep", slept.append)
+    return slept
+
+
+def failing(errors, result="ok"):
+    """依次抛出 errors 中的异常，之后返回 result；记录每次收到的 timeout"""
+    timeouts = []
+
+    def request(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) <= len(errors):
+            raise errors[len(timeouts) - 1]
+        return result
+    return request, timeouts
+
+
+@pytest.mark.parametrize("error, expected", [
+    (StatusError(429), True),
+    (StatusError(408), True),
+    (StatusError(500), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (StatusError(404), False),
+    (APIConnectionError("reset"), True),
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (ValueError("bad json"), False),
+])
+def test_is_retryable(error, expected):
+    assert is_retryable(error) is expected
+
+
+def test_status_code_on_response():
+    error = Exception("http error")
+    error.response = SimpleNamespace(status_code=502)
+    assert is_retryable(error)
+    error.response = SimpleNamespace(status_code=422)
+    assert not is_retryable(error)
+
+
+def test_retries_until_success(sleeps):
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0, multiplier=2.0, jitter=0.0)
+    request, _ = failing([StatusError(503), APIConnectionError()])
+    result, stats = policy.execute(request)
+    assert result == "ok"
+    assert stats["attempts"] == 3
+    assert stats["error"] is None and stats["gave_up"] is None
+    assert sleeps == [1.0, 2.0]
+    assert stats["retry_wait_seconds"] == 3.0
+
+
+def test_non_retryable_error_fails_fast(sleeps):
+    request, timeouts = failing([StatusError(400)])
+    result, stats = RetryPolicy().execute(request)
+    assert result is None
+    assert stats["gave_up"] == "fatal"
+    assert len(timeouts) == 1 and sleeps == []
+    assert "StatusError" in stats["error"]
+
+
+def test_max_attempts(sleeps):
+    request, timeouts = failing([StatusError(503)] * 10)
+    result, stats = RetryPolicy(max_attempts=3, jitter=0.0).execute(request)
+    assert result is None
+    assert stats["gave_up"] == "max_attempts"
+    assert len(timeouts) == 3 and len(sleeps) == 2
+
+
+def test_backoff_is_capped_and_jittered():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, multiplier=3.0, jitter=0.5)
+    for i in range(6):
+        delay = policy.backoff(i)
+        cap = min(5.0, 3.0 ** i)
+        assert cap * 0.5 <= delay <= cap
+
+
+def test_expired_task_deadline_makes_no_attempt(sleeps):
+    request, timeouts = failing([])
+    result, stats = RetryPolicy().execute(request, task_deadline=time.time() - 1)
+    assert result is None
+    assert stats["gave_up"] == "deadline" and stats["attempts"] == 0
+    assert timeouts == []
+
+
+def test_request_timeout_shrinks_to_remaining_time(sleeps):
+    request, timeouts = failing([])
+    RetryPolicy(request_timeout=60.0).execute(request, task_deadline=time.time() + 2.0)
+    assert 0 < timeouts[0] <= 2.0
+    request, timeouts = failing([])
+    RetryPolicy(request_timeout=60.0, call_deadline=5.0).execute(request)
+    assert 0 < timeouts[0] <= 5.0
+
+
+def test_does_not_sleep_past_deadline(sleeps):
+    # 下一次重试前的等待会越过截止时间：直接放弃，不再等待
+    policy = RetryPolicy(max_attempts=5, base_delay=10.0, jitter=0.0)
+    request, timeouts = failing([StatusError(503)] * 5)
+    result, stats = policy.execute(request, task_deadline=time.time() + 3.0)
+    assert result is None
+    assert stats["gave_up"] == "deadline"
+    assert len(timeouts) == 1 and sleeps == []
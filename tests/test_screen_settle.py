@@ -0,0 +1,78 @@
+import time
+
+from PIL import Image
+
+from utils.frame import Frame
+from utils.screen_settle import wait_for_stable_screen
+
+
+def screen(shade):
+    return Image.new("RGB", (108, 240), (shade, shade, shade))
+
+
+class FakeController:
+    """capture_preview 依次返回脚本中的画面（脚本用完后重复最后一个），capture 返回完整截图"""
+
+    def __init__(self, shades, preview=True):
+        self.shades = list(shades)
+        self.preview = preview
+        self.previews = 0
+        self.captures = 0
+
+    def capture_preview(self):
+        shade = self.shades[min(self.previews, len(self.shades) - 1)]
+        self.previews += 1
+        return Frame(screen(shade), timestamp=time.time(), preview=self.preview)
+
+    def capture(self):
+        self.captures += 1
+        return Frame(screen(255), timestamp=time.time())
+
+
+def test_returns_after_stable_frames():
+    controller = FakeController([0, 80, 160, 160, 160, 160, 160, 160])
+    frame, settle_time, stable = wait_for_stable_screen(
+        controller, min_wait=0.0, max_wait=2.0, interval=0.01, stable_frames=3)
+    assert stable
+    # 前三帧各不相同，之后连续 3 帧相同即返回，不再继续轮询
+    assert controller.previews == 5
+    assert settle_time < 1.0
+
+
+def test_honors_max_wait_when_frames_keep_changing():
+    controller = FakeController([i * 40 % 256 for i in range(1000)])
+    start = time.time()
+    frame, waited, stable = wait_for_stable_screen(
+        controller, min_wait=0.0, max_wait=0.2, interval=0.01, stable_frames=2)
+    elapsed = time.time() - start
+    assert not stable
+    assert frame is not None
+    assert 0.2 <= waited <= elapsed < 0.5
+
+
+def test_returns_full_frame_instead_of_preview():
+    controller = FakeController([100])
+    frame, _, stable = wait_for_stable_screen(
+        controller, min_wait=0.0, max_wait=1.0, interval=0.01, stable_frames=2)
+    assert stable
+    assert controller.captures == 1
+    assert not frame.preview
+    assert frame.image.getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_full_frame_also_returned_on_timeout():
+    controller = FakeController([i * 40 % 256 for i in range(1000)])
+    frame, _, stable = wait_for_stable_screen(
+        controller, min_wait=0.0, max_wait=0.1, interval=0.01)
+    assert not stable
+    assert controller.captures == 1
+    assert not frame.preview
+
+
+def test_full_frames_are_not_captured_twice():
+    controller = FakeController([100], preview=False)
+    frame, _, stable = wait_for_stable_screen(
+        controller, min_wait=0.0, max_wait=1.0, interval=0.01)
+    assert stable
+    assert controller.captures == 0
+    assert frame.image.getpixel((0, 0)) == (100, 100, 100)
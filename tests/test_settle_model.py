@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from utils.settle_model import DEFAULT_SETTLE_WINDOWS, LAUNCH_ACTION, SettleTimeModel, normalize_action
+
+
+@pytest.fixture
+def stats_path(tmp_path):
+    return str(tmp_path / "settle_stats.json")
+
+
+def record_all(model, package, action, values):
+    for value in values:
+        model.record(package, action, value)
+
+
+def test_normalize_action_maps_aliases():
+    assert normalize_action("open") == "open_app"
+    assert normalize_action("long_press") == "click"
+    assert normalize_action("swipe") == "swipe"
+    assert normalize_action(LAUNCH_ACTION) == LAUNCH_ACTION
+
+
+def test_default_windows_without_samples(stats_path):
+    model = SettleTimeModel(stats_path)
+    assert model.window("com.tencent.mm", "click") == DEFAULT_SETTLE_WINDOWS["default"]
+    assert model.window("com.tencent.mm", "open") == DEFAULT_SETTLE_WINDOWS["open_app"]
+    assert model.window("com.tencent.mm", "click", (0.5, 2.0)) == (0.5, 2.0)
+
+
+def test_too_few_samples_keep_default_window(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "click", [1.0] * 4)
+    assert model.percentiles("com.tencent.mm", "click") is None
+    assert model.window("com.tencent.mm", "click", (0.3, 3.0)) == (0.3, 3.0)
+
+
+def test_window_starts_at_p50_times_start_factor(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "click", [0.4, 0.8, 1.0, 1.2, 1.6])
+    p50, p99, count = model.percentiles("com.tencent.mm", "click")
+    assert p50 == pytest.approx(1.0)
+    assert count == 5
+    min_wait, max_wait = model.window("com.tencent.mm", "click")
+    assert min_wait == pytest.approx(0.75)
+    assert max_wait == pytest.approx(p99)
+
+
+def test_max_wait_keeps_margin_over_start(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "click", [1.0] * 5)
+    min_wait, max_wait = model.window("com.tencent.mm", "click")
+    assert min_wait == pytest.approx(0.75)
+    # p99 与 p50 相同时仍在开始检测后留出 0.5 秒
+    assert max_wait == pytest.approx(1.25)
+
+
+def test_max_wait_capped_at_15_seconds(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", LAUNCH_ACTION, [2.0, 2.0, 2.0, 2.0, 40.0])
+    _, p99, _ = model.percentiles("com.tencent.mm", LAUNCH_ACTION)
+    assert p99 > 15.0
+    _, max_wait = model.window("com.tencent.mm", LAUNCH_ACTION)
+    assert max_wait == 15.0
+
+
+def test_unknown_package_falls_back_to_action_summary(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "click", [1.0] * 3)
+    record_all(model, "com.sina.weibo", "click", [2.0] * 3)
+    # 单个应用样本不足，使用该动作跨应用的汇总
+    p50, _, count = model.percentiles("com.tencent.mm", "click")
+    assert count == 6
+    assert p50 == pytest.approx(1.5)
+    assert model.percentiles("com.xingin.xhs", "click") == model.percentiles(None, "click")
+
+
+def test_aliases_share_statistics(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "long_press", [0.8] * 5)
+    assert model.window("com.tencent.mm", "click") == model.window("com.tencent.mm", "long_press")
+
+
+def test_samples_persist_across_instances(stats_path):
+    model = SettleTimeModel(stats_path, min_samples=5)
+    record_all(model, "com.tencent.mm", "click", [0.4, 0.8, 1.0, 1.2, 1.6])
+    with open(stats_path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["samples"]["com.tencent.mm|click"] == [0.4, 0.8, 1.0, 1.2, 1.6]
+    assert len(data["samples"]["*|click"]) == 5
+
+    reloaded = SettleTimeModel(stats_path, min_samples=5)
+    assert reloaded.window("com.tencent.mm", "click") == model.window("com.tencent.mm", "click")
+
+
+def test_max_samples_keeps_most_recent(stats_path):
+    model = SettleTimeModel(stats_path, max_samples=3)
+    record_all(model, "com.tencent.mm", "click", [1, 2, 3, 4, 5])
+    assert model.samples["com.tencent.mm|click"] == [3.0, 4.0, 5.0]
+
+
+def test_corrupt_stats_file_starts_empty(stats_path):
+    with open(stats_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    model = SettleTimeModel(stats_path)
+    assert model.samples == {}
+    assert model.window("com.tencent.mm", "click") == DEFAULT_SETTLE_WINDOWS["default"]
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.stream_parser import ROLE_SECTIONS, SectionStreamParser
+
+EXECUTOR_OUTPUT = (
+    "### Thought ###\nThe search box is at the top.\n\n"
+    "### Action ###\n{\"action\": \"click\", \"coordinate\": [540, 120]}\n\n"
+    "### Description ###\nTap the search box.\n\n"
+    "### Extra ###\nrambling that should be cut off\n"
+)
+
+
+def feed_until_complete(parser, text, chunk=3):
+    for i in range(0, len(text), chunk):
+        if parser.feed(text[i:i + chunk]):
+            return i + chunk
+    return None
+
+
+def test_executor_sections_complete_after_last_section_paragraph():
+    parser = SectionStreamParser(ROLE_SECTIONS["executor"])
+    consumed = feed_until_complete(parser, EXECUTOR_OUTPUT)
+    assert consumed is not None
+    # 在末尾分段的空行处结束，不需要等模型写完多余的内容
+    assert consumed <= EXECUTOR_OUTPUT.index("### Extra")
+    assert parser.result() == EXECUTOR_OUTPUT[:EXECUTOR_OUTPUT.index("### Extra") - 1]
+
+
+def test_incomplete_until_last_section_has_content_and_blank_line():
+    parser = SectionStreamParser(ROLE_SECTIONS["executor"])
+    assert not parser.feed("### Thought ###\nthink\n### Action ###\n{}\n")
+    assert parser.section_end("Thought") is not None
+    assert parser.section_end("Action") is None
+    assert not parser.feed("### Description ###\n\n")
+    assert not parser.feed("Tap it.")
+    assert parser.feed("\n\n")
+
+
+def test_headers_without_closing_hashes():
+    parser = SectionStreamParser(ROLE_SECTIONS["reflector"])
+    assert not parser.feed("### Outcome\nA\n### Error Description\nNone")
+    # 流结束但末尾分段没有空行：不算写完，返回全部文本
+    assert parser.result() == "### Outcome\nA\n### Error Description\nNone"
+    assert parser.feed("\n\n")
+    assert parser.result() == "### Outcome\nA\n### Error Description\nNone\n"
+
+
+def test_required_subset():
+    parser = SectionStreamParser(ROLE_SECTIONS["executor"], required=("Thought",))
+    assert parser.feed("### Thought ###\nx\n### Action ###\n")
+    assert parser.result() == "### Thought ###\nx\n"
+
+
+def fake_stream(text, chunk=4, usage=None):
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + chunk]))], usage=None)
+              for i in range(0, len(text), chunk)]
+    chunks.append(SimpleNamespace(choices=[], usage=usage))
+
+    class Stream:
+        closed = False
+        consumed = 0
+
+        def __iter__(self):
+            for item in chunks:
+                Stream.consumed += 1
+                yield item
+
+        def close(self):
+            Stream.closed = True
+
+    return Stream, len(chunks)
+
+
+def test_streaming_call_stops_early():
+    call_mobile_agent_e = pytest.importorskip("utils.call_mobile_agent_e", exc_type=ImportError)
+    stream_cls, total_chunks = fake_stream(EXECUTOR_OUTPUT + "more text\n" * 50)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        create=lambda **kwargs: stream_cls())))
+    wrapper = call_mobile_agent_e.GUIOwlWrapper.__new__(call_mobile_agent_e.GUIOwlWrapper)
+    wrapper.model = "mock"
+    completion = wrapper._create_streaming(client, [], 5, "executor")
+    assert completion.early_stopped
+    assert completion.content == EXECUTOR_OUTPUT[:EXECUTOR_OUTPUT.index("### Extra") - 1]
+    assert stream_cls.closed
+    assert stream_cls.consumed < total_chunks
@@ -0,0 +1,39 @@
+from utils.gesture_batch import GestureBatch
+from utils.text_input import ENTER_KEYCODES, fill_batch, split_runs
+
+
+def test_ascii_and_ime_runs_are_split():
+    assert split_runs("hi 你好ok") == [("text", "hi "), ("ime", "你好"), ("text", "ok")]
+
+
+def test_control_characters_go_through_ime():
+    assert split_runs("a\tb") == [("text", "a"), ("ime", "\t"), ("text", "b")]
+
+
+def test_percent_s_is_split_after_percent():
+    # 字面量 "%s" 不能整段交给 input text，否则会被当作空格
+    assert split_runs("100%sure") == [("text", "100%"), ("text", "sure")]
+    assert split_runs("%s%s") == [("text", "%"), ("text", "s%"), ("text", "s")]
+    assert split_runs("50% off") == [("text", "50% off")]
+
+
+def test_newlines_become_enter():
+    assert split_runs("a\nb") == [("text", "a"), ("enter", None), ("text", "b")]
+    assert split_runs("a\\nb") == split_runs("a\nb")
+    assert split_runs("a\r\n\nb") == [("text", "a"), ("enter", None), ("enter", None), ("text", "b")]
+
+
+def test_long_runs_are_chunked():
+    runs = split_runs("x" * 450, max_run=200)
+    assert [len(payload) for _, payload in runs] == [200, 200, 50]
+    assert "".join(payload for _, payload in runs) == "x" * 450
+
+
+def test_harmonyos_keeps_mixed_text_in_one_run():
+    assert split_runs("hi 你好%s", dialect="harmonyos") == [("text", "hi 你好%s")]
+
+
+def test_fill_batch():
+    batch = GestureBatch("android")
+    assert fill_batch(batch, "ab\n中") == 3
+    assert batch.steps == [("text", "ab"), ("keyevent", ENTER_KEYCODES["android"]), ("ime_text", "中")]
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+
+from utils import android_controller
+from utils.android_controller import AndroidController
+from utils.ui_events import UiEventListener
+
+
+class FakeStdout:
+    """按需写入的事件输出，readline 在没有数据时阻塞，写入 None 表示进程退出"""
+
+    def __init__(self):
+        self.lines = queue.Queue()
+
+    def feed(self, line):
+        self.lines.put(line.encode("utf-8") + b"\n")
+
+    def close(self):
+        self.lines.put(None)
+
+    def readline(self):
+        line = self.lines.get()
+        return b"" if line is None else line
+
+
+class FakeProcess:
+    def __init__(self):
+        self.stdout = FakeStdout()
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def exit(self):
+        self.returncode = 0
+        self.stdout.close()
+
+    def kill(self):
+        self.exit()
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+
+def event_line(event_type, package="com.tencent.mm"):
+    return f"EventType: {event_type}; EventTime: 123; PackageName: {package}; MovementGranularity: 0"
+
+
+def attach(listener):
+    process = FakeProcess()
+    listener.process = process
+    threading.Thread(target=listener._read_loop, args=(process,), daemon=True).start()
+    return process
+
+
+def wait_for_seq(listener, seq, timeout=2.0):
+    deadline = time.time() + timeout
+    while listener.mark() < seq and time.time() < deadline:
+        time.sleep(0.005)
+    return listener.mark() >= seq
+
+
+def test_parser_keeps_subscribed_events_with_package():
+    listener = UiEventListener("adb")
+    process = attach(listener)
+    process.stdout.feed(event_line("TYPE_WINDOW_STATE_CHANGED"))
+    process.stdout.feed(event_line("TYPE_VIEW_FOCUSED"))
+    process.stdout.feed("some unrelated output")
+    process.stdout.feed(event_line("TYPE_VIEW_SCROLLED", package="com.sina.weibo"))
+    assert wait_for_seq(listener, 2)
+    events = listener.events_since(0)
+    assert [(seq, event_type, package) for seq, _, event_type, package in events] == [
+        (1, "TYPE_WINDOW_STATE_CHANGED", "com.tencent.mm"),
+        (2, "TYPE_VIEW_SCROLLED", "com.sina.weibo"),
+    ]
+    assert listener.events_since(1)[0][0] == 2
+    process.exit()
+
+
+def test_wait_for_quiet_without_events_reports_no_change():
+    listener = UiEventListener("adb")
+    process = attach(listener)
+    mark = listener.mark()
+    start = time.time()
+    changed, waited = listener.wait_for_quiet(mark, quiet_ms=50, timeout=1.0, first_event_timeout=0.2)
+    assert not changed
+    assert 0.2 <= waited < 0.5
+    assert time.time() - start < 0.5
+    process.exit()
+
+
+def test_wait_for_quiet_returns_after_quiet_period():
+    listener = UiEventListener("adb")
+    process = attach(listener)
+    mark = listener.mark()
+
+    def burst():
+        for _ in range(3):
+            time.sleep(0.05)
+            process.stdout.feed(event_line("TYPE_WINDOW_CONTENT_CHANGED"))
+
+    threading.Thread(target=burst, daemon=True).start()
+    start = time.time()
+    changed, settle_time = listener.wait_for_quiet(mark, quiet_ms=150, timeout=2.0, first_event_timeout=1.0)
+    elapsed = time.time() - start
+    assert changed
+    # 稳定时间是最后一个事件的时刻，返回发生在其后 quiet_ms 之后
+    assert 0.1 <= settle_time < 0.4
+    assert elapsed >= settle_time + 0.15
+    assert elapsed < 1.0
+    process.exit()
+
+
+def test_wait_for_quiet_honors_timeout_when_events_continue():
+    listener = UiEventListener("adb")
+    process = attach(listener)
+    mark = listener.mark()
+    stop = threading.Event()
+
+    def stream():
+        while not stop.is_set():
+            process.stdout.feed(event_line("TYPE_WINDOW_CONTENT_CHANGED"))
+            time.sleep(0.02)
+
+    threading.Thread(target=stream, daemon=True).start()
+    changed, waited = listener.wait_for_quiet(mark, quiet_ms=200, timeout=0.4, first_event_timeout=1.0)
+    stop.set()
+    assert changed
+    assert 0.4 <= waited < 0.8
+    process.exit()
+
+
+def test_wait_for_quiet_returns_when_listener_exits():
+    listener = UiEventListener("adb")
+    process = attach(listener)
+    threading.Timer(0.05, process.exit).start()
+    start = time.time()
+    changed, _ = listener.wait_for_quiet(listener.mark(), quiet_ms=50, timeout=2.0, first_event_timeout=2.0)
+    assert not changed
+    assert time.time() - start < 1.0
+
+
+class FakeListener:
+    def __init__(self, *args, **kwargs):
+        self.running = False
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def is_running(self):
+        return self.running
+
+
+class BrokenU2:
+    @property
+    def info(self):
+        raise RuntimeError("UiAutomation already connected")
+
+
+class HealthyU2:
+    info = {"sdkInt": 33}
+
+
+def make_controller(u2_device):
+    controller = AndroidController.__new__(AndroidController)
+    controller.adb_path = "adb"
+    controller.device_id = None
+    controller.u2_device = u2_device
+    controller.session = None
+    controller.ui_events = None
+    return controller
+
+
+def test_events_refused_when_u2_breaks(monkeypatch):
+    monkeypatch.setattr(android_controller, "UiEventListener", FakeListener)
+    controller = make_controller(BrokenU2())
+    assert not controller.start_ui_events()
+    assert controller.ui_events is None
+    assert not controller.ui_events_running()
+
+
+def test_events_kept_when_u2_stays_healthy(monkeypatch):
+    monkeypatch.setattr(android_controller, "UiEventListener", FakeListener)
+    controller = make_controller(HealthyU2())
+    assert controller.start_ui_events()
+    assert controller.ui_events_running()
@@ -0,0 +1,165 @@
+import queue
+import subprocess
+import threading
+import time
+import uuid
+
+
+class AdbShellSession:
+    """
+    常驻的 `adb -s <serial> shell` 会话
+    通过 stdin 发送命令，并在每条命令后追加结束标记（包含退出码），
+    从 stdout 中解析标记来判断命令完成，从而避免每次操作都重新启动
+    /bin/sh 和 adb 客户端握手的开销。
+    """
+
+    def __init__(self, adb_path, device_id=None, command_timeout=15):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.command_timeout = command_timeout
+        self.process = None
+        self._lines = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _base_args(self):
+        args = [self.adb_path]
+        if self.device_id:
+            args += ["-s", self.device_id]
+        return args
+
+    def start(self):
+        """启动 shell 会话，成功返回 True"""
+        self.close()
+        try:
+            self.process = subprocess.Popen(
+                self._base_args() + ["shell"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+        except Exception as e:
+            print(f"[ADB_SHELL] Warning: failed to start shell session: {e}")
+            self.process = None
+            return False
+
+        # 后台线程持续读取输出，主线程通过队列按超时等待
+        self._lines = queue.Queue()
+        self._reader = threading.Thread(
+            target=self._read_loop, args=(self.process, self._lines), daemon=True
+        )
+        self._reader.start()
+
+        # 用一个空命令确认会话已可用
+        code, _ = self._execute("true", timeout=self.command_timeout)
+        if code != 0:
+            print("[ADB_SHELL] Warning: shell session did not respond, closing it")
+            self.close()
+            return False
+        return True
+
+    @staticmethod
+    def _read_loop(process, lines):
+        try:
+            for raw in iter(process.stdout.readline, b""):
+                lines.put(raw.decode("utf-8", errors="replace"))
+        except Exception:
+            pass
+        lines.put(None)  # EOF：会话已退出
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _execute(self, command, timeout):
+        marker = f"__MA_DONE_{uuid.uuid4().hex[:12]}__"
+        try:
+            self.process.stdin.write(f"{command}; echo {marker}$?\n".encode("utf-8"))
+            self.process.stdin.flush()
+        except Exception as e:
+            print(f"[ADB_SHELL] Warning: write to shell session failed: {e}")
+            return None, ""
+
+        output = []
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"[ADB_SHELL] Warning: command timed out after {timeout}s: {command}")
+                return None, "".join(output)
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                return None, "".join(output)
+            idx = line.find(marker)
+            if idx >= 0:
+                if idx > 0:
+                    output.append(line[:idx])
+                try:
+                    code = int(line[idx + len(marker):].strip())
+                except ValueError:
+                    code = None
+                return code, "".join(output)
+            output.append(line)
+
+    def run(self, command, timeout=None):
+        """
+        在会话中执行一条 shell 命令
+        :return: (returncode, output)；会话失效时 returncode 为 None
+        """
+        with self._lock:
+            if not self.is_alive() and not self.start():
+                return None, ""
+            code, output = self._execute(command, timeout or self.command_timeout)
+            if code is None:
+                # 超时或会话断开后，输出流状态不可信，直接丢弃该会话
+                self.close()
+            return code, output
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except Exception:
+                pass
+            try:
+                self.process.kill()
+                self.process.wait(timeout=2)
+            except Exception:
+                pass
+        self.process = None
+
+
+class AdbShellPool:
+    """
+    一组 AdbShellSession，按轮询方式分配，
+    允许多个线程（如截图与手势）同时向同一设备发送命令
+    """
+
+    def __init__(self, adb_path, device_id=None, size=1, command_timeout=15):
+        self.sessions = [
+            AdbShellSession(adb_path, device_id, command_timeout) for _ in range(max(1, size))
+        ]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _pick(self):
+        with self._lock:
+            # 优先选择当前空闲的会话
+            for offset in range(len(self.sessions)):
+                session = self.sessions[(self._next + offset) % len(self.sessions)]
+                if not session._lock.locked():
+                    self._next = (self._next + offset + 1) % len(self.sessions)
+                    return session
+            session = self.sessions[self._next]
+            self._next = (self._next + 1) % len(self.sessions)
+            return session
+
+    def run(self, command, timeout=None):
+        return self._pick().run(command, timeout)
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
@@ -1,7 +1,19 @@
 import os
+import io
+import re
 import time
+import functools
 import subprocess
+from PIL import Image
 from .controller import Controller
+from .adb_shell import AdbShellPool
+from .screencap import raw_to_image
+from .frame_stream import FrameStream
+from .frame import Frame
+from .gesture_batch import GestureBatch
+from .text_input import fill_batch
+from .device_session import get_device_session
+from .ui_events import UiEventListener
 
 try:
     import uiautomator2 as u2
@@ -10,56 +22,409 @@ except ImportError:
     U2_AVAILABLE = False
     print("Warning: uiautomator2 not installed. Chinese input will require ADB Keyboard.")
 
+# dumpsys 输出中的组件名 包名/Activity，取包名
+_COMPONENT_RE = re.compile(r"(?<![\w.])([A-Za-z]\w*(?:\.\w+)+)/[\w.$]+")
+
+def _records_action(func):
+    """
+    记录动作完成时间，帧流据此判断截图是否晚于上一次操作；
+    启用界面事件监听时同时记录动作开始前的事件序号
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.ui_events is not None:
+            self.ui_event_mark = self.ui_events.mark()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.last_action_time = time.time()
+    return wrapper
+
 class AndroidController(Controller):
-    def __init__(self, adb_path):
+    # 常见应用包名映射
+    APP_PACKAGES = {
+        '微博': 'com.sina.weibo',
+        'weibo': 'com.sina.weibo',
+        '微信': 'com.tencent.mm',
+        'wechat': 'com.tencent.mm',
+        '抖音': 'com.ss.android.ugc.aweme',
+        'douyin': 'com.ss.android.ugc.aweme',
+        '小红书': 'com.xingin.xhs',
+        'xiaohongshu': 'com.xingin.xhs',
+        '淘宝': 'com.taobao.taobao',
+        'taobao': 'com.taobao.taobao',
+        '支付宝': 'com.eg.android.AlipayGphone',
+        'alipay': 'com.eg.android.AlipayGphone',
+        '哔哩哔哩': 'tv.danmaku.bili',
+        'bilibili': 'tv.danmaku.bili',
+        'b站': 'tv.danmaku.bili',
+        'QQ': 'com.tencent.mobileqq',
+        'qq': 'com.tencent.mobileqq',
+        '京东': 'com.jingdong.app.mall',
+        'jd': 'com.jingdong.app.mall',
+        '拼多多': 'com.xunmeng.pinduoduo',
+        'pinduoduo': 'com.xunmeng.pinduoduo',
+        '今日头条': 'com.ss.android.article.news',
+        'toutiao': 'com.ss.android.article.news',
+        '网易云音乐': 'com.netease.cloudmusic',
+        'netease': 'com.netease.cloudmusic',
+        'QQ音乐': 'com.tencent.qqmusic',
+        '百度': 'com.baidu.searchbox',
+        'baidu': 'com.baidu.searchbox',
+        '美团': 'com.sankuai.meituan',
+        'meituan': 'com.sankuai.meituan',
+        '饿了么': 'me.ele',
+        'eleme': 'me.ele',
+        '高德地图': 'com.autonavi.minimap',
+        'gaode': 'com.autonavi.minimap',
+        '知乎': 'com.zhihu.android',
+        'zhihu': 'com.zhihu.android',
+    }
+
+    # 截图方式：'u2' 优先使用 uiautomator2；'exec-out' 通过 adb exec-out 直接读取 PNG 到内存；
+    # 'raw' 读取未压缩的帧缓冲区，跳过设备端 PNG 编码和主机端解码
+    SCREENSHOT_MODES = ("u2", "exec-out", "raw")
+
+    def __init__(self, adb_path, use_shell_session=True, shell_pool_size=1, screenshot_mode="u2"):
         self.adb_path = adb_path
         self.u2_device = None
         self.device_id = None
         self.tap_duration_ms = 200  # 默认“点击”持续时长（使用同点 swipe 实现）
+        self.use_shell_session = use_shell_session
+        self.shell_pool_size = shell_pool_size
+        self.shell_pool = None
+        if screenshot_mode not in self.SCREENSHOT_MODES:
+            print(f"Warning: unknown screenshot_mode '{screenshot_mode}', fallback to 'u2'")
+            screenshot_mode = "u2"
+        self.screenshot_mode = screenshot_mode
+        self.frame_stream = None
+        self.last_action_time = 0.0
+        self.last_frame_age = None
+        # open_app 启动后等待应用进入前台的超时秒数，以及是否再等待界面稳定
+        # （由调用方自行检测界面稳定时可将 launch_settle 设为 False）
+        self.launch_timeout = 10.0
+        self.launch_settle = True
+        self.last_launch_latency = None
+        self.ui_events = None
+        self.ui_event_mark = 0
         
-        # 尝试初始化 uiautomator2
+        # 尝试初始化 uiautomator2（复用进程内缓存的设备会话，避免每个任务重复握手）
+        self.session = None
         if U2_AVAILABLE:
             try:
-                # 从 adb_path 获取设备序列号（如果指定了的话）
-                result = subprocess.run(
-                    f"{adb_path} devices",
-                    capture_output=True,
-                    text=True,
-                    shell=True
-                )
-                
-                # 解析设备列表
-                lines = result.stdout.strip().split('\n')
-                devices = []
-                for line in lines[1:]:  # 跳过第一行 "List of devices attached"
-                    if '\tdevice' in line:
-                        device_id = line.split('\t')[0]
-                        devices.append(device_id)
-                
-                if devices:
-                    # 连接到第一个设备，并记录 device_id（用于 ADB -s 绑定）
-                    self.device_id = devices[0]
-                    self.u2_device = u2.connect(self.device_id)
-                    print(f"✓ uiautomator2 connected to device: {self.device_id}")
-                else:
-                    print("Warning: No device found for uiautomator2 connection")
+                self.session = get_device_session(adb_path)
+                if self.session is not None:
+                    # 记录 device_id（用于 ADB -s 绑定）
+                    self.device_id = self.session.device_id
+                    self.u2_device = self.session.u2_device
             except Exception as e:
                 print(f"Warning: Failed to initialize uiautomator2: {e}")
                 self.u2_device = None
 
+    def _u2_ok(self):
+        if self.session is not None:
+            self.session.mark_ok()
+
+    def _u2_failed(self):
+        # 让缓存的设备会话在下一次获取时重新做健康检查，并重新设置输入法
+        if self.session is not None:
+            self.session.mark_broken()
+
+    def _adb_prefix(self):
+        return f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''}"
+
+    def _shell(self, shell_command):
+        """
+        在设备上执行 shell 命令
+        优先通过常驻 shell 会话执行，会话不可用时回退为一次性 `adb shell` 进程
+        :return: subprocess.CompletedProcess（会话模式下 stderr 合并在 stdout 中）
+        """
+        if self.use_shell_session:
+            if self.shell_pool is None:
+                self.shell_pool = AdbShellPool(self.adb_path, self.device_id, size=self.shell_pool_size)
+            returncode, output = self.shell_pool.run(shell_command)
+            if returncode is not None:
+                return subprocess.CompletedProcess(shell_command, returncode, output, "")
+            print(f"[ADB_SHELL] Session unavailable, fallback to one-shot adb: {shell_command}")
+
+        # 命令作为单个参数传给 adb，由设备上的 shell 解析（与会话模式一致），
+        # 避免宿主机 shell 按 ; | 拆分脚本并去掉引号
+        args = [self.adb_path]
+        if self.device_id:
+            args += ["-s", self.device_id]
+        args += ["shell", shell_command]
+        return subprocess.run(args, capture_output=True, text=True)
+
+    def _exec_out(self, shell_args, timeout=15):
+        """
+        通过 `adb exec-out` 执行命令并以二进制形式返回 stdout（不经过设备上的临时文件）
+        :return: bytes，失败返回 None
+        """
+        args = [self.adb_path]
+        if self.device_id:
+            args += ["-s", self.device_id]
+        args += ["exec-out"] + list(shell_args)
+        try:
+            result = subprocess.run(args, capture_output=True, timeout=timeout)
+        except Exception as e:
+            print(f"Warning: adb exec-out failed ({e})")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            print(f"Warning: adb exec-out returned code={result.returncode} stderr={result.stderr.decode('utf-8', errors='replace').strip()}")
+            return None
+        return result.stdout
+
+    def get_screenshot_bytes(self):
+        """
+        通过 `adb exec-out screencap -p` 获取 PNG 截图字节，全程在内存中完成
+        :return: bytes，失败返回 None
+        """
+        data = self._exec_out(["screencap", "-p"])
+        if data is None:
+            return None
+        if not data.startswith(b"\x89PNG\r\n\x1a\n"):
+            print("Warning: exec-out screencap did not return a PNG image")
+            return None
+        return data
+
+    def get_screenshot_raw(self):
+        """
+        通过 `adb exec-out screencap`（不带 -p）获取原始帧缓冲区，
+        解析头部后直接包装为 PIL.Image，不做任何 PNG 编解码
+        :return: PIL.Image（RGBA/RGBX），失败返回 None
+        """
+        data = self._exec_out(["screencap"])
+        if data is None:
+            return None
+        try:
+            return raw_to_image(data)
+        except Exception as e:
+            print(f"Warning: Failed to parse raw screencap output: {e}")
+            return None
+
+    def get_screenshot_image(self):
+        """
+        获取截图并解码为 PIL.Image（raw 模式下直接使用原始帧缓冲区）
+        :return: PIL.Image，失败返回 None
+        """
+        frame, _, age = self.get_latest_frame()
+        if frame is not None:
+            print(f"[FRAME_STREAM] use streamed frame, age={int(age * 1000)}ms")
+            return frame
+        return self._capture_direct_image()
+
+    def _capture_direct_image(self):
+        """不经过帧流，按 screenshot_mode 直接从设备截图，失败时依次回退"""
+        if self.screenshot_mode == "raw":
+            image = self.get_screenshot_raw()
+            if image is not None:
+                return image
+            print("Warning: raw screenshot failed, falling back to PNG exec-out")
+        elif self.screenshot_mode == "u2" and self.u2_device:
+            try:
+                # uiautomator2 直接返回 PIL.Image
+                image = self.u2_device.screenshot()
+                self._u2_ok()
+                return image
+            except Exception as e:
+                self._u2_failed()
+                print(f"Warning: uiautomator2 screenshot failed ({e}), falling back to exec-out")
+        try:
+            return self._capture_png_image()
+        except Exception as e:
+            print(f"Warning: Failed to decode exec-out screenshot: {e}")
+            return None
+
+    def capture(self):
+        """
+        截图并返回 Frame；帧流运行时直接使用最新帧及其采集时间
+        :return: Frame，失败返回 None
+        """
+        image, timestamp, age = self.get_latest_frame()
+        if image is not None:
+            print(f"[FRAME_STREAM] use streamed frame, age={int(age * 1000)}ms")
+            return Frame(image, timestamp=timestamp)
+        # 帧流已经等待过一次，这里直接截图，不再向帧流要帧
+        timestamp = time.time()
+        image = self._capture_direct_image()
+        if image is None:
+            return None
+        return Frame(image, timestamp=timestamp)
+
+    def capture_preview(self):
+        """
+        低成本截图，用于等待界面稳定时的变化检测
+        帧流运行时直接使用最新帧；否则读取原始帧缓冲区（设备端不做 PNG 编码、主机端不解码，
+        也不经过 uiautomator2），失败时退回完整截图
+        :return: Frame，失败返回 None
+        """
+        image, timestamp, _ = self.get_latest_frame()
+        if image is not None:
+            return Frame(image, timestamp=timestamp)
+        timestamp = time.time()
+        image = self.get_screenshot_raw()
+        if image is None:
+            image = self._capture_direct_image()
+            return Frame(image, timestamp=timestamp) if image is not None else None
+        # raw 模式下完整截图走的就是这条路径，无需再采集一次
+        return Frame(image, timestamp=timestamp, preview=self.screenshot_mode != "raw")
+
+    def _save_exec_out_screenshot(self, save_path):
+        data = self.get_screenshot_bytes()
+        if data is None:
+            return False
+        with open(save_path, "wb") as f:
+            f.write(data)
+        return True
+
+    def start_frame_stream(self, interval=0.0, buffer_size=3):
+        """
+        启动后台帧流：持续通过 exec-out 采集截图并保存最新帧，
+        之后 get_screenshot / get_screenshot_image 直接返回最新帧，无需等待一次完整截图
+        """
+        if self.frame_stream is None:
+            capture_fn = self.get_screenshot_raw if self.screenshot_mode == "raw" else self._capture_png_image
+            self.frame_stream = FrameStream(capture_fn, interval=interval, buffer_size=buffer_size)
+        self.frame_stream.start()
+        print(f"[FRAME_STREAM] started: mode={self.screenshot_mode} interval={interval}s buffer={buffer_size}")
+
+    def stop_frame_stream(self):
+        if self.frame_stream is not None:
+            self.frame_stream.stop()
+            self.frame_stream = None
+
+    def get_latest_frame(self, newer_than=None, timeout=5.0):
+        """
+        从帧流获取最新帧
+        :param newer_than: 要求帧的采集时间晚于该时间戳（默认使用上一次操作完成的时间）
+        :return: (frame, timestamp, age_seconds)，帧流未启动或超时返回 (None, None, None)
+        """
+        if self.frame_stream is None or not self.frame_stream.is_running():
+            return None, None, None
+        if newer_than is None:
+            newer_than = self.last_action_time
+        frame, timestamp = self.frame_stream.wait_for_frame(newer_than=newer_than, timeout=timeout)
+        if frame is None:
+            print(f"[FRAME_STREAM] Warning: no frame newer than last action within {timeout}s")
+            return None, None, None
+        age = time.time() - timestamp
+        self.last_frame_age = age
+        return frame, timestamp, age
+
+    def _capture_png_image(self):
+        data = self.get_screenshot_bytes()
+        if data is None:
+            return None
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+
+    def new_batch(self):
+        """创建一个 Android 手势批处理"""
+        return GestureBatch("android")
+
+    def run_batch(self, batch):
+        """
+        将批处理中的全部基本操作作为一段脚本，通过一次 shell 往返发送到设备
+        :return: subprocess.CompletedProcess
+        """
+        if len(batch) == 0:
+            return subprocess.CompletedProcess("", 0, "", "")
+        t0 = time.time()
+        result = self._shell(batch.to_script())
+        print(f"[BATCH] {len(batch)} steps in one round-trip. cost={int((time.time() - t0) * 1000)}ms code={result.returncode}")
+        self.last_action_time = time.time()
+        return result
+
+    def start_ui_events(self, **kwargs):
+        """
+        启动无障碍事件监听（adb shell uiautomator events），之后可用 wait_for_ui_quiet 等待界面安静
+        :return: bool 是否启动成功；设备不支持时返回 False，调用方应继续使用截图轮询
+        """
+        if self.ui_events is not None and self.ui_events.is_running():
+            return True
+        listener = UiEventListener(self.adb_path, self.device_id, **kwargs)
+        if not listener.start():
+            return False
+        if self.u2_device:
+            # 事件流与 uiautomator2 服务共用设备上唯一的 UiAutomation 连接，启动后确认 u2 仍然可用，
+            # 否则停止事件监听，让 u2 的点击、输入和截图继续工作
+            try:
+                self.u2_device.info
+                self._u2_ok()
+            except Exception as e:
+                print(f"[UI_EVENTS] Warning: uiautomator2 unavailable after starting event listener ({e}), stop listening")
+                listener.stop()
+                self._u2_failed()
+                return False
+        self.ui_events = listener
+        return True
+
+    def stop_ui_events(self):
+        if self.ui_events is not None:
+            self.ui_events.stop()
+            self.ui_events = None
+
+    def ui_events_running(self):
+        return self.ui_events is not None and self.ui_events.is_running()
+
+    def wait_for_ui_quiet(self, quiet_ms=300, timeout=3.0, first_event_timeout=1.0):
+        """
+        等待上一次动作引起的界面事件结束（最后一个事件后 quiet_ms 毫秒无新事件）
+        :return: (changed, settle_time)，changed 为 False 表示动作没有产生任何界面事件；
+                 未启用事件监听时返回 None
+        """
+        if not self.ui_events_running():
+            return None
+        changed, settle_time = self.ui_events.wait_for_quiet(
+            self.ui_event_mark, quiet_ms=quiet_ms, timeout=timeout, first_event_timeout=first_event_timeout
+        )
+        events = self.ui_events.events_since(self.ui_event_mark)
+        print(f"[UI_EVENTS] changed={changed}, {len(events)} event(s), quiet at {settle_time:.2f}s")
+        return changed, settle_time
+
+    def close(self):
+        """关闭帧流、事件监听和常驻 shell 会话"""
+        self.stop_frame_stream()
+        self.stop_ui_events()
+        if self.shell_pool is not None:
+            self.shell_pool.close()
+            self.shell_pool = None
+
     def get_screenshot(self, save_path):
         """
         获取设备截图
-        优先使用 uiautomator2（如果可用），否则使用 ADB 命令
+        screenshot_mode 为 'exec-out' 时优先使用 adb exec-out 直接读取到内存；
+        否则优先使用 uiautomator2（如果可用），失败后再使用 ADB 命令
         """
+        # 确保保存目录存在
+        save_dir = os.path.dirname(save_path)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir, exist_ok=True)
+
+        frame, _, age = self.get_latest_frame()
+        if frame is not None:
+            print(f"[FRAME_STREAM] use streamed frame, age={int(age * 1000)}ms")
+            frame.convert("RGB").save(save_path, format="PNG", compress_level=1)
+            return True
+
+        exec_out_tried = False
+        if self.screenshot_mode == "raw":
+            image = self.get_screenshot_raw()
+            if image is not None:
+                # 原始帧无需设备端编码，仅为落盘在主机端做一次快速 PNG 压缩
+                image.convert("RGB").save(save_path, format="PNG", compress_level=1)
+                return True
+            print("Warning: raw screenshot failed, falling back to other methods")
+        elif self.screenshot_mode == "exec-out":
+            exec_out_tried = True
+            if self._save_exec_out_screenshot(save_path):
+                return True
+            print("Warning: exec-out screenshot failed, falling back to other methods")
+
         # 方法1: 使用 uiautomator2 截图（推荐，更稳定）
         if self.u2_device:
             try:
-                # 确保保存目录存在
-                save_dir = os.path.dirname(save_path)
-                if save_dir and not os.path.exists(save_dir):
-                    os.makedirs(save_dir, exist_ok=True)
-                
                 # 使用 uiautomator2 截图
                 screenshot = self.u2_device.screenshot()
                 screenshot.save(save_path)
@@ -69,32 +434,30 @@ class AndroidController(Controller):
                 else:
                     print(f"Warning: uiautomator2 screenshot saved but file is empty or missing")
             except Exception as e:
+                self._u2_failed()
                 print(f"Warning: uiautomator2 screenshot failed ({e}), falling back to ADB method")
         
-        # 方法2: 使用 ADB 命令截图（备用方案）
+        # 方法2: 使用 adb exec-out 直接读取截图（无设备端临时文件、无固定等待）
+        if not exec_out_tried and self._save_exec_out_screenshot(save_path):
+            return True
+
+        # 方法3: 使用 ADB 命令截图到设备再拉取（最后的备用方案）
         try:
-            # 确保保存目录存在
-            save_dir = os.path.dirname(save_path)
-            if save_dir and not os.path.exists(save_dir):
-                os.makedirs(save_dir, exist_ok=True)
-            
             # 删除旧的截图文件
-            rm_command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell rm -f /sdcard/screenshot.png"
-            rm_result = subprocess.run(rm_command, capture_output=True, text=True, shell=True)
+            rm_result = self._shell("rm -f /sdcard/screenshot.png")
             if rm_result.returncode != 0:
                 print(f"Warning: Failed to remove old screenshot: {rm_result.stderr}")
             time.sleep(0.3)
             
             # 截图到设备
-            screencap_command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell screencap -p /sdcard/screenshot.png"
-            screencap_result = subprocess.run(screencap_command, capture_output=True, text=True, shell=True)
+            screencap_result = self._shell("screencap -p /sdcard/screenshot.png")
             if screencap_result.returncode != 0:
-                print(f"Error: screencap command failed: {screencap_result.stderr}")
+                print(f"Error: screencap command failed: {screencap_result.stderr or screencap_result.stdout}")
                 return False
             time.sleep(0.5)
             
             # 从设备拉取截图
-            pull_command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} pull /sdcard/screenshot.png \"{save_path}\""
+            pull_command = f"{self._adb_prefix()} pull /sdcard/screenshot.png \"{save_path}\""
             pull_result = subprocess.run(pull_command, capture_output=True, text=True, shell=True)
             if pull_result.returncode != 0:
                 print(f"Error: pull command failed: {pull_result.stderr}")
@@ -111,6 +474,7 @@ class AndroidController(Controller):
             print(f"Error: Screenshot failed with exception: {e}")
             return False
 
+    @_records_action
     def tap(self, x, y):
         """
         点击屏幕坐标
@@ -118,10 +482,9 @@ class AndroidController(Controller):
         """
         # 方法1: 使用 ADB 短时同点 swipe（更稳，部分设备对 tap 边缘/底部不灵敏）
         try:
-            command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell input swipe {x} {y} {x+2} {y+2} {self.tap_duration_ms}"
             t0 = time.time()
             print(f"[TAP] ADB swipe-as-tap start: device={self.device_id or 'default'} coord=({x},{y}) dur={self.tap_duration_ms}ms")
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            result = self._shell(f"input swipe {x} {y} {x+2} {y+2} {self.tap_duration_ms}")
             dt = int((time.time() - t0) * 1000)
             if result.returncode == 0:
                 if result.stdout.strip():
@@ -166,6 +529,7 @@ class AndroidController(Controller):
         except Exception as e:
             print(f"[TAP] Warning: invalid duration '{duration_ms}', keep {self.tap_duration_ms}ms. err={e}")
 
+    @_records_action
     def type(self, text):
         """
         输入文本，优先使用 uiautomator2（支持中文），回退到 ADB 方式
@@ -177,10 +541,13 @@ class AndroidController(Controller):
                 # 处理换行符
                 text_to_send = text.replace("\\n", "\n")
                 
-                # 启用快速输入法（FastInputIME）- 对中文输入很重要
+                # 启用快速输入法（FastInputIME）- 对中文输入很重要；会话内只切换一次
                 try:
-                    self.u2_device.set_fastinput_ime(True)
-                    time.sleep(0.1)  # 等待输入法切换
+                    if self.session is not None:
+                        self.session.ensure_fastinput_ime()
+                    else:
+                        self.u2_device.set_fastinput_ime(True)
+                        time.sleep(0.1)  # 等待输入法切换
                 except Exception as ime_err:
                     print(f"Warning: Failed to set FastInputIME: {ime_err}, continuing anyway...")
                 
@@ -206,6 +573,7 @@ class AndroidController(Controller):
                     
             except Exception as e:
                 error_msg = str(e)
+                self._u2_failed()
                 print(f"Warning: uiautomator2 input failed ({error_msg})")
                 print(f"  Input text: {text}")
                 print(f"  Falling back to ADB method...")
@@ -222,67 +590,39 @@ class AndroidController(Controller):
             print("Please ensure uiautomator2 is working properly or install ADB Keyboard.")
             print("Attempting to input anyway, but Chinese characters may fail...")
         
-        # 先清空输入框：全选 + 删除
+        # 清空输入框（全选 + 删除）与文本片段合并为一个批处理脚本，一次往返完成；
+        # 文本按类型切成尽量少的片段：ASCII 片段用 input text，中文等用 ADB Keyboard 广播
+        batch = self.new_batch()
+        batch.keyevent(113).sleep(0.1)  # Ctrl+A (全选) - keycode 113
+        batch.keyevent(67).sleep(0.2)   # Delete (删除) - keycode 67
+        runs = fill_batch(batch, text)
+        print(f"[TYPE] {len(text)} chars -> {runs} runs")
+        
+        result = self.run_batch(batch)
+        if result.returncode != 0:
+            print(f"Warning: ADB batched input returned code={result.returncode}: {(result.stdout + result.stderr).strip()}")
+        self.verify_text(text)
+
+    def verify_text(self, expected):
+        """
+        校验当前焦点输入框中的文本（需要 uiautomator2）
+        :return: True/False；无法校验时返回 None
+        """
+        if not self.u2_device:
+            return None
         try:
-            # Ctrl+A (全选) - keycode 113
-            command = self.adb_path + f" shell input keyevent 113"
-            subprocess.run(command, capture_output=True, text=True, shell=True)
-            time.sleep(0.1)
-            # Delete (删除) - keycode 67
-            command = self.adb_path + f" shell input keyevent 67"
-            subprocess.run(command, capture_output=True, text=True, shell=True)
-            time.sleep(0.2)
+            actual = self.u2_device(focused=True).get_text()
         except Exception as e:
-            print(f"Warning: Failed to clear input field: {e}")
-        
-        # 输入文本
-        text = text.replace("\\n", "_").replace("\n", "_")
-        successful_chars = 0
-        failed_chars = []
-        
-        for char in text:
-            try:
-                if char == ' ':
-                    command = self.adb_path + f" shell input text %s"
-                    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-                    if result.returncode == 0:
-                        successful_chars += 1
-                elif char == '_':
-                    command = self.adb_path + f" shell input keyevent 66"
-                    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-                    if result.returncode == 0:
-                        successful_chars += 1
-                elif 'a' <= char <= 'z' or 'A' <= char <= 'Z' or char.isdigit():
-                    command = self.adb_path + f" shell input text {char}"
-                    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-                    if result.returncode == 0:
-                        successful_chars += 1
-                    else:
-                        failed_chars.append(char)
-                elif char in '-.,!?@\'°/:;()':
-                    command = self.adb_path + f" shell input text \"{char}\""
-                    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-                    if result.returncode == 0:
-                        successful_chars += 1
-                    else:
-                        failed_chars.append(char)
-                else:
-                    # 中文字符或其他特殊字符，需要 ADB Keyboard
-                    command = self.adb_path + f" shell am broadcast -a ADB_INPUT_TEXT --es msg \"{char}\""
-                    result = subprocess.run(command, capture_output=True, text=True, shell=True)
-                    if result.returncode == 0:
-                        successful_chars += 1
-                    else:
-                        failed_chars.append(char)
-                time.sleep(0.05)  # 每个字符之间稍作延迟
-            except Exception as e:
-                failed_chars.append(char)
-                print(f"Warning: Failed to input character '{char}': {e}")
-        
-        if failed_chars:
-            print(f"Warning: Failed to input {len(failed_chars)} characters: {failed_chars}")
-            print(f"Successfully input {successful_chars}/{len(text)} characters")
+            print(f"[TYPE] Notice: cannot read focused text for verification ({e})")
+            return None
+        expected = expected.replace("\\n", "\n")
+        if actual is not None and expected.strip() in actual:
+            print("[TYPE] Verified typed text in focused field")
+            return True
+        print(f"[TYPE] Warning: typed text mismatch. expected='{expected}' actual='{actual}'")
+        return False
 
+    @_records_action
     def slide(self, x1, y1, x2, y2):
         """
         滑动屏幕
@@ -290,8 +630,7 @@ class AndroidController(Controller):
         """
         # 方法1: 使用 ADB 命令滑动（主要方案，更稳定）
         try:
-            command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell input swipe {x1} {y1} {x2} {y2} 500"
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            result = self._shell(f"input swipe {x1} {y1} {x2} {y2} 500")
             if result.returncode == 0:
                 return
             else:
@@ -306,6 +645,7 @@ class AndroidController(Controller):
             except Exception as e:
                 print(f"Error: uiautomator2 swipe also failed ({e})")
 
+    @_records_action
     def back(self):
         """
         按返回键
@@ -313,8 +653,7 @@ class AndroidController(Controller):
         """
         # 方法1: 使用 ADB 命令按键（主要方案，更稳定）
         try:
-            command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell input keyevent 4"
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            result = self._shell("input keyevent 4")
             if result.returncode == 0:
                 return
             else:
@@ -329,6 +668,7 @@ class AndroidController(Controller):
             except Exception as e:
                 print(f"Error: uiautomator2 back also failed ({e})")
 
+    @_records_action
     def home(self):
         """
         按 Home 键
@@ -336,8 +676,7 @@ class AndroidController(Controller):
         """
         # 方法1: 使用 ADB 命令按键（主要方案，更稳定）
         try:
-            command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell am start -a android.intent.action.MAIN -c android.intent.category.HOME"
-            result = subprocess.run(command, capture_output=True, text=True, shell=True)
+            result = self._shell("am start -a android.intent.action.MAIN -c android.intent.category.HOME")
             if result.returncode == 0:
                 return
             else:
@@ -375,55 +714,41 @@ class AndroidController(Controller):
             print(f"Error getting clipboard content: {e}")
             return None
 
+    def get_foreground_package(self):
+        """
+        获取当前前台应用包名
+        :return: str 包名，获取失败返回 None
+        """
+        if self.u2_device:
+            try:
+                package = self.u2_device.app_current().get("package")
+                self._u2_ok()
+                return package
+            except Exception as e:
+                print(f"Warning: uiautomator2 app_current failed ({e}), trying ADB method")
+        # 焦点窗口，形如: mCurrentFocus=Window{1a2b3c u0 com.tencent.mm/com.tencent.mm.ui.LauncherUI}
+        # 应用切换过程中焦点窗口可能为 null，此时再查 resumed activity，
+        # Android 11 及以前形如: mResumedActivity: ActivityRecord{1a2b3c u0 com.tencent.mm/.ui.LauncherUI t123}
+        # Android 12 起为 ResumedActivity: ActivityRecord{...} 或 topResumedActivity=ActivityRecord{...}
+        for command in ("dumpsys window | grep mCurrentFocus",
+                        "dumpsys activity activities | grep ResumedActivity"):
+            result = self._shell(command)
+            match = _COMPONENT_RE.search(result.stdout or "")
+            if match:
+                return match.group(1)
+        return None
+
+    @_records_action
     def open_app(self, app_identifier):
         """
         打开应用，支持应用名或包名
         :param app_identifier: 应用名（如'微博'）或包名（如'com.sina.weibo'）
         :return: bool 是否成功
         """
-        # 常见应用包名映射
-        APP_PACKAGES = {
-            '微博': 'com.sina.weibo',
-            'weibo': 'com.sina.weibo',
-            '微信': 'com.tencent.mm',
-            'wechat': 'com.tencent.mm',
-            '抖音': 'com.ss.android.ugc.aweme',
-            'douyin': 'com.ss.android.ugc.aweme',
-            '小红书': 'com.xingin.xhs',
-            'xiaohongshu': 'com.xingin.xhs',
-            '淘宝': 'com.taobao.taobao',
-            'taobao': 'com.taobao.taobao',
-            '支付宝': 'com.eg.android.AlipayGphone',
-            'alipay': 'com.eg.android.AlipayGphone',
-            '哔哩哔哩': 'tv.danmaku.bili',
-            'bilibili': 'tv.danmaku.bili',
-            'b站': 'tv.danmaku.bili',
-            'QQ': 'com.tencent.mobileqq',
-            'qq': 'com.tencent.mobileqq',
-            '京东': 'com.jingdong.app.mall',
-            'jd': 'com.jingdong.app.mall',
-            '拼多多': 'com.xunmeng.pinduoduo',
-            'pinduoduo': 'com.xunmeng.pinduoduo',
-            '今日头条': 'com.ss.android.article.news',
-            'toutiao': 'com.ss.android.article.news',
-            '网易云音乐': 'com.netease.cloudmusic',
-            'netease': 'com.netease.cloudmusic',
-            'QQ音乐': 'com.tencent.qqmusic',
-            '百度': 'com.baidu.searchbox',
-            'baidu': 'com.baidu.searchbox',
-            '美团': 'com.sankuai.meituan',
-            'meituan': 'com.sankuai.meituan',
-            '饿了么': 'me.ele',
-            'eleme': 'me.ele',
-            '高德地图': 'com.autonavi.minimap',
-            'gaode': 'com.autonavi.minimap',
-            '知乎': 'com.zhihu.android',
-            'zhihu': 'com.zhihu.android',
-        }
         
         # 判断是应用名还是包名
-        if app_identifier in APP_PACKAGES:
-            package_name = APP_PACKAGES[app_identifier]
+        if app_identifier in self.APP_PACKAGES:
+            package_name = self.APP_PACKAGES[app_identifier]
         elif '.' in app_identifier:  # 可能是包名
             package_name = app_identifier
         else:
@@ -434,19 +759,19 @@ class AndroidController(Controller):
         if self.u2_device:
             try:
                 self.u2_device.app_start(package_name)
-                time.sleep(3)  # 等待应用完全启动
+                self._u2_ok()
+                self.wait_for_launch(package_name)  # 等待应用完全启动
                 print(f"成功打开应用: {app_identifier} ({package_name})")
                 return True
             except Exception as e:
                 print(f"Warning: uiautomator2 app_start failed ({e}), falling back to ADB method")
         
         # 方法2: 使用 ADB 命令打开应用（备用方案）
-            command = f"{self.adb_path}{f' -s {self.device_id}' if self.device_id else ''} shell monkey -p {package_name} -c android.intent.category.LAUNCHER 1"
-        result = subprocess.run(command, capture_output=True, text=True, shell=True)
+        result = self._shell(f"monkey -p {package_name} -c android.intent.category.LAUNCHER 1")
         
-        if result.returncode == 0 and "No activities found" not in result.stderr:
+        if result.returncode == 0 and "No activities found" not in (result.stdout + result.stderr):
+            self.wait_for_launch(package_name)  # 等待应用完全启动
             print(f"成功打开应用: {app_identifier} ({package_name})")
-            time.sleep(3)  # 等待应用完全启动
             return True
         else:
             print(f"打开应用失败: {app_identifier}, 将使用默认的点击方式")
@@ -0,0 +1,356 @@
+import asyncio
+import io
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+
+from PIL import Image
+
+from .frame import Frame
+from .screencap import raw_to_image
+from .gesture_batch import GestureBatch
+from .text_input import fill_batch
+from .screen_settle import frame_difference
+from .android_controller import AndroidController, _COMPONENT_RE
+from .harmonyos_controller import HarmonyOSController, parse_foreground_bundle
+
+
+class AsyncController(ABC):
+    """
+    Controller 的 asyncio 版本
+    所有设备命令都通过 asyncio.create_subprocess_exec 执行（不经过宿主机 shell），
+    等待使用 asyncio.sleep，因此一个事件循环可以同时驱动多台设备
+    """
+
+    command_timeout = 15
+    # open_app 启动后等待应用进入前台的超时秒数，以及是否再等待界面稳定
+    launch_timeout = 10.0
+    launch_settle = True
+    last_launch_latency = None
+
+    async def _exec(self, *args, timeout=None):
+        """
+        执行一条命令
+        :return: (returncode, stdout_bytes, stderr_bytes)；超时或启动失败时 returncode 为 None
+        """
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except Exception as e:
+            print(f"Warning: failed to start {args[0]}: {e}")
+            return None, b"", b""
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout or self.command_timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            print(f"Warning: command timed out: {' '.join(args)}")
+            return None, b"", b""
+        return process.returncode, stdout, stderr
+
+    @abstractmethod
+    async def get_screenshot_image(self):
+        pass
+
+    async def get_screenshot(self, save_path):
+        image = await self.get_screenshot_image()
+        if image is None:
+            return False
+        await asyncio.to_thread(Frame(image).save, save_path)
+        return True
+
+    async def capture(self):
+        timestamp = time.time()
+        image = await self.get_screenshot_image()
+        if image is None:
+            return None
+        return Frame(image, timestamp=timestamp)
+
+    async def get_foreground_package(self):
+        """
+        获取当前前台应用包名
+        :return: str 包名，不支持时返回 None
+        """
+        return None
+
+    async def wait_for_foreground(self, package, timeout=10.0, interval=0.2):
+        """
+        轮询前台应用，直到 package 进入前台
+        :return: 从调用开始到进入前台的秒数，超时返回 None
+        """
+        start = time.time()
+        while True:
+            if await self.get_foreground_package() == package:
+                return time.time() - start
+            if time.time() - start >= timeout:
+                return None
+            await asyncio.sleep(interval)
+
+    async def wait_for_stable_screen(self, min_wait=0.3, max_wait=3.0, interval=0.15,
+                                     stable_frames=2, threshold=0.005):
+        """
+        screen_settle.wait_for_stable_screen 的异步版本：连续 stable_frames 帧两两差异都小于 threshold 时认为界面稳定
+        :return: (frame, settle_time, stable)，含义与同步版本一致
+        """
+        start = time.time()
+        if min_wait > 0:
+            await asyncio.sleep(min_wait)
+        prev = await self.capture()
+        streak_start = prev.timestamp if prev is not None else None
+        similar = 0
+        while True:
+            elapsed = time.time() - start
+            if prev is not None and similar >= stable_frames - 1:
+                return prev, max(0.0, streak_start - start), True
+            if elapsed >= max_wait:
+                return prev, elapsed, False
+            await asyncio.sleep(interval)
+            cur = await self.capture()
+            if cur is None:
+                continue
+            if prev is None or frame_difference(prev, cur) >= threshold:
+                similar, streak_start = 0, cur.timestamp
+            else:
+                similar += 1
+            prev = cur
+
+    async def wait_for_launch(self, package):
+        """
+        open_app 启动命令返回后调用：等待目标应用进入前台，
+        launch_settle 为 True 时再等待界面稳定，超时由 launch_timeout 控制
+        :return: 启动耗时（秒），超时返回 None；结果同时记录在 last_launch_latency
+        """
+        timeout = self.launch_timeout
+        start = time.time()
+        latency = await self.wait_for_foreground(package, timeout=timeout)
+        if latency is None:
+            print(f"[LAUNCH] {package} not in foreground within {timeout:.1f}s")
+        elif self.launch_settle:
+            remaining = max(0.5, timeout - latency)
+            _, settle_time, _ = await self.wait_for_stable_screen(min_wait=0.0, max_wait=remaining)
+            latency += settle_time
+        if latency is not None:
+            print(f"[LAUNCH] {package} ready after {latency:.2f}s (total wait {time.time() - start:.2f}s)")
+        self.last_launch_latency = latency
+        return latency
+
+    @abstractmethod
+    async def tap(self, x, y):
+        pass
+
+    @abstractmethod
+    async def type(self, text):
+        pass
+
+    @abstractmethod
+    async def slide(self, x1, y1, x2, y2):
+        pass
+
+    @abstractmethod
+    async def back(self):
+        pass
+
+    @abstractmethod
+    async def home(self):
+        pass
+
+    @abstractmethod
+    async def open_app(self, app_identifier):
+        pass
+
+    def _resolve_package(self, app_identifier):
+        if app_identifier in self.APP_PACKAGES:
+            return self.APP_PACKAGES[app_identifier]
+        if '.' not in app_identifier:
+            print(f"未知应用: {app_identifier}，尝试使用原始名称")
+        return app_identifier
+
+
+class AsyncAndroidController(AsyncController):
+    """基于 adb 的异步控制器（不依赖 uiautomator2）"""
+
+    APP_PACKAGES = AndroidController.APP_PACKAGES
+
+    def __init__(self, adb_path, device_id=None, screenshot_mode="raw", tap_duration_ms=200):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.screenshot_mode = screenshot_mode
+        self.tap_duration_ms = tap_duration_ms
+
+    def _adb_args(self, *args):
+        base = [self.adb_path]
+        if self.device_id:
+            base += ["-s", self.device_id]
+        return base + list(args)
+
+    async def _shell(self, shell_command, timeout=None):
+        # 设备端命令作为一个整体参数传给 adb shell，由设备上的 shell 解析
+        code, stdout, stderr = await self._exec(*self._adb_args("shell", shell_command), timeout=timeout)
+        if code != 0:
+            print(f"Warning: adb shell '{shell_command}' failed: code={code} {stderr.decode('utf-8', errors='replace').strip()}")
+        return code == 0
+
+    async def get_foreground_package(self):
+        # 与 AndroidController 相同：先查焦点窗口，切换过程中为 null 时再查 resumed activity
+        for command in ("dumpsys window | grep mCurrentFocus",
+                        "dumpsys activity activities | grep ResumedActivity"):
+            code, stdout, _ = await self._exec(*self._adb_args("shell", command))
+            match = _COMPONENT_RE.search(stdout.decode("utf-8", errors="replace"))
+            if match:
+                return match.group(1)
+        return None
+
+    async def get_screenshot_image(self):
+        if self.screenshot_mode == "raw":
+            code, data, _ = await self._exec(*self._adb_args("exec-out", "screencap"))
+            if code == 0 and data:
+                try:
+                    return raw_to_image(data)
+                except Exception as e:
+                    print(f"Warning: Failed to parse raw screencap output: {e}")
+        code, data, _ = await self._exec(*self._adb_args("exec-out", "screencap", "-p"))
+        if code != 0 or not data:
+            return None
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+        except Exception as e:
+            print(f"Warning: Failed to decode exec-out screenshot: {e}")
+            return None
+
+    async def tap(self, x, y):
+        await self._shell(f"input swipe {x} {y} {x+2} {y+2} {self.tap_duration_ms}")
+        await asyncio.sleep(0.2)
+
+    async def type(self, text):
+        # 先清空输入框（全选 + 删除），再输入文本，整体作为一个批处理一次往返完成
+        batch = GestureBatch("android").keyevent(113).keyevent(67)
+        fill_batch(batch, text)
+        await self.run_batch(batch)
+
+    async def run_batch(self, batch):
+        if len(batch) == 0:
+            return True
+        return await self._shell(batch.to_script())
+
+    async def slide(self, x1, y1, x2, y2):
+        await self._shell(f"input swipe {x1} {y1} {x2} {y2} 500")
+
+    async def back(self):
+        await self._shell("input keyevent 4")
+
+    async def home(self):
+        await self._shell("am start -a android.intent.action.MAIN -c android.intent.category.HOME")
+
+    async def open_app(self, app_identifier):
+        package_name = self._resolve_package(app_identifier)
+        code, stdout, stderr = await self._exec(
+            *self._adb_args("shell", f"monkey -p {package_name} -c android.intent.category.LAUNCHER 1")
+        )
+        if code == 0 and b"No activities found" not in stdout + stderr:
+            print(f"成功打开应用: {app_identifier} ({package_name})")
+            await self.wait_for_launch(package_name)
+            return True
+        print(f"打开应用失败: {app_identifier}, 将使用默认的点击方式")
+        return False
+
+
+class AsyncHarmonyOSController(AsyncController):
+    """基于 hdc 的异步控制器"""
+
+    APP_PACKAGES = HarmonyOSController.APP_PACKAGES
+    REMOTE_SCREENSHOT_PATH = HarmonyOSController.REMOTE_SCREENSHOT_PATH
+
+    def __init__(self, hdc_path, device_id=None):
+        self.hdc_path = hdc_path
+        self.device_id = device_id
+
+    def _hdc_args(self, *args):
+        base = [self.hdc_path]
+        if self.device_id:
+            base += ["-t", self.device_id]
+        return base + list(args)
+
+    async def _shell(self, shell_command, timeout=None):
+        code, stdout, stderr = await self._exec(*self._hdc_args("shell", shell_command), timeout=timeout)
+        if code != 0:
+            print(f"Warning: hdc shell '{shell_command}' failed: code={code} {stderr.decode('utf-8', errors='replace').strip()}")
+        return code == 0
+
+    async def get_foreground_package(self):
+        code, stdout, _ = await self._exec(*self._hdc_args("shell", "aa dump -l"))
+        return parse_foreground_bundle(stdout.decode("utf-8", errors="replace"))
+
+    async def get_screenshot_image(self):
+        remote = self.REMOTE_SCREENSHOT_PATH
+        if not await self._shell(f"rm -f {remote}; uitest screenCap -p {remote}"):
+            return None
+        # hdc 没有 exec-out，只能经由本机临时文件中转
+        local = await asyncio.to_thread(_mkstemp_png)
+        try:
+            code, stdout, stderr = await self._exec(*self._hdc_args("file", "recv", remote, local))
+            if code != 0 or b"fail" in stdout.lower():
+                print(f"Error: hdc file recv failed: {(stderr or stdout).decode('utf-8', errors='replace').strip()}")
+                return None
+            return await asyncio.to_thread(_load_image, local)
+        finally:
+            await asyncio.to_thread(_remove_quietly, local)
+
+    async def tap(self, x, y):
+        await self._shell(f"uitest uiInput click {x} {y}")
+
+    async def type(self, text):
+        batch = GestureBatch("harmonyos")
+        fill_batch(batch, text)
+        await self.run_batch(batch)
+
+    async def run_batch(self, batch):
+        if len(batch) == 0:
+            return True
+        return await self._shell(batch.to_script())
+
+    async def slide(self, x1, y1, x2, y2):
+        await self._shell(f"uitest uiInput swipe {x1} {y1} {x2} {y2} 500")
+
+    async def back(self):
+        await self._shell("uitest uiInput keyEvent Back")
+
+    async def home(self):
+        await self._shell("uitest uiInput keyEvent Home")
+
+    async def open_app(self, app_identifier):
+        package_name = self._resolve_package(app_identifier)
+        if await self._shell(f"aa start -a MainAbility -b {package_name}"):
+            print(f"成功打开应用: {app_identifier} ({package_name})")
+            await self.wait_for_launch(package_name)
+            return True
+        print(f"打开应用失败: {app_identifier}, 将使用默认的点击方式")
+        return False
+
+
+def _mkstemp_png():
+    fd, path = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    return path
+
+
+def _load_image(path):
+    try:
+        image = Image.open(path)
+        image.load()
+        return image
+    except Exception as e:
+        print(f"Warning: Failed to decode hdc screenshot: {e}")
+        return None
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,31 +1,153 @@
 import abc
 import time
+import uuid
 import base64
 import numpy as np
 from PIL import Image
 from io import BytesIO
-from openai import OpenAI
 from typing import Any, Optional
 from qwen_vl_utils import smart_resize
+from utils.frame import Frame
+from utils.encoding_cache import EncodingCache, image_digest, file_identity
+from utils.endpoint_group import EndpointGroup, get_endpoint_group
+from utils.retry_policy import RetryPolicy
+from utils.stream_parser import SectionStreamParser, ROLE_SECTIONS
 
 ERROR_CALLING_LLM = 'Error calling LLM'
 
-def pil_to_base64(image):
-    buffer = BytesIO()
-    image.save(buffer, format="PNG") 
-    return base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-def image_to_base64(image_path):
-    dummy_image = Image.open(image_path)
-    MIN_PIXELS=3136
-    MAX_PIXELS=10035200
-    resized_height, resized_width  = smart_resize(dummy_image.height,
-        dummy_image.width,
-        factor=28,
-        min_pixels=MIN_PIXELS,
-        max_pixels=MAX_PIXELS,)
-    dummy_image = dummy_image.resize((resized_width, resized_height))
-    return f"data:image/png;base64,{pil_to_base64(dummy_image)}"
+class ImageCodec:
+    """
+    发送给模型的图像编码方式：png（无损）、jpeg（有损，quality）、webp（有损 quality 或无损）
+    """
+
+    FORMATS = ("png", "jpeg", "webp")
+
+    def __init__(self, format="png", quality=None, lossless=False):
+        format = format.lower().replace("jpg", "jpeg")
+        if format not in self.FORMATS:
+            raise ValueError(f"unknown image codec: {format}")
+        self.format = format
+        self.quality = quality if quality is not None else (85 if format in ("jpeg", "webp") else None)
+        self.lossless = lossless if format == "webp" else format == "png"
+
+    @classmethod
+    def parse(cls, spec):
+        """解析 'png'、'jpeg:80'、'webp:75'、'webp-lossless' 形式的编码描述"""
+        if isinstance(spec, cls):
+            return spec
+        name, _, quality = spec.partition(":")
+        if name.endswith("-lossless"):
+            return cls(name[:-len("-lossless")], lossless=True)
+        return cls(name, int(quality) if quality else None)
+
+    @property
+    def key(self):
+        return (self.format, None if self.lossless else self.quality, self.lossless)
+
+    @property
+    def mime(self):
+        return f"image/{self.format}"
+
+    def __repr__(self):
+        if self.format == "png":
+            return "png"
+        return f"{self.format}-lossless" if self.lossless else f"{self.format}:{self.quality}"
+
+    def encode(self, image):
+        buffer = BytesIO()
+        if self.format == "png":
+            image.save(buffer, format="PNG")
+        elif self.format == "jpeg":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(buffer, format="JPEG", quality=self.quality)
+        elif self.lossless:
+            image.save(buffer, format="WEBP", lossless=True)
+        else:
+            image.save(buffer, format="WEBP", quality=self.quality)
+        return buffer.getvalue()
+
+PNG = ImageCodec("png")
+
+# 各智能体默认编码：全部保持无损 PNG，与此前的模型输入一致
+DEFAULT_ROLE_CODECS = {
+    "manager": PNG,
+    "executor": PNG,
+    "reflector": PNG,
+    "notetaker": PNG,
+}
+
+# 可选的有损预设（需显式启用，如 --role_codecs lossy）：Executor 需要精确定位元素，保持无损；
+# 其余角色使用高质量 JPEG 缩小请求体
+LOSSY_ROLE_CODECS = {
+    "manager": ImageCodec("jpeg", 85),
+    "executor": PNG,
+    "reflector": ImageCodec("jpeg", 80),
+    "notetaker": ImageCodec("jpeg", 90),
+}
+
+def pil_to_base64(image, codec=PNG):
+    return base64.b64encode(codec.encode(image)).decode("utf-8")
+
+MIN_PIXELS = 3136
+MAX_PIXELS = 10035200
+RESIZE_FACTOR = 28
+
+# 同一截图会被 Manager、Executor、Reflector 以及下一步的“操作前”截图反复使用，编码结果全局缓存
+encoding_cache = EncodingCache()
+
+def _encode_for_llm(image, min_pixels=MIN_PIXELS, max_pixels=MAX_PIXELS, codec=PNG):
+    if image.mode not in ("RGB", "L", "P"):
+        # raw 帧为 RGBA/RGBX，alpha 通道对模型无意义
+        image = image.convert("RGB")
+    resized_height, resized_width  = smart_resize(image.height,
+        image.width,
+        factor=RESIZE_FACTOR,
+        min_pixels=min_pixels,
+        max_pixels=max_pixels,)
+    image = image.resize((resized_width, resized_height))
+    return f"data:{codec.mime};base64,{pil_to_base64(image, codec)}"
+
+def _encode_cached(image, identity=None, codec=PNG, max_pixels=MAX_PIXELS):
+    """按 (图像身份, 编码参数) 查缓存，未命中时编码；identity 缺省时使用像素内容哈希"""
+    if identity is None:
+        identity = ("content", image_digest(image))
+    key = (identity, codec.key, RESIZE_FACTOR, MIN_PIXELS, max_pixels)
+    return encoding_cache.get_or_encode(key, lambda: _encode_for_llm(image, max_pixels=max_pixels, codec=codec))
+
+def image_to_base64(image, codec=PNG, max_pixels=MAX_PIXELS):
+    """image 可以是文件路径、Frame，或内存中的 PIL.Image / numpy 数组"""
+    if isinstance(image, Frame):
+        # 同一帧在多个智能体之间共享，同一编码参数只编码一次
+        return image.encoded(("llm", codec.key, max_pixels),
+                             lambda img: _encode_cached(img, codec=codec, max_pixels=max_pixels))
+    if isinstance(image, Image.Image):
+        return _encode_cached(image, codec=codec, max_pixels=max_pixels)
+    if isinstance(image, np.ndarray):
+        return _encode_cached(Image.fromarray(image), codec=codec, max_pixels=max_pixels)
+    identity = ("file",) + file_identity(image)
+    return encoding_cache.get_or_encode(
+        (identity, codec.key, RESIZE_FACTOR, MIN_PIXELS, max_pixels),
+        lambda: _encode_for_llm(Image.open(image), max_pixels=max_pixels, codec=codec),
+    )
+
+def image_size(image):
+    """返回 (宽, 高)，支持与 image_to_base64 相同的输入类型"""
+    if isinstance(image, (Frame, Image.Image)):
+        return image.size
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    with Image.open(image) as img:
+        return img.size
+
+def resized_size(width, height, max_pixels=MAX_PIXELS):
+    """图像发送给模型前经 smart_resize 缩放后的 (宽, 高)"""
+    resized_height, resized_width = smart_resize(height, width, factor=RESIZE_FACTOR,
+                                                 min_pixels=MIN_PIXELS, max_pixels=max_pixels)
+    return resized_width, resized_height
+
+# 每个视觉 token 对应 28x28 像素（14x14 patch 经 2x2 合并）
+PIXELS_PER_TOKEN = RESIZE_FACTOR * RESIZE_FACTOR
 
 class LlmWrapper(abc.ABC):
     """Abstract interface for (text only) LLM."""
@@ -70,20 +192,85 @@ class GUIOwlWrapper(LlmWrapper, MultimodalLlmWrapper):
             model_name: str,
             max_retry: int = 10,
             temperature: float = 0.0,
+            codec=None,
+            role_codecs: Optional[dict] = None,
+            role_token_budgets: Optional[dict] = None,
+            retry_policy: Optional[RetryPolicy] = None,
+            stream_roles=(),
+            role_max_tokens: Optional[dict] = None,
+            role_stop: Optional[dict] = None,
+            routing: str = "least_outstanding",
+            sticky: bool = False,
+            session_id: Optional[str] = None,
     ):
+        """
+        codec: 所有角色统一使用的图像编码（ImageCodec 或 'png'、'jpeg:80'、'webp-lossless' 形式的描述）；
+               None 时按角色使用 DEFAULT_ROLE_CODECS（均为 PNG），未知角色使用 PNG
+        role_codecs: 按角色覆盖编码，如 {"reflector": "webp:75"}；传入 LOSSY_ROLE_CODECS 启用有损预设
+        role_token_budgets: 按角色限制每次调用的视觉 token 总数，如 {"executor": 1500}；
+               同一次调用的多张图平分预算，未设置的角色不额外缩放
+        retry_policy: 重试策略；None 时按 max_retry 构造带抖动指数退避的默认策略
+        stream_roles: 使用流式输出的角色；ROLE_SECTIONS 中的角色在所需分段写完后立即结束生成
+        role_max_tokens: 按角色限制输出 token 数，如 {"executor": 400}
+        role_stop: 按角色设置停止序列，如 {"notetaker": ["\n\n\n"]}
+        base_url: 单个 base_url、逗号分隔的多个 base_url（多个服务副本）或 EndpointGroup
+        routing: 多个端点时的路由方式，least_outstanding 或 latency
+        sticky: 同一包装器（任务）的请求优先发往同一端点，保持前缀缓存局部性
+        session_id: 粘滞会话标识，None 时每个包装器生成一个
+        """
         if max_retry <= 0:
             max_retry = 10
             print('Max_retry must be positive. Reset it to 3')
         self.max_retry = min(max_retry, 10)
         self.temperature = temperature
         self.model = model_name
-        self.bot = OpenAI(
-            api_key=api_key,
-            base_url=base_url,
-            timeout=30
-        )
+        self.codec = ImageCodec.parse(codec) if codec is not None else None
+        self.role_codecs = dict(DEFAULT_ROLE_CODECS)
+        for role, role_codec in (role_codecs or {}).items():
+            self.role_codecs[role] = ImageCodec.parse(role_codec)
+        self.role_token_budgets = dict(role_token_budgets or {})
+        # 每次调用的请求体大小、编码耗时、视觉 token 数与缩放比例
+        self.call_stats = []
+        # 端点组在进程内共享，每个端点的客户端和 keep-alive 连接池按 (base_url, api_key) 共用
+        if isinstance(base_url, EndpointGroup):
+            self.endpoints = base_url
+        else:
+            self.endpoints = get_endpoint_group(base_url, api_key, routing=routing, sticky=sticky, timeout=30)
+        self.session_id = session_id or uuid.uuid4().hex
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=self.max_retry, max_delay=self.RETRY_WAITING_SECONDS)
+        # 任务截止的绝对时间，重试不会超过任务剩余时间
+        self.task_deadline = None
+        self.stream_roles = set(stream_roles or ())
+        self.role_max_tokens = dict(role_max_tokens or {})
+        self.role_stop = dict(role_stop or {})
+
+    def set_time_budget(self, seconds):
+        """设置任务剩余时间预算（秒），None 表示不限"""
+        self.task_deadline = time.time() + seconds if seconds else None
+
+    def codec_for(self, role=None):
+        if self.codec is not None:
+            return self.codec
+        return self.role_codecs.get(role, PNG)
 
-    def convert_messages_format_to_openaiurl(self, messages):
+    def max_pixels_for(self, role=None, num_images=1):
+        """按角色的视觉 token 预算计算每张图的像素上限"""
+        budget = self.role_token_budgets.get(role)
+        if not budget or num_images <= 0:
+            return MAX_PIXELS
+        return max(MIN_PIXELS, min(MAX_PIXELS, int(budget * PIXELS_PER_TOKEN / num_images)))
+
+    def input_scale(self, image, role=None, num_images=1):
+        """原图相对模型输入图像的缩放比例 (x, y)，用于把模型输出的绝对坐标映射回原图"""
+        width, height = image_size(image)
+        resized_width, resized_height = resized_size(width, height, self.max_pixels_for(role, num_images))
+        return width / resized_width, height / resized_height
+
+    @property
+    def last_call_stats(self):
+        return self.call_stats[-1] if self.call_stats else None
+
+    def convert_messages_format_to_openaiurl(self, messages, codec=PNG, max_pixels=MAX_PIXELS):
       converted_messages = []
       for message in messages:
           new_content = []
@@ -91,7 +278,7 @@ class GUIOwlWrapper(LlmWrapper, MultimodalLlmWrapper):
               if list(item.keys())[0] == 'text':
                   new_content.append({'type': 'text', 'text': item['text']})
               elif list(item.keys())[0] == 'image':
-                new_content.append({'type': 'image_url', 'image_url': {'url': image_to_base64(item['image'])}})
+                new_content.append({'type': 'image_url', 'image_url': {'url': image_to_base64(item['image'], codec, max_pixels)}})
           converted_messages.append({'role': message['role'], 'content': new_content})
 
       return converted_messages
@@ -103,8 +290,9 @@ class GUIOwlWrapper(LlmWrapper, MultimodalLlmWrapper):
         return self.predict_mm(text_prompt, [])
 
     def predict_mm(
-            self, text_prompt: str, images: list[np.ndarray], messages = None
+            self, text_prompt: str, images: list[np.ndarray], messages = None, role: Optional[str] = None
     ) -> tuple[str, Optional[bool], Any]:
+        """role: 调用方角色（manager / executor / reflector / notetaker），决定图像编码方式"""
         
         if messages is None:
           payload = [
@@ -123,18 +311,131 @@ class GUIOwlWrapper(LlmWrapper, MultimodalLlmWrapper):
         else:
           payload = messages
             
-        payload = self.convert_messages_format_to_openaiurl(payload)
-
-        counter = self.max_retry
-        wait_seconds = self.RETRY_WAITING_SECONDS
-        while counter > 0:
-            try:
-              chat_completion_from_url = self.bot.chat.completions.create(model=self.model, messages=payload, **{})
-              return (chat_completion_from_url.choices[0].message.content, payload, chat_completion_from_url)
-            except Exception as e:
-                time.sleep(wait_seconds)
-                wait_seconds *= 1
-                counter -= 1
-                print('Error calling LLM, will retry soon...')
-                print(e)
-        return ERROR_CALLING_LLM, None, None
\ No newline at end of file
+        codec = self.codec_for(role)
+        source_images = [item['image'] for message in payload for item in message['content'] if 'image' in item]
+        max_pixels = self.max_pixels_for(role, len(source_images))
+        encode_start = time.time()
+        payload = self.convert_messages_format_to_openaiurl(payload, codec, max_pixels)
+        encode_seconds = time.time() - encode_start
+        image_urls = [item['image_url']['url'] for message in payload for item in message['content'] if item['type'] == 'image_url']
+        sizes = [image_size(image) for image in source_images]
+        resized = [resized_size(w, h, max_pixels) for w, h in sizes]
+        stats = {
+            "role": role,
+            "codec": repr(codec),
+            "images": len(image_urls),
+            "image_bytes": sum(len(url) for url in image_urls),
+            "encode_seconds": round(encode_seconds, 4),
+            "token_budget": self.role_token_budgets.get(role),
+            "vision_tokens": sum(w * h // PIXELS_PER_TOKEN for w, h in resized),
+            "image_sizes": [list(size) for size in sizes],
+            "resized_sizes": [list(size) for size in resized],
+            # 第一张图 原图/模型输入 的缩放比例，用于把模型输出的绝对坐标映射回屏幕坐标
+            "scale": (sizes[0][0] / resized[0][0], sizes[0][1] / resized[0][1]) if sizes else (1.0, 1.0),
+        }
+        self.call_stats.append(stats)
+        if image_urls:
+            print(f"[LLM] {role or 'call'}: {stats['images']} image(s), {stats['image_bytes'] / 1024:.0f} KB as {stats['codec']}, "
+                  f"{stats['vision_tokens']} vision tokens (budget {stats['token_budget']}), encoded in {encode_seconds * 1000:.0f} ms")
+
+        request_kwargs = {}
+        if self.role_max_tokens.get(role):
+            request_kwargs["max_tokens"] = self.role_max_tokens[role]
+        if self.role_stop.get(role):
+            request_kwargs["stop"] = self.role_stop[role]
+        def request_fn(timeout):
+            # 每次尝试（包括重试）都重新选择端点，失败的端点会被摘除
+            if role in self.stream_roles:
+                create = lambda client: self._create_streaming(client, payload, timeout, role, **request_kwargs)
+            else:
+                create = lambda client: client.chat.completions.create(model=self.model, messages=payload, timeout=timeout, **request_kwargs)
+            result, endpoint = self.endpoints.call(create, session=self.session_id)
+            stats["endpoint"] = endpoint.base_url
+            return result
+
+        response, retry_stats = self.retry_policy.execute(request_fn, task_deadline=self.task_deadline)
+        if response is not None:
+            stats.update(usage_stats(getattr(response, "usage", None)))
+            if stats.get("cached_tokens") is not None:
+                print(f"[LLM] {role or 'call'}: {stats['cached_tokens']}/{stats['prompt_tokens']} prompt tokens served from prefix cache")
+        if isinstance(response, StreamedCompletion):
+            stats.update(response.stats())
+            if response.early_stopped:
+                print(f"[LLM] {role}: required sections complete, stop generation early ({len(response.content)} chars)")
+        stats.update(retry_stats)
+        if retry_stats["attempts"] > 1:
+            print(f"[LLM] {role or 'call'}: {retry_stats['attempts']} attempts, {retry_stats['retry_wait_seconds']:.1f}s spent waiting to retry")
+        if response is None:
+            return ERROR_CALLING_LLM, None, None
+        if isinstance(response, StreamedCompletion):
+            return (response.content, payload, response)
+        return (response.choices[0].message.content, payload, response)
+
+    def _create_streaming(self, client, payload, timeout, role, **request_kwargs):
+        """
+        流式请求：逐段接收输出并增量解析，所需分段都写完后关闭连接（服务端随之中止生成）
+        """
+        sections = ROLE_SECTIONS.get(role)
+        parser = SectionStreamParser(sections) if sections else None
+        start = time.time()
+        completion = StreamedCompletion()
+        stream = client.chat.completions.create(model=self.model, messages=payload, timeout=timeout,
+                                             stream=True, stream_options={"include_usage": True}, **request_kwargs)
+        try:
+            for chunk in stream:
+                # 用量统计在最后一个 choices 为空的分块中返回；提前结束时拿不到
+                if getattr(chunk, "usage", None) is not None:
+                    completion.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if not delta:
+                    continue
+                if completion.first_token_seconds is None:
+                    completion.first_token_seconds = time.time() - start
+                completion.chunks += 1
+                completion.content += delta
+                if parser is not None and parser.feed(delta):
+                    completion.early_stopped = True
+                    completion.content = parser.result()
+                    break
+        finally:
+            stream.close()
+        completion.total_seconds = time.time() - start
+        return completion
+
+
+def usage_stats(usage):
+    """
+    从响应的 usage 中取出提示词 token 数与命中前缀缓存的 token 数
+    服务端未开启前缀缓存或不返回 prompt_tokens_details 时 cached_tokens 为 None
+    """
+    if usage is None:
+        return {}
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    stats = {"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens}
+    if prompt_tokens and cached_tokens is not None:
+        stats["cached_ratio"] = round(cached_tokens / prompt_tokens, 4)
+    return stats
+
+
+class StreamedCompletion:
+    """流式调用的结果：完整（或提前结束时截断到所需分段为止的）文本与计时信息"""
+
+    def __init__(self):
+        self.content = ""
+        self.chunks = 0
+        self.early_stopped = False
+        self.first_token_seconds = None
+        self.total_seconds = None
+        self.usage = None
+
+    def stats(self):
+        return {
+            "streamed": True,
+            "early_stopped": self.early_stopped,
+            "completion_chars": len(self.content),
+            "first_token_seconds": round(self.first_token_seconds, 3) if self.first_token_seconds is not None else None,
+            "generation_seconds": round(self.total_seconds, 3) if self.total_seconds is not None else None,
+        }
@@ -1,10 +1,94 @@
+import os
+import time
+import tempfile
 from abc import ABC, abstractmethod
 
+from PIL import Image
+
+from .frame import Frame
+from .screen_settle import wait_for_stable_screen
+
 class Controller(ABC):
     @abstractmethod
     def get_screenshot(self, save_path):
         pass
 
+    def get_screenshot_image(self):
+        """
+        截图并返回 PIL.Image
+        默认实现借助临时文件完成，子类可覆盖为纯内存实现
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        try:
+            if not self.get_screenshot(tmp_path):
+                return None
+            image = Image.open(tmp_path)
+            image.load()
+            return image
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def capture(self):
+        """
+        截图并返回 Frame（像素、尺寸、采集时间与缓存的编码结果）
+        落盘不在这里完成，需要时由调用方调用 Frame.save_async
+        :return: Frame，失败返回 None
+        """
+        image = self.get_screenshot_image()
+        if image is None:
+            return None
+        return Frame(image)
+
+    def capture_preview(self):
+        """
+        低成本截图，用于等待界面稳定时反复比较画面变化
+        默认没有更廉价的途径，直接返回完整截图；子类可覆盖
+        :return: Frame，失败返回 None
+        """
+        return self.capture()
+
+    def get_foreground_package(self):
+        """
+        获取当前前台应用包名，用于按应用统计界面稳定时间
+        :return: str 包名，不支持时返回 None
+        """
+        return None
+
+    def wait_for_foreground(self, package, timeout=10.0, interval=0.2):
+        """
+        轮询前台应用，直到 package 进入前台
+        :return: 从调用开始到进入前台的秒数，超时返回 None
+        """
+        start = time.time()
+        while True:
+            if self.get_foreground_package() == package:
+                return time.time() - start
+            if time.time() - start >= timeout:
+                return None
+            time.sleep(interval)
+
+    def wait_for_launch(self, package):
+        """
+        open_app 启动命令返回后调用：等待目标应用进入前台，
+        launch_settle 为 True 时再等待界面稳定，超时由 launch_timeout 控制
+        :return: 启动耗时（秒），超时返回 None；结果同时记录在 last_launch_latency
+        """
+        timeout = getattr(self, "launch_timeout", 10.0)
+        start = time.time()
+        latency = self.wait_for_foreground(package, timeout=timeout)
+        if latency is None:
+            print(f"[LAUNCH] {package} not in foreground within {timeout:.1f}s")
+        elif getattr(self, "launch_settle", True):
+            remaining = max(0.5, timeout - latency)
+            _, settle_time, _ = wait_for_stable_screen(self, min_wait=0.0, max_wait=remaining)
+            latency += settle_time
+        if latency is not None:
+            print(f"[LAUNCH] {package} ready after {latency:.2f}s (total wait {time.time() - start:.2f}s)")
+        self.last_launch_latency = latency
+        return latency
+
     @abstractmethod
     def tap(self, x, y):
         pass
@@ -0,0 +1,153 @@
+import subprocess
+import threading
+import time
+
+try:
+    import uiautomator2 as u2
+    U2_AVAILABLE = True
+except ImportError:
+    U2_AVAILABLE = False
+
+
+class DeviceSession:
+    """
+    进程内缓存的设备会话：保存已解析的设备序列号、uiautomator2 连接和输入法状态，
+    在同一进程内的多个步骤、多个任务之间复用，只有真正断开后才重新握手
+    """
+
+    def __init__(self, adb_path, device_id):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.u2_device = None
+        self.fastinput_ime = False
+        self.last_ok_time = 0.0
+        self.connect_count = 0
+        # 同一设备同一时间只允许一个任务操作
+        self.task_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """建立（或重建）uiautomator2 连接"""
+        with self._lock:
+            self.u2_device = None
+            self.fastinput_ime = False
+            if not U2_AVAILABLE:
+                return False
+            try:
+                self.u2_device = u2.connect(self.device_id)
+                self.connect_count += 1
+                self.last_ok_time = time.time()
+                print(f"✓ uiautomator2 connected to device: {self.device_id}")
+                return True
+            except Exception as e:
+                print(f"Warning: Failed to initialize uiautomator2: {e}")
+                return False
+
+    def mark_ok(self):
+        """设备操作成功后调用，刷新健康时间戳"""
+        self.last_ok_time = time.time()
+
+    def mark_broken(self):
+        """设备操作失败后调用，下次获取会话时强制做健康检查"""
+        self.last_ok_time = 0.0
+        self.fastinput_ime = False
+
+    def is_healthy(self, max_idle=30.0):
+        """
+        健康检查：最近 max_idle 秒内有成功操作则直接认为健康，
+        否则通过一次轻量的 u2 info 请求确认连接仍然可用
+        """
+        if self.u2_device is None:
+            return False
+        if time.time() - self.last_ok_time < max_idle:
+            return True
+        try:
+            self.u2_device.info
+            self.mark_ok()
+            return True
+        except Exception as e:
+            print(f"Warning: uiautomator2 health check failed for {self.device_id}: {e}")
+            return False
+
+    def ensure_fastinput_ime(self):
+        """启用快速输入法（FastInputIME），已启用时不再重复切换"""
+        if self.fastinput_ime or self.u2_device is None:
+            return
+        self.u2_device.set_fastinput_ime(True)
+        time.sleep(0.1)  # 等待输入法切换
+        self.fastinput_ime = True
+
+
+_sessions = {}
+_serials = {}
+_registry_lock = threading.Lock()
+
+
+def resolve_device_id(adb_path, refresh=False):
+    """
+    解析 adb 连接的第一个设备序列号，结果按 adb_path 缓存
+    :return: 序列号，未找到设备时返回 None
+    """
+    with _registry_lock:
+        if not refresh and _serials.get(adb_path):
+            return _serials[adb_path]
+    result = subprocess.run(
+        f"{adb_path} devices",
+        capture_output=True,
+        text=True,
+        shell=True
+    )
+    # 解析设备列表
+    devices = []
+    for line in result.stdout.strip().split('\n')[1:]:  # 跳过第一行 "List of devices attached"
+        if '\tdevice' in line:
+            devices.append(line.split('\t')[0])
+    device_id = devices[0] if devices else None
+    with _registry_lock:
+        _serials[adb_path] = device_id
+    return device_id
+
+
+def get_device_session(adb_path, device_id=None):
+    """
+    获取（必要时创建）设备会话；缓存的会话通过健康检查后直接复用，
+    只有在连接真正失效时才重新解析设备并重新握手
+    :return: DeviceSession，未找到设备时返回 None
+    """
+    if device_id is None:
+        device_id = resolve_device_id(adb_path)
+        if device_id is None:
+            print("Warning: No device found for uiautomator2 connection")
+            return None
+
+    with _registry_lock:
+        session = _sessions.get((adb_path, device_id))
+        if session is None:
+            session = DeviceSession(adb_path, device_id)
+            _sessions[(adb_path, device_id)] = session
+
+    if session.is_healthy():
+        return session
+    if session.connect_count > 0:
+        # 曾经连接过但已失效：设备可能重新插拔，重新确认序列号
+        print(f"[SESSION] Reconnecting uiautomator2 for {device_id}")
+        if resolve_device_id(adb_path, refresh=True) is None:
+            return None
+    session.connect()
+    return session
+
+
+def session_stats():
+    """返回所有缓存会话的状态，便于排查"""
+    with _registry_lock:
+        sessions = list(_sessions.values())
+    return [
+        {
+            "device_id": s.device_id,
+            "connected": s.u2_device is not None,
+            "connect_count": s.connect_count,
+            "fastinput_ime": s.fastinput_ime,
+            "idle_seconds": round(time.time() - s.last_ok_time, 1) if s.last_ok_time else None,
+        }
+        for s in sessions
+    ]
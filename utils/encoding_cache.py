@@ -0,0 +1,70 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def image_digest(image):
+    """PIL.Image 内容哈希（尺寸、模式与像素），用于识别内容相同的不同图像对象"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.width}x{image.height}".encode("ascii"))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def file_identity(path):
+    """文件身份：绝对路径 + inode + 大小 + 修改时间，文件被覆盖后自然失效"""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class EncodingCache:
+    """
+    图像编码结果（base64 data URL）的进程级 LRU 缓存，按占用字节数淘汰
+    键由图像身份（文件身份或内容哈希）与编码参数（缩放范围、格式等）组成
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, key, encode_fn):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # 编码在锁外进行，避免阻塞其他线程的命中查询
+        value = encode_fn()
+        size = len(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,247 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from utils.llm_clients import get_client
+from utils.retry_policy import is_retryable
+
+ROUTING_MODES = ("least_outstanding", "latency")
+
+
+class Endpoint:
+    """端点组中的一个服务副本：共享客户端、在途请求数、延迟统计与健康状态"""
+
+    def __init__(self, base_url, pooled):
+        self.base_url = base_url
+        self.pooled = pooled
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        # 成功请求耗时的指数滑动平均（秒），尚无样本时为 None
+        self.latency = None
+        self.ejected_at = None
+        self.next_probe = None
+        self.probing = False
+
+    @property
+    def client(self):
+        return self.pooled.client
+
+    @property
+    def healthy(self):
+        return self.ejected_at is None
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class EndpointGroup:
+    """
+    多个 OpenAI 兼容服务副本的负载均衡：
+    路由按最少在途请求或延迟加权选择端点；连续失败的端点被摘除，定期探活后重新加入；
+    可选按会话（任务）粘滞到同一端点，保持服务端前缀缓存的局部性
+    """
+
+    def __init__(self, base_urls, api_key, routing="least_outstanding", sticky=False, eject_after=3,
+                 probe_interval=10.0, probe_timeout=3.0, latency_alpha=0.3, max_sessions=1024, **client_kwargs):
+        """
+        :param base_urls: 端点 base_url 列表
+        :param routing: least_outstanding（在途请求最少）或 latency（平均延迟 ×（在途请求 + 1）最小）
+        :param sticky: 同一会话的请求优先发往上次的端点，端点被摘除时才改选
+        :param eject_after: 连续可重试错误（网络错误、超时、5xx、限流）达到该次数时摘除端点
+        :param probe_interval: 被摘除端点的探活间隔（秒）
+        :param probe_timeout: 探活请求超时
+        :param latency_alpha: 延迟滑动平均的新样本权重
+        :param max_sessions: 粘滞会话表的最大条目数，超出时淘汰最久未用的会话
+        :param client_kwargs: 传给 get_client 的连接池参数
+        """
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode: {routing}, expected one of {ROUTING_MODES}")
+        if not base_urls:
+            raise ValueError("EndpointGroup requires at least one base_url")
+        self.routing = routing
+        self.sticky = sticky
+        self.eject_after = max(1, eject_after)
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.latency_alpha = latency_alpha
+        self.max_sessions = max_sessions
+        self.endpoints = [Endpoint(url, get_client(url, api_key, **client_kwargs)) for url in base_urls]
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def base_urls(self):
+        return [endpoint.base_url for endpoint in self.endpoints]
+
+    def _score(self, endpoint):
+        if self.routing == "latency":
+            # 还没有延迟样本的端点先试一下，避免永远不被选中
+            latency = endpoint.latency if endpoint.latency is not None else 0.0
+            return latency * (endpoint.outstanding + 1), endpoint.outstanding
+        return endpoint.outstanding, endpoint.requests
+
+    def _choose(self, candidates):
+        best = min(self._score(endpoint) for endpoint in candidates)
+        # 分数相同时随机选择，避免并发任务同时涌向列表中的第一个端点
+        return random.choice([endpoint for endpoint in candidates if self._score(endpoint) == best])
+
+    def acquire(self, session=None):
+        """选择一个端点并计入在途请求；调用结束后必须调用 release"""
+        self._start_due_probes()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+            endpoint = None
+            if self.sticky and session is not None:
+                endpoint = self._sessions.get(session)
+                if endpoint is not None and not endpoint.healthy:
+                    endpoint = None
+            if endpoint is None:
+                if healthy:
+                    endpoint = self._choose(healthy)
+                else:
+                    # 全部被摘除时不直接失败，选摘除最早的端点尝试（由重试策略控制总时长）
+                    endpoint = min(self.endpoints, key=lambda e: e.ejected_at)
+            if self.sticky and session is not None:
+                self._sessions[session] = endpoint
+                self._sessions.move_to_end(session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, latency=None, error=None):
+        """
+        记录一次调用结果
+        :param latency: 成功时的请求耗时（秒）
+        :param error: 失败时的异常；不可重试的错误（如 400）说明请求本身有问题，不计入端点健康
+        """
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if error is None:
+                endpoint.consecutive_failures = 0
+                if latency is not None:
+                    if endpoint.latency is None:
+                        endpoint.latency = latency
+                    else:
+                        endpoint.latency += self.latency_alpha * (latency - endpoint.latency)
+                if not endpoint.healthy:
+                    self._readmit(endpoint, "request succeeded")
+                return
+            if not is_retryable(error):
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejected_at = time.time()
+                endpoint.next_probe = endpoint.ejected_at + self.probe_interval
+                print(f"[ENDPOINT] eject {endpoint.base_url} after {endpoint.consecutive_failures} consecutive failures: {type(error).__name__}")
+
+    def _readmit(self, endpoint, reason):
+        endpoint.ejected_at = None
+        endpoint.next_probe = None
+        endpoint.consecutive_failures = 0
+        # 恢复后的延迟可能与摘除前不同，重新采样
+        endpoint.latency = None
+        print(f"[ENDPOINT] re-admit {endpoint.base_url} ({reason})")
+
+    def _start_due_probes(self):
+        now = time.time()
+        with self._lock:
+            due = [endpoint for endpoint in self.endpoints
+                   if not endpoint.healthy and not endpoint.probing and endpoint.next_probe <= now]
+            for endpoint in due:
+                endpoint.probing = True
+        for endpoint in due:
+            threading.Thread(target=self._probe, args=(endpoint,), daemon=True,
+                             name=f"EndpointProbe-{endpoint.base_url}").start()
+
+    def probe(self, endpoint):
+        """探活：请求 {base_url}/models，服务端有响应（非 5xx）即视为可用"""
+        try:
+            response = endpoint.pooled.http_client.get(endpoint.base_url.rstrip("/") + "/models", timeout=self.probe_timeout)
+            return response.status_code < 500
+        except Exception:
+            return False
+
+    def _probe(self, endpoint):
+        alive = self.probe(endpoint)
+        with self._lock:
+            endpoint.probing = False
+            if endpoint.healthy:
+                return
+            if alive:
+                self._readmit(endpoint, "probe succeeded")
+            else:
+                endpoint.next_probe = time.time() + self.probe_interval
+
+    def call(self, request_fn, session=None):
+        """在选中的端点上执行 request_fn(client) 并记录结果，异常原样抛出交给重试策略"""
+        endpoint = self.acquire(session)
+        start = time.time()
+        try:
+            result = request_fn(endpoint.client)
+        except Exception as e:
+            self.release(endpoint, error=e)
+            raise
+        self.release(endpoint, latency=time.time() - start)
+        return result, endpoint
+
+    def stats(self):
+        with self._lock:
+            return {
+                "routing": self.routing,
+                "sticky": self.sticky,
+                "sessions": len(self._sessions),
+                "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+            }
+
+
+_groups = {}
+_registry_lock = threading.Lock()
+
+
+def parse_base_urls(base_url):
+    """'http://a/v1,http://b/v1' 或列表 -> 去重后的 base_url 列表"""
+    if isinstance(base_url, str):
+        base_url = base_url.split(",")
+    urls = []
+    for url in base_url:
+        url = url.strip()
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def get_endpoint_group(base_url, api_key, routing="least_outstanding", sticky=False, **kwargs):
+    """
+    获取进程内共享的 EndpointGroup，按 (端点列表, api_key, 路由方式, 粘滞) 复用，
+    使同一进程中并发的任务看到一致的在途请求数和健康状态
+    :param base_url: 单个 base_url、逗号分隔的多个 base_url 或列表
+    :param kwargs: 首次创建时的其余参数（eject_after、probe_interval 等）
+    """
+    urls = parse_base_urls(base_url)
+    key = (tuple(urls), api_key, routing, sticky)
+    with _registry_lock:
+        group = _groups.get(key)
+        if group is None:
+            group = EndpointGroup(urls, api_key, routing=routing, sticky=sticky, **kwargs)
+            _groups[key] = group
+        return group
+
+
+def endpoint_group_stats():
+    with _registry_lock:
+        groups = list(_groups.values())
+    return [group.stats() for group in groups]
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 单线程写盘，保证同一路径的多次保存按提交顺序完成
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FrameWriter")
+
+
+class Frame:
+    """
+    一次截图的内存表示：像素、尺寸、采集时间，以及按需计算并缓存的编码结果
+    智能体主循环、LLM 封装和日志写入共用同一个 Frame，避免重复读盘和重复编码
+    """
+
+    def __init__(self, image, timestamp=None, path=None, preview=False):
+        """
+        :param preview: 是否为仅用于变化检测的低成本帧（如未经 PNG 编码的原始帧缓冲区），
+                        需要作为操作后截图时应再采集一次完整截图
+        """
+        self.image = image
+        self.width, self.height = image.size
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.path = path
+        self.preview = preview
+        self._encoded = {}
+        self._lock = threading.Lock()
+        self._save_future = None
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+    def encoded(self, key, encode_fn):
+        """
+        返回按 key 缓存的编码结果，首次访问时调用 encode_fn(image) 计算
+        :param key: 编码参数（如格式、缩放范围），不同参数分别缓存
+        """
+        with self._lock:
+            if key not in self._encoded:
+                self._encoded[key] = encode_fn(self.image)
+            return self._encoded[key]
+
+    def save(self, path):
+        """同步保存为 PNG（快速压缩）"""
+        save_dir = os.path.dirname(path)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir, exist_ok=True)
+        image = self.image if self.image.mode in ("RGB", "L", "P") else self.image.convert("RGB")
+        image.save(path, format="PNG", compress_level=1)
+        self.path = path
+        return path
+
+    def save_async(self, path):
+        """在后台线程中保存，不阻塞主循环"""
+        self.path = path
+        self._save_future = _writer.submit(self._save_quietly, path)
+        return self._save_future
+
+    def _save_quietly(self, path):
+        try:
+            return self.save(path)
+        except Exception as e:
+            print(f"Warning: Failed to save screenshot {path}: {e}")
+            return None
+
+    def wait_saved(self, timeout=None):
+        """等待后台保存完成，返回保存路径（失败为 None）"""
+        if self._save_future is None:
+            return self.path
+        return self._save_future.result(timeout=timeout)
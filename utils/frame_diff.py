@@ -0,0 +1,221 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from .screen_settle import frame_thumbnail
+
+# 变化检测用缩略图尺寸（宽, 高），比稳定检测更细，保证复选框等小控件的变化也能体现
+DIFF_SIZE = (108, 240)
+# 顶部状态栏（时间、信号、电量）所占高度比例，比较时忽略
+STATUS_BAR_RATIO = 0.04
+
+
+def frame_dhash(frame, hash_size=16, ignore_top=STATUS_BAR_RATIO):
+    """
+    差值感知哈希（dHash，不含状态栏）：返回 hash_size*hash_size 个比特的 bool 数组，结果缓存在 Frame 上
+    """
+    def _dhash(image):
+        top = int(round(image.height * ignore_top))
+        gray = image.convert("L").crop((0, top, image.width, image.height)).resize((hash_size + 1, hash_size))
+        pixels = np.asarray(gray, dtype=np.int16)
+        return (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return frame.encoded(("dhash", hash_size, ignore_top), _dhash)
+
+
+def hash_distance(frame_a, frame_b, hash_size=16):
+    """两帧 dHash 的汉明距离（不同比特数）"""
+    return int(np.count_nonzero(frame_dhash(frame_a, hash_size) != frame_dhash(frame_b, hash_size)))
+
+
+def changed_mask(frame_a, frame_b, size=DIFF_SIZE, pixel_delta=16, ignore_top=STATUS_BAR_RATIO):
+    """
+    逐像素比较两帧的灰度缩略图
+    :return: bool 数组（高, 宽），True 表示该位置灰度变化超过 pixel_delta；状态栏区域恒为 False
+    """
+    a = frame_thumbnail(frame_a, size)
+    b = frame_thumbnail(frame_b, size)
+    mask = np.abs(a - b) > pixel_delta
+    mask[:int(round(mask.shape[0] * ignore_top))] = False
+    return mask
+
+
+class NoChangeDetector:
+    """
+    判断操作前后两帧是否实质相同：dHash 距离与变化像素比例都不超过阈值时认为界面没有变化，
+    此时可以直接记为 C（无变化），跳过 ActionReflector 的 LLM 调用
+    """
+
+    def __init__(self, hash_threshold=0, changed_ratio_threshold=0.0005, pixel_delta=16,
+                 skip_actions=("wait",), audit_path=None):
+        """
+        :param hash_threshold: dHash（256 比特）允许不同的比特数
+        :param changed_ratio_threshold: 允许变化的缩略图像素比例
+        :param pixel_delta: 灰度变化超过该值的像素才计为变化
+        :param skip_actions: 这些动作即使界面无变化也交给 Reflector 判断（例如等待本来就可能无变化）
+        :param audit_path: 审计日志（JSONL）路径，记录每次比较的指标与判定，None 表示不记录
+        """
+        self.hash_threshold = hash_threshold
+        self.changed_ratio_threshold = changed_ratio_threshold
+        self.pixel_delta = pixel_delta
+        self.skip_actions = tuple(skip_actions)
+        self.audit_path = audit_path
+
+    def compare(self, before, after):
+        """:return: 比较指标 dict"""
+        mask = changed_mask(before, after, pixel_delta=self.pixel_delta)
+        return {
+            "hash_distance": hash_distance(before, after),
+            "changed_ratio": round(float(mask.mean()), 6),
+        }
+
+    def check(self, action, before, after, step=None):
+        """
+        :return: (unchanged, metrics)；action 在 skip_actions 中或截图缺失时 unchanged 恒为 False
+        """
+        action_name = action.get("action") if isinstance(action, dict) else action
+        if action_name in self.skip_actions or before is None or after is None or before.size != after.size:
+            return False, None
+        metrics = self.compare(before, after)
+        unchanged = (metrics["hash_distance"] <= self.hash_threshold
+                     and metrics["changed_ratio"] <= self.changed_ratio_threshold)
+        self.audit(step, action, metrics, unchanged)
+        return unchanged, metrics
+
+    def audit(self, step, action, metrics, unchanged):
+        if not self.audit_path:
+            return
+        record = {
+            "time": round(time.time(), 3),
+            "step": step,
+            "action": action,
+            "metrics": metrics,
+            "thresholds": {"hash_distance": self.hash_threshold, "changed_ratio": self.changed_ratio_threshold},
+            "reflector_skipped": unchanged,
+        }
+        try:
+            audit_dir = os.path.dirname(self.audit_path)
+            if audit_dir and not os.path.exists(audit_dir):
+                os.makedirs(audit_dir, exist_ok=True)
+            with open(self.audit_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Warning: Failed to write no-change audit log {self.audit_path}: {e}")
+
+
+def _dilate(mask, radius):
+    """对 bool 掩码做方形膨胀，把相邻的零散变化点连成一片"""
+    if radius <= 0:
+        return mask
+    h, w = mask.shape
+    padded = np.pad(mask, radius)
+    out = np.zeros_like(mask)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            out |= padded[dy:dy + h, dx:dx + w]
+    return out
+
+
+def _components(mask):
+    """四连通区域的外接框列表 [(x1, y1, x2, y2)]，坐标为掩码格子下标（右下为开区间）"""
+    h, w = mask.shape
+    seen = np.zeros_like(mask)
+    boxes = []
+    for y0, x0 in zip(*np.nonzero(mask)):
+        if seen[y0, x0]:
+            continue
+        seen[y0, x0] = True
+        stack = [(y0, x0)]
+        x1, y1, x2, y2 = x0, y0, x0, y0
+        while stack:
+            y, x = stack.pop()
+            x1, y1, x2, y2 = min(x1, x), min(y1, y), max(x2, x), max(y2, y)
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < h and 0 <= nx < w and mask[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    stack.append((ny, nx))
+        boxes.append((int(x1), int(y1), int(x2) + 1, int(y2) + 1))
+    return boxes
+
+
+def _box_area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _union(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def changed_regions(before, after, max_regions=3, pixel_delta=16, dilate=2, min_cells=2, pad=24,
+                    min_side=56, max_coverage=0.5):
+    """
+    计算两帧之间发生变化的区域
+    :param max_regions: 最多返回的区域数，超出时合并代价最小的两个区域
+    :param dilate: 缩略图上的膨胀半径（格子数），相邻变化合并为一个区域
+    :param min_cells: 少于该格子数的变化视为噪声
+    :param pad: 区域在原图上向外扩展的像素数
+    :param min_side: 区域在原图上的最小边长
+    :param max_coverage: 变化区域并集超过整屏该比例时（如页面跳转）返回空列表，应直接比较整图
+    :return: 原图坐标下的区域列表 [(x1, y1, x2, y2)]，按面积从大到小排列
+    """
+    mask = changed_mask(before, after, pixel_delta=pixel_delta)
+    if not mask.any():
+        return []
+    boxes = [b for b in _components(_dilate(mask, dilate))
+             if np.count_nonzero(mask[b[1]:b[3], b[0]:b[2]]) >= min_cells]
+    if not boxes:
+        return []
+
+    while len(boxes) > max_regions:
+        best = None
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                merged = _union(boxes[i], boxes[j])
+                cost = _box_area(merged) - _box_area(boxes[i]) - _box_area(boxes[j])
+                if best is None or cost < best[0]:
+                    best = (cost, i, j, merged)
+        _, i, j, merged = best
+        boxes = [b for k, b in enumerate(boxes) if k not in (i, j)] + [merged]
+
+    grid_h, grid_w = mask.shape
+    width, height = after.size
+    sx, sy = width / grid_w, height / grid_h
+    regions = []
+    for x1, y1, x2, y2 in boxes:
+        x1, y1 = max(0, int(x1 * sx) - pad), max(0, int(y1 * sy) - pad)
+        x2, y2 = min(width, int(x2 * sx) + pad), min(height, int(y2 * sy) + pad)
+        if x2 - x1 < min_side:
+            x1 = max(0, min(x1, width - min_side))
+            x2 = min(width, x1 + min_side)
+        if y2 - y1 < min_side:
+            y1 = max(0, min(y1, height - min_side))
+            y2 = min(height, y1 + min_side)
+        regions.append((x1, y1, x2, y2))
+
+    covered = np.zeros((height // 8 + 1, width // 8 + 1), dtype=bool)
+    for x1, y1, x2, y2 in regions:
+        covered[y1 // 8:y2 // 8 + 1, x1 // 8:x2 // 8 + 1] = True
+    if covered.mean() > max_coverage:
+        return []
+    return sorted(regions, key=_box_area, reverse=True)
+
+
+def reflector_crop_inputs(before, after, max_regions=3, overview_scale=0.5):
+    """
+    构造 Reflector 的裁剪输入：缩小的操作后整屏截图 + 每个变化区域操作前后的原分辨率裁剪
+    :return: (images, regions)；没有可用的局部变化区域时 regions 为空，调用方应改用两张整图
+    """
+    regions = changed_regions(before, after, max_regions=max_regions)
+    if not regions:
+        return [], []
+    overview = after.encoded(
+        ("overview", overview_scale),
+        lambda image: image.resize((max(28, int(image.width * overview_scale)),
+                                    max(28, int(image.height * overview_scale)))),
+    )
+    images = [overview]
+    for box in regions:
+        images.append(before.image.crop(box))
+        images.append(after.image.crop(box))
+    return images, regions
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import deque
+
+
+class FrameStream:
+    """
+    后台持续截图的帧源
+    在后台线程中循环调用 capture_fn，把最新的若干帧（连同采集时间戳）保存在环形缓冲区里，
+    调用方可以几乎零等待地拿到最新帧，并通过 newer_than 要求帧必须晚于某个时刻（如上一次操作）
+    """
+
+    def __init__(self, capture_fn, interval=0.0, buffer_size=3):
+        """
+        :param capture_fn: 无参函数，返回一帧图像（PIL.Image），失败返回 None
+        :param interval: 两次采集之间的最小间隔（秒），0 表示连续采集
+        :param buffer_size: 环形缓冲区保留的帧数
+        """
+        self.capture_fn = capture_fn
+        self.interval = interval
+        self.frames = deque(maxlen=max(1, buffer_size))
+        self.frame_count = 0
+        self.error_count = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="FrameStream", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # 时间戳取采集开始时刻，保证“晚于上一次操作”的判断是保守的
+            started = time.time()
+            try:
+                frame = self.capture_fn()
+            except Exception as e:
+                print(f"[FRAME_STREAM] Warning: capture failed: {e}")
+                frame = None
+            if frame is None:
+                self.error_count += 1
+                self._stop.wait(0.5)
+                continue
+            with self._cond:
+                self.frames.append((frame, started))
+                self.frame_count += 1
+                self._cond.notify_all()
+            if self.interval > 0:
+                self._stop.wait(max(0.0, self.interval - (time.time() - started)))
+
+    def latest(self):
+        """
+        :return: (frame, timestamp)，缓冲区为空时返回 (None, None)
+        """
+        with self._cond:
+            if not self.frames:
+                return None, None
+            return self.frames[-1]
+
+    def wait_for_frame(self, newer_than=None, timeout=5.0):
+        """
+        等待一帧采集开始时间晚于 newer_than 的图像
+        :return: (frame, timestamp)，超时返回 (None, None)
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                if self.frames:
+                    frame, timestamp = self.frames[-1]
+                    if newer_than is None or timestamp > newer_than:
+                        return frame, timestamp
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.is_running():
+                    return None, None
+                self._cond.wait(remaining)
@@ -0,0 +1,100 @@
+import base64
+import shlex
+
+
+class GestureBatch:
+    """
+    手势批处理：把一串基本操作（点击、滑动、按键、文本、等待）收集起来，
+    拼成一段设备端 shell 脚本，一次往返发送到设备执行
+    """
+
+    DIALECTS = ("android", "harmonyos")
+
+    def __init__(self, dialect="android"):
+        if dialect not in self.DIALECTS:
+            raise ValueError(f"unknown gesture dialect: {dialect}")
+        self.dialect = dialect
+        self.steps = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def tap(self, x, y, duration_ms=None):
+        self.steps.append(("tap", int(x), int(y), duration_ms))
+        return self
+
+    def swipe(self, x1, y1, x2, y2, duration_ms=500):
+        self.steps.append(("swipe", int(x1), int(y1), int(x2), int(y2), int(duration_ms)))
+        return self
+
+    def keyevent(self, key):
+        self.steps.append(("keyevent", key))
+        return self
+
+    def text(self, text):
+        if text:
+            self.steps.append(("text", text))
+        return self
+
+    def ime_text(self, text):
+        """通过输入法广播输入（Android 需要 ADB Keyboard），适用于中文等非 ASCII 文本"""
+        if text:
+            self.steps.append(("ime_text", text))
+        return self
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.steps.append(("sleep", seconds))
+        return self
+
+    def to_commands(self):
+        """返回每个基本操作对应的设备端命令列表"""
+        render = self._android_command if self.dialect == "android" else self._harmonyos_command
+        return [render(step) for step in self.steps]
+
+    def to_script(self):
+        """拼接为单行 shell 脚本（前一条失败不影响后续命令执行）"""
+        return " ; ".join(self.to_commands())
+
+    @staticmethod
+    def _android_command(step):
+        kind = step[0]
+        if kind == "tap":
+            _, x, y, duration_ms = step
+            if duration_ms:
+                # 与 AndroidController.tap 一致：短时同点 swipe 模拟点击
+                return f"input swipe {x} {y} {x+2} {y+2} {int(duration_ms)}"
+            return f"input tap {x} {y}"
+        if kind == "swipe":
+            _, x1, y1, x2, y2, duration_ms = step
+            return f"input swipe {x1} {y1} {x2} {y2} {duration_ms}"
+        if kind == "keyevent":
+            return f"input keyevent {step[1]}"
+        if kind == "text" and step[1].isascii():
+            return "input text " + shlex.quote(step[1].replace(" ", "%s"))
+        if kind in ("text", "ime_text"):
+            # 非 ASCII 文本需要 ADB Keyboard；用 base64 传输，避免设备端 shell 和 am 的转义问题
+            encoded = base64.b64encode(step[1].encode("utf-8")).decode("ascii")
+            return f"am broadcast -a ADB_INPUT_B64 --es msg {encoded}"
+        if kind == "sleep":
+            return f"sleep {step[1]}"
+        raise ValueError(f"unknown gesture step: {kind}")
+
+    @staticmethod
+    def _harmonyos_command(step):
+        kind = step[0]
+        if kind == "tap":
+            _, x, y, duration_ms = step
+            if duration_ms and duration_ms >= 500:
+                return f"uitest uiInput longClick {x} {y}"
+            return f"uitest uiInput click {x} {y}"
+        if kind == "swipe":
+            _, x1, y1, x2, y2, duration_ms = step
+            return f"uitest uiInput swipe {x1} {y1} {x2} {y2} {duration_ms}"
+        if kind == "keyevent":
+            return f"uitest uiInput keyEvent {step[1]}"
+        if kind in ("text", "ime_text"):
+            return "uitest uiInput inputText 1 1 " + shlex.quote(step[1])
+        if kind == "sleep":
+            return f"sleep {step[1]}"
+        raise ValueError(f"unknown gesture step: {kind}")
@@ -1,50 +1,162 @@
 import os
+import io
 import time
+import tempfile
 import subprocess
+from PIL import Image
 from .controller import Controller
+from .gesture_batch import GestureBatch
+from .text_input import fill_batch
+
+def parse_foreground_bundle(output):
+    """从 aa dump -l 的输出中找出状态为 FOREGROUND 的 ability 所属包名，没有时返回 None"""
+    bundle_name = None
+    for line in (output or "").splitlines():
+        line = line.strip()
+        # 形如: bundle name [com.huawei.hmos.photos] / state #FOREGROUND
+        if line.startswith("bundle name") and "[" in line:
+            bundle_name = line[line.index("[") + 1:line.rindex("]")]
+        elif line.startswith("state") and "FOREGROUND" in line and bundle_name:
+            return bundle_name
+    return None
+
 
 class HarmonyOSController(Controller):
+    # 常见应用包名映射（HarmonyOS）
+    APP_PACKAGES = {
+        '微博': 'com.sina.weibo',
+        'weibo': 'com.sina.weibo',
+        '微信': 'com.tencent.mm',
+        'wechat': 'com.tencent.mm',
+        '抖音': 'com.ss.android.ugc.aweme',
+        'douyin': 'com.ss.android.ugc.aweme',
+        '小红书': 'com.xingin.xhs',
+        'xiaohongshu': 'com.xingin.xhs',
+        '淘宝': 'com.taobao.taobao',
+        'taobao': 'com.taobao.taobao',
+        '支付宝': 'com.eg.android.AlipayGphone',
+        'alipay': 'com.eg.android.AlipayGphone',
+        '哔哩哔哩': 'tv.danmaku.bili',
+        'bilibili': 'tv.danmaku.bili',
+        'b站': 'tv.danmaku.bili',
+        'QQ': 'com.tencent.mobileqq',
+        'qq': 'com.tencent.mobileqq',
+    }
+
+    REMOTE_SCREENSHOT_PATH = "/data/local/tmp/screenshot.png"
+
     def __init__(self, hdc_path):
         self.hdc_path = hdc_path
+        # open_app 启动后等待应用进入前台的超时秒数，以及是否再等待界面稳定
+        # （由调用方自行检测界面稳定时可将 launch_settle 设为 False）
+        self.launch_timeout = 10.0
+        self.launch_settle = True
+        self.last_launch_latency = None
 
-    def get_screenshot(self, save_path):
-        command = self.hdc_path + " shell rm /data/local/tmp/screenshot.png"
-        subprocess.run(command, capture_output=True, text=True, shell=True)
-        time.sleep(0.5)
-        command = self.hdc_path + " shell uitest screenCap -p /data/local/tmp/screenshot.png"
-        subprocess.run(command, capture_output=True, text=True, shell=True)
-        time.sleep(0.5)
-        command = self.hdc_path + " file recv /data/local/tmp/screenshot.png " + save_path
-        subprocess.run(command, capture_output=True, text=True, shell=True)
-        time.sleep(0.5)
+    def _capture_to_file(self, save_path):
+        """
+        设备端的删除旧文件与截图合并为一次 hdc shell 调用，再用一次 file recv 拉取；
+        每条命令都同步等待结束，不再使用固定 sleep
+        """
+        remote = self.REMOTE_SCREENSHOT_PATH
+        # 先删除本地旧文件，避免上一次运行残留的截图被误判为成功
+        if os.path.exists(save_path):
+            os.remove(save_path)
+        start = time.time()
 
-        if not os.path.exists(save_path):
+        command = self.hdc_path + f' shell "rm -f {remote}; uitest screenCap -p {remote}"'
+        result = subprocess.run(command, capture_output=True, text=True, shell=True)
+        if result.returncode != 0:
+            print(f"Error: hdc screenCap failed: {result.stderr.strip() or result.stdout.strip()}")
+            return False
+
+        command = self.hdc_path + f' file recv {remote} "{save_path}"'
+        result = subprocess.run(command, capture_output=True, text=True, shell=True)
+        if result.returncode != 0 or "fail" in result.stdout.lower():
+            print(f"Error: hdc file recv failed: {result.stderr.strip() or result.stdout.strip()}")
+            return False
+
+        if not os.path.exists(save_path) or os.path.getsize(save_path) == 0:
+            print(f"Error: Screenshot file missing or empty: {save_path}")
+            return False
+        # 文件时间早于本次截图开始，说明拿到的不是本次截图
+        if os.path.getmtime(save_path) < start - 1:
+            print(f"Error: Screenshot file is stale: {save_path}")
+            return False
+        print(f"[SCREENSHOT] hdc capture cost={int((time.time() - start) * 1000)}ms")
+        return True
+
+    def get_screenshot_bytes(self):
+        """
+        截图并以 PNG 字节返回，中间文件只在本机临时目录中短暂存在
+        :return: bytes，失败返回 None
+        """
+        fd, tmp_path = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
+        try:
+            if not self._capture_to_file(tmp_path):
+                return None
+            with open(tmp_path, "rb") as f:
+                return f.read()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_screenshot_image(self):
+        """
+        截图并解码为 PIL.Image
+        :return: PIL.Image，失败返回 None
+        """
+        data = self.get_screenshot_bytes()
+        if data is None:
+            return None
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return image
+        except Exception as e:
+            print(f"Warning: Failed to decode hdc screenshot: {e}")
+            return None
+
+    def get_screenshot(self, save_path):
+        save_dir = os.path.dirname(save_path)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir, exist_ok=True)
+        try:
+            return self._capture_to_file(save_path)
+        except Exception as e:
+            print(f"Error: Screenshot failed with exception: {e}")
             return False
-        else:
-            return True
 
     def tap(self, x, y):
         command = self.hdc_path + f" shell uitest uiInput click {x} {y}"
         subprocess.run(command, capture_output=True, text=True, shell=True)
 
     def type(self, text):
-        text = text.replace("\\n", "_").replace("\n", "_")
-        for char in text:
-            if char == ' ':
-                command = self.adb_path + f" shell uitest uiInput keyEvent 2050"
-                subprocess.run(command, capture_output=True, text=True, shell=True)
-            elif char == '_':
-                command = self.hdc_path + f" shell uitest uiInput keyEvent 2054"
-                subprocess.run(command, capture_output=True, text=True, shell=True)
-            elif 'a' <= char <= 'z' or 'A' <= char <= 'Z' or char.isdigit():
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 {char}"
-                subprocess.run(command, capture_output=True, text=True, shell=True)
-            elif char in '-.,!?@\'°/:;()':
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 \"{char}\""
-                subprocess.run(command, capture_output=True, text=True, shell=True)
-            else:
-                command = self.hdc_path + f" shell uitest uiInput inputText 1 1 {char}"
-                subprocess.run(command, capture_output=True, text=True, shell=True)
+        # 文本切成尽量少的片段（仅在换行处断开），整体作为一个批处理一次 hdc shell 调用完成
+        batch = self.new_batch()
+        runs = fill_batch(batch, text)
+        print(f"[TYPE] {len(text)} chars -> {runs} runs")
+        result = self.run_batch(batch)
+        if result.returncode != 0:
+            print(f"Warning: hdc batched input returned code={result.returncode}: {(result.stdout + result.stderr).strip()}")
+
+    def new_batch(self):
+        """创建一个 HarmonyOS 手势批处理"""
+        return GestureBatch("harmonyos")
+
+    def run_batch(self, batch):
+        """
+        将批处理中的全部基本操作作为一段脚本，通过一次 hdc shell 调用发送到设备
+        :return: subprocess.CompletedProcess
+        """
+        if len(batch) == 0:
+            return subprocess.CompletedProcess("", 0, "", "")
+        t0 = time.time()
+        # 脚本作为单个参数传给 hdc，避免宿主机 shell 再次解析引号
+        result = subprocess.run([self.hdc_path, "shell", batch.to_script()], capture_output=True, text=True)
+        print(f"[BATCH] {len(batch)} steps in one round-trip. cost={int((time.time() - t0) * 1000)}ms code={result.returncode}")
+        return result
 
     def slide(self, x1, y1, x2, y2):
         command = self.hdc_path + f" shell uitest uiInput swipe {x1} {y1} {x2} {y2} 500"
@@ -58,36 +170,25 @@ class HarmonyOSController(Controller):
         command = self.hdc_path + " shell uitest uiInput keyEvent Home"
         subprocess.run(command, capture_output=True, text=True, shell=True)
 
+    def get_foreground_package(self):
+        """
+        获取当前前台应用包名（解析 aa dump -l 中状态为 FOREGROUND 的 ability）
+        :return: str 包名，获取失败返回 None
+        """
+        command = self.hdc_path + " shell aa dump -l"
+        result = subprocess.run(command, capture_output=True, text=True, shell=True)
+        return parse_foreground_bundle(result.stdout)
+
     def open_app(self, app_identifier):
         """
         打开应用，支持应用名或包名
         :param app_identifier: 应用名或包名
         :return: bool 是否成功
         """
-        # 常见应用包名映射（HarmonyOS）
-        APP_PACKAGES = {
-            '微博': 'com.sina.weibo',
-            'weibo': 'com.sina.weibo',
-            '微信': 'com.tencent.mm',
-            'wechat': 'com.tencent.mm',
-            '抖音': 'com.ss.android.ugc.aweme',
-            'douyin': 'com.ss.android.ugc.aweme',
-            '小红书': 'com.xingin.xhs',
-            'xiaohongshu': 'com.xingin.xhs',
-            '淘宝': 'com.taobao.taobao',
-            'taobao': 'com.taobao.taobao',
-            '支付宝': 'com.eg.android.AlipayGphone',
-            'alipay': 'com.eg.android.AlipayGphone',
-            '哔哩哔哩': 'tv.danmaku.bili',
-            'bilibili': 'tv.danmaku.bili',
-            'b站': 'tv.danmaku.bili',
-            'QQ': 'com.tencent.mobileqq',
-            'qq': 'com.tencent.mobileqq',
-        }
         
         # 判断是应用名还是包名
-        if app_identifier in APP_PACKAGES:
-            package_name = APP_PACKAGES[app_identifier]
+        if app_identifier in self.APP_PACKAGES:
+            package_name = self.APP_PACKAGES[app_identifier]
         elif '.' in app_identifier:
             package_name = app_identifier
         else:
@@ -99,8 +200,8 @@ class HarmonyOSController(Controller):
         result = subprocess.run(command, capture_output=True, text=True, shell=True)
         
         if result.returncode == 0:
+            self.wait_for_launch(package_name)
             print(f"成功打开应用: {app_identifier} ({package_name})")
-            time.sleep(3)
             return True
         else:
             print(f"打开应用失败: {app_identifier}, 将使用默认的点击方式")
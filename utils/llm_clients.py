@@ -0,0 +1,119 @@
+import threading
+import weakref
+
+import httpx
+from openai import OpenAI
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 连接池默认大小：同一 (base_url, api_key) 的所有调用方共用
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_MAX_KEEPALIVE = 16
+DEFAULT_KEEPALIVE_EXPIRY = 120.0
+
+
+class PooledClient:
+    """一个 (base_url, api_key) 对应的 OpenAI 客户端及其底层 httpx 连接池"""
+
+    def __init__(self, base_url, api_key, timeout=30, max_connections=DEFAULT_MAX_CONNECTIONS,
+                 max_keepalive=DEFAULT_MAX_KEEPALIVE, http2=None):
+        self.base_url = base_url
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+        self.max_connections = max_connections
+        self.requests = 0
+        self.created = 0
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.http_client = httpx.Client(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+            ),
+            timeout=timeout,
+            event_hooks={"response": [self._on_response]},
+        )
+        # 重试由调用方的 RetryPolicy 负责，关闭 SDK 内置重试，避免重试次数叠加、端点失败计数失真
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, http_client=self.http_client,
+                             max_retries=0)
+
+    def _connections(self):
+        # httpx 没有公开连接池状态，读取底层 httpcore 连接池；结构变化时返回空列表
+        try:
+            return list(self.http_client._transport._pool.connections)
+        except Exception:
+            return []
+
+    def _on_response(self, response):
+        with self._lock:
+            self.requests += 1
+            for conn in self._connections():
+                if conn not in self._seen:
+                    self._seen.add(conn)
+                    self.created += 1
+
+    def stats(self):
+        connections = self._connections()
+        idle = 0
+        for conn in connections:
+            try:
+                idle += bool(conn.is_idle())
+            except Exception:
+                pass
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "requests": self.requests,
+            "created": self.created,
+            "open": len(connections),
+            "idle": idle,
+            "in_use": len(connections) - idle,
+        }
+
+    def close(self):
+        self.http_client.close()
+
+
+_clients = {}
+_registry_lock = threading.Lock()
+
+
+def get_client(base_url, api_key, **kwargs):
+    """
+    获取进程内共享的 PooledClient，按 (base_url, api_key) 复用，
+    避免每个任务、每个请求重复建立 TCP/TLS 连接
+    :param kwargs: 首次创建时的连接池参数（timeout、max_connections、max_keepalive、http2）
+    """
+    key = (base_url, api_key)
+    with _registry_lock:
+        pooled = _clients.get(key)
+        if pooled is None:
+            pooled = PooledClient(base_url, api_key, **kwargs)
+            _clients[key] = pooled
+        return pooled
+
+
+def get_openai_client(base_url, api_key, **kwargs):
+    """返回共享连接池上的 OpenAI 客户端"""
+    return get_client(base_url, api_key, **kwargs).client
+
+
+def client_stats():
+    """所有共享客户端的连接池状态（不包含 api_key）"""
+    with _registry_lock:
+        clients = list(_clients.values())
+    return [pooled.stats() for pooled in clients]
+
+
+def close_all():
+    with _registry_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for pooled in clients:
+        pooled.close()
@@ -28,6 +28,7 @@ class InfoPool:
     last_action: str = ""  # Last action
     last_action_thought: str = ""  # Last action thought
     important_notes: str = ""
+    reflector_regions: list = field(default_factory=list)  # Changed regions sent as crops to the reflector; empty means two full screenshots
     
     error_flag_plan: bool = False # if an error is not solved for multiple attempts with the executor
     error_description_plan: bool = False # explanation of the error for modifying the plan
@@ -53,95 +54,129 @@ class BaseAgent(ABC):
     def parse_response(self, response: str) -> dict:
         pass
 
+    def get_sections(self, info_pool: InfoPool) -> list:
+        """
+        Prompt pieces in their original order as (layer, text), layer being "static" (same for every
+        call of the role), "task" (same within a task) or "step". get_prompt joins them in this order.
+        The default keeps the whole prompt as one per-step piece.
+        """
+        return [("step", self.get_prompt(info_pool))]
+
+    def get_layered_prompt(self, info_pool: InfoPool) -> tuple:
+        """
+        The same pieces regrouped as (static, task, step) for prefix caching.
+        """
+        layers = {"static": "", "task": "", "step": ""}
+        for layer, text in self.get_sections(info_pool):
+            layers[layer] += text
+        return layers["static"], layers["task"], layers["step"]
+
+    def get_messages(self, info_pool: InfoPool, images: list) -> list:
+        """
+        Prefix-cache-friendly messages: role-static content as a stable system message,
+        then per-task and per-step content, with the images at the very end.
+        """
+        static, task, step = self.get_layered_prompt(info_pool)
+        messages = []
+        if static:
+            messages.append({"role": "system", "content": [{"text": static}]})
+        content = [{"text": task + step}]
+        for image in images:
+            content.append({"image": image})
+        messages.append({"role": "user", "content": content})
+        return messages
+
 class Manager(BaseAgent):
 
     def get_prompt(self, info_pool: InfoPool) -> str:
-        prompt = "You are an agent who can operate an Android phone on behalf of a user. Your goal is to track progress and devise high-level plans to achieve the user's requests.\n\n"
-        prompt += "### User Request ###\n"
-        prompt += f"{info_pool.instruction}\n\n"
+        return "".join(text for _, text in self.get_sections(info_pool))
+
+    def get_sections(self, info_pool: InfoPool) -> list:
+        sections = [("static", "You are an agent who can operate an Android phone on behalf of a user. Your goal is to track progress and devise high-level plans to achieve the user's requests.\n\n")]
+        sections.append(("task", f"### User Request ###\n{info_pool.instruction}\n\n"))
 
         task_specific_note = ""
         if ".html" in info_pool.instruction:
             task_specific_note = "NOTE: The .html file may contain additional interactable elements, such as a drawing canvas or a game. Do not open other apps without completing the task in the .html file."
         elif "Audio Recorder" in info_pool.instruction:
             task_specific_note = "NOTE: The stop recording icon is a white square, located fourth from the left at the bottom. Please do not click the circular pause icon in the middle."
+        note = f"{task_specific_note}\n\n" if task_specific_note != "" else ""
+
+        guidelines = "### Guidelines ###\n"
+        guidelines += "The following guidelines will help you plan this request.\n"
+        guidelines += "General:\n"
+        guidelines += "Use search to quickly find a file or entry with a specific name, if search function is applicable.\n"
+        guidelines += "Task-specific:\n"
+        if info_pool.additional_knowledge_manager != "":
+            guidelines += f"{info_pool.additional_knowledge_manager}\n\n"
+        else:
+            guidelines += f"{info_pool.add_info_token}\n\n"
 
         if info_pool.plan == "":
             # first time planning
-            prompt += "---\n"
-            prompt += "Make a high-level plan to achieve the user's request. If the request is complex, break it down into subgoals. The screenshot displays the starting state of the phone.\n"
-            prompt += "IMPORTANT: For requests that explicitly require an answer, always add 'perform the `answer` action' as the last step to the plan!\n\n"
-            if task_specific_note != "":
-                prompt += f"{task_specific_note}\n\n"
-            
-            prompt += "### Guidelines ###\n"
-            prompt += "The following guidelines will help you plan this request.\n"
-            prompt += "General:\n"
-            prompt += "Use search to quickly find a file or entry with a specific name, if search function is applicable.\n"
-            prompt += "Task-specific:\n"
-            if info_pool.additional_knowledge_manager != "":
-                prompt += f"{info_pool.additional_knowledge_manager}\n\n"
-            else:
-                prompt += f"{info_pool.add_info_token}\n\n"
-            
-            prompt += "Provide your output in the following format which contains two parts:\n"
-            prompt += "### Thought ###\n"
-            prompt += "A detailed explanation of your rationale for the plan and subgoals.\n\n"
-            prompt += "### Plan ###\n"
-            prompt += "1. first subgoal\n"
-            prompt += "2. second subgoal\n"
-            prompt += "...\n"
+            instructions = "---\n"
+            instructions += "Make a high-level plan to achieve the user's request. If the request is complex, break it down into subgoals. The screenshot displays the starting state of the phone.\n"
+            instructions += "IMPORTANT: For requests that explicitly require an answer, always add 'perform the `answer` action' as the last step to the plan!\n\n"
+            sections.append(("static", instructions))
+            sections.append(("task", note))
+            sections.append(("task", guidelines))
+
+            output_format = "Provide your output in the following format which contains two parts:\n"
+            output_format += "### Thought ###\n"
+            output_format += "A detailed explanation of your rationale for the plan and subgoals.\n\n"
+            output_format += "### Plan ###\n"
+            output_format += "1. first subgoal\n"
+            output_format += "2. second subgoal\n"
+            output_format += "...\n"
+            sections.append(("static", output_format))
         else:
+            state = ""
             if info_pool.completed_plan != "No completed subgoal.":
-                prompt += "### Historical Operations ###\n"
-                prompt += "Operations that have been completed before:\n"
-                prompt += f"{info_pool.completed_plan}\n\n"
-            prompt += "### Plan ###\n"
-            prompt += f"{info_pool.plan}\n\n"
-            prompt += f"### Last Action ###\n"
-            prompt += f"{info_pool.last_action}\n\n"
-            prompt += f"### Last Action Description ###\n"
-            prompt += f"{info_pool.last_summary}\n\n"
-            prompt += "### Important Notes ###\n"
+                state += "### Historical Operations ###\n"
+                state += "Operations that have been completed before:\n"
+                state += f"{info_pool.completed_plan}\n\n"
+            state += "### Plan ###\n"
+            state += f"{info_pool.plan}\n\n"
+            state += f"### Last Action ###\n"
+            state += f"{info_pool.last_action}\n\n"
+            state += f"### Last Action Description ###\n"
+            state += f"{info_pool.last_summary}\n\n"
+            state += "### Important Notes ###\n"
             if info_pool.important_notes != "":
-                prompt += f"{info_pool.important_notes}\n\n"
-            else:
-                prompt += "No important notes recorded.\n\n"
-            prompt += "### Guidelines ###\n"
-            prompt += "The following guidelines will help you plan this request.\n"
-            prompt += "General:\n"
-            prompt += "Use search to quickly find a file or entry with a specific name, if search function is applicable.\n"
-            prompt += "Task-specific:\n"
-            if info_pool.additional_knowledge_manager != "":
-                prompt += f"{info_pool.additional_knowledge_manager}\n\n"
+                state += f"{info_pool.important_notes}\n\n"
             else:
-                prompt += f"{info_pool.add_info_token}\n\n"
+                state += "No important notes recorded.\n\n"
+            sections.append(("step", state))
+            sections.append(("task", guidelines))
+
+            stuck = ""
             if info_pool.error_flag_plan:
-                prompt += "### Potentially Stuck! ###\n"
-                prompt += "You have encountered several failed attempts. Here are some logs:\n"
+                stuck += "### Potentially Stuck! ###\n"
+                stuck += "You have encountered several failed attempts. Here are some logs:\n"
                 k = info_pool.err_to_manager_thresh
                 recent_actions = info_pool.action_history[-k:]
                 recent_summaries = info_pool.summary_history[-k:]
                 recent_err_des = info_pool.error_descriptions[-k:]
                 for i, (act, summ, err_des) in enumerate(zip(recent_actions, recent_summaries, recent_err_des)):
-                    prompt += f"- Attempt: Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
-
-            prompt += "---\n"
-            prompt += "Carefully assess the current status and the provided screenshot. Check if the current plan needs to be revised.\n Determine if the user request has been fully completed. If you are confident that no further actions are required, mark the plan as \"Finished\" in your output. If the user request is not finished, update the plan. If you are stuck with errors, think step by step about whether the overall plan needs to be revised to address the error.\n"
-            prompt += "NOTE: 1. If the current situation prevents proceeding with the original plan or requires clarification from the user, make reasonable assumptions and revise the plan accordingly. Act as though you are the user in such cases. 2. Please refer to the helpful information and steps in the Guidelines first for planning. 3. If the first subgoal in plan has been completed, please update the plan in time according to the screenshot and progress to ensure that the next subgoal is always the first item in the plan. 4. If the first subgoal is not completed, please copy the previous round's plan or update the plan based on the completion of the subgoal.\n"
-            prompt += "IMPORTANT: If the next steps require an `answer` action, make sure that there is a plan to perform the `answer` action. In this case, you should not mark the plan as \"Finished\" unless the last action is `answer`.\n"
-            if task_specific_note != "":
-              prompt += f"{task_specific_note}\n\n"
-
-            prompt += "Provide your output in the following format, which contains three parts:\n\n"
-            prompt += "### Thought ###\n"
-            prompt += "An explanation of your rationale for the updated plan and current subgoal.\n\n"
-            prompt += "### Historical Operations ###\n"
-            prompt += "Try to add the most recently completed subgoal on top of the existing historical operations. Please do not delete any existing historical operation. If there is no newly completed subgoal, just copy the existing historical operations.\n\n"
-            prompt += "### Plan ###\n"
-            prompt += "Please update or copy the existing plan according to the current page and progress. Please pay close attention to the historical operations. Please do not repeat the plan of completed content unless you can judge from the screen status that a subgoal is indeed not completed.\n"
-            
-        return prompt
+                    stuck += f"- Attempt: Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
+            sections.append(("step", stuck))
+
+            instructions = "---\n"
+            instructions += "Carefully assess the current status and the provided screenshot. Check if the current plan needs to be revised.\n Determine if the user request has been fully completed. If you are confident that no further actions are required, mark the plan as \"Finished\" in your output. If the user request is not finished, update the plan. If you are stuck with errors, think step by step about whether the overall plan needs to be revised to address the error.\n"
+            instructions += "NOTE: 1. If the current situation prevents proceeding with the original plan or requires clarification from the user, make reasonable assumptions and revise the plan accordingly. Act as though you are the user in such cases. 2. Please refer to the helpful information and steps in the Guidelines first for planning. 3. If the first subgoal in plan has been completed, please update the plan in time according to the screenshot and progress to ensure that the next subgoal is always the first item in the plan. 4. If the first subgoal is not completed, please copy the previous round's plan or update the plan based on the completion of the subgoal.\n"
+            instructions += "IMPORTANT: If the next steps require an `answer` action, make sure that there is a plan to perform the `answer` action. In this case, you should not mark the plan as \"Finished\" unless the last action is `answer`.\n"
+            sections.append(("static", instructions))
+            sections.append(("task", note))
+
+            output_format = "Provide your output in the following format, which contains three parts:\n\n"
+            output_format += "### Thought ###\n"
+            output_format += "An explanation of your rationale for the updated plan and current subgoal.\n\n"
+            output_format += "### Historical Operations ###\n"
+            output_format += "Try to add the most recently completed subgoal on top of the existing historical operations. Please do not delete any existing historical operation. If there is no newly completed subgoal, just copy the existing historical operations.\n\n"
+            output_format += "### Plan ###\n"
+            output_format += "Please update or copy the existing plan according to the current page and progress. Please pay close attention to the historical operations. Please do not repeat the plan of completed content unless you can judge from the screen status that a subgoal is indeed not completed.\n"
+            sections.append(("static", output_format))
+        return sections
 
     def parse_response(self, response: str) -> dict:
         if "### Historical Operations" in response:
@@ -195,83 +230,79 @@ INPUT_KNOW = "If you've activated an input field, you'll see \"ADB Keyboard {on}
 class Executor(BaseAgent):
 
     def get_prompt(self, info_pool: InfoPool) -> str:
-        prompt = "You are an agent who can operate an Android phone on behalf of a user. Your goal is to decide the next action to perform based on the current state of the phone and the user's request.\n\n"
+        return "".join(text for _, text in self.get_sections(info_pool))
 
-        prompt += "### User Request ###\n"
-        prompt += f"{info_pool.instruction}\n\n"
+    def get_sections(self, info_pool: InfoPool) -> list:
+        sections = [("static", "You are an agent who can operate an Android phone on behalf of a user. Your goal is to decide the next action to perform based on the current state of the phone and the user's request.\n\n")]
+        sections.append(("task", f"### User Request ###\n{info_pool.instruction}\n\n"))
 
-        prompt += "### Overall Plan ###\n"
-        prompt += f"{info_pool.plan}\n\n"
-        
-        prompt += "### Current Subgoal ###\n"
+        state = "### Overall Plan ###\n"
+        state += f"{info_pool.plan}\n\n"
+        state += "### Current Subgoal ###\n"
         current_goal = info_pool.plan
         current_goal = re.split(r'(?<=\d)\. ', current_goal)
         truncated_current_goal = ". ".join(current_goal[:4]) + '.'
         truncated_current_goal = truncated_current_goal[:-2].strip()
-        prompt += f"{truncated_current_goal}\n\n"
-
-        prompt += "### Progress Status ###\n"
+        state += f"{truncated_current_goal}\n\n"
+        state += "### Progress Status ###\n"
         if info_pool.progress_status != "":
-            prompt += f"{info_pool.progress_status}\n\n"
+            state += f"{info_pool.progress_status}\n\n"
         else:
-            prompt += "No progress yet.\n\n"
+            state += "No progress yet.\n\n"
+        sections.append(("step", state))
 
+        guidelines = ""
         if info_pool.additional_knowledge_executor != "":
-            prompt += "### Guidelines ###\n"
-            prompt += f"{info_pool.additional_knowledge_executor}\n"
-
+            guidelines += "### Guidelines ###\n"
+            guidelines += f"{info_pool.additional_knowledge_executor}\n"
         if "exact duplicates" in info_pool.instruction:
-            prompt += "Task-specific:\nOnly two items with the same name, date, and details can be considered duplicates.\n\n"
+            guidelines += "Task-specific:\nOnly two items with the same name, date, and details can be considered duplicates.\n\n"
         elif "Audio Recorder" in info_pool.instruction:
-            prompt += "Task-specific:\nThe stop recording icon is a white square, located fourth from the left at the bottom. Please do not click the circular pause icon in the middle.\n\n"
+            guidelines += "Task-specific:\nThe stop recording icon is a white square, located fourth from the left at the bottom. Please do not click the circular pause icon in the middle.\n\n"
         else:
-            prompt += "\n"
-        
-        prompt += "---\n"        
-        prompt += "Carefully examine all the information provided above and decide on the next action to perform. If you notice an unsolved error in the previous action, think as a human user and attempt to rectify them. You must choose your action from one of the atomic actions.\n\n"
-        
-        prompt += "#### Atomic Actions ####\n"
-        prompt += "The atomic action functions are listed in the format of `action(arguments): description` as follows:\n"
+            guidelines += "\n"
+        sections.append(("task", guidelines))
 
+        actions = "---\n"
+        actions += "Carefully examine all the information provided above and decide on the next action to perform. If you notice an unsolved error in the previous action, think as a human user and attempt to rectify them. You must choose your action from one of the atomic actions.\n\n"
+        actions += "#### Atomic Actions ####\n"
+        actions += "The atomic action functions are listed in the format of `action(arguments): description` as follows:\n"
         for action, value in ATOMIC_ACTION_SIGNITURES_noxml.items():
-            prompt += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
+            actions += f"- {action}({', '.join(value['arguments'])}): {value['description'](info_pool)}\n"
+        actions += "\n"
+        sections.append(("static", actions))
 
-        prompt += "\n"
-        prompt += "### Latest Action History ###\n"
+        history = "### Latest Action History ###\n"
         if info_pool.action_history != []:
-            prompt += "Recent actions you took previously and whether they were successful:\n"
+            history += "Recent actions you took previously and whether they were successful:\n"
             num_actions = min(5, len(info_pool.action_history))
             latest_actions = info_pool.action_history[-num_actions:]
             latest_summary = info_pool.summary_history[-num_actions:]
             latest_outcomes = info_pool.action_outcomes[-num_actions:]
             error_descriptions = info_pool.error_descriptions[-num_actions:]
-            action_log_strs = []
             for act, summ, outcome, err_des in zip(latest_actions, latest_summary, latest_outcomes, error_descriptions):
                 if outcome == "A":
-                    action_log_str = f"Action: {act} | Description: {summ} | Outcome: Successful\n"
+                    history += f"Action: {act} | Description: {summ} | Outcome: Successful\n"
                 else:
-                    action_log_str = f"Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
-                prompt += action_log_str
-                action_log_strs.append(action_log_str)
-            
-            prompt += "\n"
+                    history += f"Action: {act} | Description: {summ} | Outcome: Failed | Feedback: {err_des}\n"
+            history += "\n"
         else:
-            prompt += "No actions have been taken yet.\n\n"
-
-        prompt += "---\n"
-        prompt += "IMPORTANT:\n1. Do NOT repeat previously failed actions multiple times. Try changing to another action.\n"
-        prompt += "2. Please prioritize the current subgoal.\n\n"
-        prompt += "Provide your output in the following format, which contains three parts:\n"
-        prompt += "### Thought ###\n"
-        prompt += "Provide a detailed explanation of your rationale for the chosen action.\n\n"
-
-        prompt += "### Action ###\n"
-        prompt += "Choose only one action or shortcut from the options provided.\n"
-        prompt += "You must provide your decision using a valid JSON format specifying the `action` and the arguments of the action. For example, if you want to type some text, you should write {\"action\":\"type\", \"text\": \"the text you want to type\"}.\n\n"
-        
-        prompt += "### Description ###\n"
-        prompt += "A brief description of the chosen action. Do not describe expected outcome.\n"
-        return prompt
+            history += "No actions have been taken yet.\n\n"
+        sections.append(("step", history))
+
+        output_format = "---\n"
+        output_format += "IMPORTANT:\n1. Do NOT repeat previously failed actions multiple times. Try changing to another action.\n"
+        output_format += "2. Please prioritize the current subgoal.\n\n"
+        output_format += "Provide your output in the following format, which contains three parts:\n"
+        output_format += "### Thought ###\n"
+        output_format += "Provide a detailed explanation of your rationale for the chosen action.\n\n"
+        output_format += "### Action ###\n"
+        output_format += "Choose only one action or shortcut from the options provided.\n"
+        output_format += "You must provide your decision using a valid JSON format specifying the `action` and the arguments of the action. For example, if you want to type some text, you should write {\"action\":\"type\", \"text\": \"the text you want to type\"}.\n\n"
+        output_format += "### Description ###\n"
+        output_format += "A brief description of the chosen action. Do not describe expected outcome.\n"
+        sections.append(("static", output_format))
+        return sections
 
     def parse_response(self, response: str) -> dict:
         thought = response.split("### Thought")[-1].split("### Action")[0].replace("\n", " ").replace("  ", " ").replace("###", "").strip()
@@ -282,40 +313,47 @@ class Executor(BaseAgent):
 class ActionReflector(BaseAgent):
 
     def get_prompt(self, info_pool: InfoPool) -> str:
-        prompt = "You are an agent who can operate an Android phone on behalf of a user. Your goal is to verify whether the last action produced the expected behavior and to keep track of the overall progress.\n\n"
+        return "".join(text for _, text in self.get_sections(info_pool))
 
-        prompt += "### User Request ###\n"
-        prompt += f"{info_pool.instruction}\n\n"
-        
-        prompt += "### Progress Status ###\n"
+    def get_sections(self, info_pool: InfoPool) -> list:
+        sections = [("static", "You are an agent who can operate an Android phone on behalf of a user. Your goal is to verify whether the last action produced the expected behavior and to keep track of the overall progress.\n\n")]
+        sections.append(("task", f"### User Request ###\n{info_pool.instruction}\n\n"))
+
+        state = "### Progress Status ###\n"
         if info_pool.completed_plan != "":
-            prompt += f"{info_pool.completed_plan}\n\n"
+            state += f"{info_pool.completed_plan}\n\n"
         else:
-            prompt += "No progress yet.\n\n"
-
-        prompt += "---\n"
-        prompt += "The two attached images are phone screenshots taken before and after your last action. \n"
-
-        prompt += "---\n"
-        prompt += "### Latest Action ###\n"
-        prompt += f"Action: {info_pool.last_action}\n"
-        prompt += f"Expectation: {info_pool.last_summary}\n\n"
-
-        prompt += "---\n"
-        prompt += "Carefully examine the information provided above to determine whether the last action produced the expected behavior. If the action was successful, update the progress status accordingly. If the action failed, identify the failure mode and provide reasoning on the potential reason causing this failure.\n\n"
-        prompt += "Note: For swiping to scroll the screen to view more content, if the content displayed before and after the swipe is exactly the same, the swipe is considered to be C: Failed. The last action produces no changes. This may be because the content has been scrolled to the bottom.\n\n"
-
-        prompt += "Provide your output in the following format containing two parts:\n"
-        prompt += "### Outcome ###\n"
-        prompt += "Choose from the following options. Give your response as \"A\", \"B\" or \"C\":\n"
-        prompt += "A: Successful or Partially Successful. The result of the last action meets the expectation.\n"
-        prompt += "B: Failed. The last action results in a wrong page. I need to return to the previous state.\n"
-        prompt += "C: Failed. The last action produces no changes.\n\n"
-
-        prompt += "### Error Description ###\n"
-        prompt += "If the action failed, provide a detailed description of the error and the potential reason causing this failure. If the action succeeded, put \"None\" here.\n"
-
-        return prompt
+            state += "No progress yet.\n\n"
+
+        state += "---\n"
+        if info_pool.reflector_regions:
+            state += "The first attached image is a downscaled phone screenshot taken after your last action. "
+            state += "The remaining images are full-resolution crops of the regions that changed, given as pairs (before the action, after the action):\n"
+            for i, (x1, y1, x2, y2) in enumerate(info_pool.reflector_regions):
+                state += f"- Region {i+1}: box [{x1}, {y1}, {x2}, {y2}] (x1, y1, x2, y2 in original screen pixels), images {2*i+2} (before) and {2*i+3} (after)\n"
+            state += "Everything outside these regions did not change.\n"
+        else:
+            state += "The two attached images are phone screenshots taken before and after your last action. \n"
+
+        state += "---\n"
+        state += "### Latest Action ###\n"
+        state += f"Action: {info_pool.last_action}\n"
+        state += f"Expectation: {info_pool.last_summary}\n\n"
+        sections.append(("step", state))
+
+        instructions = "---\n"
+        instructions += "Carefully examine the information provided above to determine whether the last action produced the expected behavior. If the action was successful, update the progress status accordingly. If the action failed, identify the failure mode and provide reasoning on the potential reason causing this failure.\n\n"
+        instructions += "Note: For swiping to scroll the screen to view more content, if the content displayed before and after the swipe is exactly the same, the swipe is considered to be C: Failed. The last action produces no changes. This may be because the content has been scrolled to the bottom.\n\n"
+        instructions += "Provide your output in the following format containing two parts:\n"
+        instructions += "### Outcome ###\n"
+        instructions += "Choose from the following options. Give your response as \"A\", \"B\" or \"C\":\n"
+        instructions += "A: Successful or Partially Successful. The result of the last action meets the expectation.\n"
+        instructions += "B: Failed. The last action results in a wrong page. I need to return to the previous state.\n"
+        instructions += "C: Failed. The last action produces no changes.\n\n"
+        instructions += "### Error Description ###\n"
+        instructions += "If the action failed, provide a detailed description of the error and the potential reason causing this failure. If the action succeeded, put \"None\" here.\n"
+        sections.append(("static", instructions))
+        return sections
 
     def parse_response(self, response: str) -> dict:
         outcome = response.split("### Outcome")[-1].split("### Error Description")[0].replace("\n", " ").replace("  ", " ").replace("###", "").strip()
@@ -325,34 +363,36 @@ class ActionReflector(BaseAgent):
 class Notetaker(BaseAgent):
 
     def get_prompt(self, info_pool: InfoPool) -> str:
-        prompt = "You are a helpful AI assistant for operating mobile phones. Your goal is to take notes of important content relevant to the user's request.\n\n"
-
-        prompt += "### User Request ###\n"
-        prompt += f"{info_pool.instruction}\n\n"
+        return "".join(text for _, text in self.get_sections(info_pool))
 
-        prompt += "### Progress Status ###\n"
-        prompt += f"{info_pool.progress_status}\n\n"
+    def get_sections(self, info_pool: InfoPool) -> list:
+        sections = [("static", "You are a helpful AI assistant for operating mobile phones. Your goal is to take notes of important content relevant to the user's request.\n\n")]
+        sections.append(("task", f"### User Request ###\n{info_pool.instruction}\n\n"))
 
-        prompt += "### Existing Important Notes ###\n"
+        state = "### Progress Status ###\n"
+        state += f"{info_pool.progress_status}\n\n"
+        state += "### Existing Important Notes ###\n"
         if info_pool.important_notes != "":
-            prompt += f"{info_pool.important_notes}\n\n"
+            state += f"{info_pool.important_notes}\n\n"
         else:
-            prompt += "No important notes recorded.\n\n"
+            state += "No important notes recorded.\n\n"
+        sections.append(("step", state))
 
+        guideline = ""
         if "transactions" in info_pool.instruction and "Simple Gallery" in info_pool.instruction:
-            prompt += "### Guideline ###\nYou can only record the transaction information in DCIM, because the other transactions are irrelevant to the task.\n"
+            guideline = "### Guideline ###\nYou can only record the transaction information in DCIM, because the other transactions are irrelevant to the task.\n"
         elif "enter their product" in info_pool.instruction:
-            prompt += "### Guideline ###\nPlease record the number that appears each time so that you can calculate their product at the end.\n"
-        
-        prompt += "---\n"
-        prompt += "Carefully examine the information above to identify any important content on the current screen that needs to be recorded.\n"
-        prompt += "IMPORTANT:\nDo not take notes on low-level actions; only keep track of significant textual or visual information relevant to the user's request. Do not repeat user request or progress status. Do not make up content that you are not sure about.\n\n"
-
-        prompt += "Provide your output in the following format:\n"
-        prompt += "### Important Notes ###\n"
-        prompt += "The updated important notes, combining the old and new ones. If nothing new to record, copy the existing important notes.\n"
-
-        return prompt
+            guideline = "### Guideline ###\nPlease record the number that appears each time so that you can calculate their product at the end.\n"
+        sections.append(("task", guideline))
+
+        instructions = "---\n"
+        instructions += "Carefully examine the information above to identify any important content on the current screen that needs to be recorded.\n"
+        instructions += "IMPORTANT:\nDo not take notes on low-level actions; only keep track of significant textual or visual information relevant to the user's request. Do not repeat user request or progress status. Do not make up content that you are not sure about.\n\n"
+        instructions += "Provide your output in the following format:\n"
+        instructions += "### Important Notes ###\n"
+        instructions += "The updated important notes, combining the old and new ones. If nothing new to record, copy the existing important notes.\n"
+        sections.append(("static", instructions))
+        return sections
 
     def parse_response(self, response: str) -> dict:
         important_notes = response.split("### Important Notes")[-1].replace("\n", " ").replace("  ", " ").replace("###", "").strip()
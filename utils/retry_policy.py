@@ -0,0 +1,99 @@
+import random
+import time
+
+# 可重试的 HTTP 状态码：请求超时、冲突、限流和服务端错误
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# 网络层异常的类名（openai / httpx / requests / 内置），无需导入对应库即可识别
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "ConnectError", "ReadTimeout", "WriteTimeout", "PoolTimeout", "ConnectTimeout",
+    "RemoteProtocolError", "ReadError", "WriteError",
+    "ConnectionError", "TimeoutError", "ConnectionResetError", "ConnectionRefusedError",
+}
+
+
+def is_retryable(error):
+    """
+    错误分类：网络错误、超时、限流与 5xx 可以重试；
+    其余 4xx（参数错误、鉴权失败、模型不存在等）重试也不会成功，直接失败
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    """
+    带抖动的指数退避重试策略，同时受单次调用截止时间和任务剩余时间约束
+    """
+
+    def __init__(self, max_attempts=6, base_delay=1.0, max_delay=20.0, multiplier=2.0, jitter=0.5,
+                 call_deadline=180.0, request_timeout=60.0):
+        """
+        :param max_attempts: 最多尝试次数（含第一次）
+        :param base_delay: 第一次重试前的基础等待秒数
+        :param max_delay: 单次等待上限
+        :param multiplier: 每次重试等待时间的增长倍数
+        :param jitter: 抖动比例，实际等待在 [delay*(1-jitter), delay] 之间均匀分布
+        :param call_deadline: 单次调用（含所有重试）的总时长上限
+        :param request_timeout: 单个请求的超时上限，临近截止时间时自动缩短
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.call_deadline = call_deadline
+        self.request_timeout = request_timeout
+
+    def backoff(self, retry_index):
+        """第 retry_index 次重试（从 0 开始）前的等待秒数"""
+        delay = min(self.max_delay, self.base_delay * (self.multiplier ** retry_index))
+        return random.uniform(delay * (1 - self.jitter), delay)
+
+    def execute(self, request_fn, task_deadline=None):
+        """
+        执行 request_fn(timeout)，按策略重试
+        :param task_deadline: 任务截止的绝对时间（time.time()），None 表示不限
+        :return: (result, stats)；放弃时 result 为 None，stats["error"] 为最后一次错误
+        """
+        start = time.time()
+        deadline = start + self.call_deadline
+        if task_deadline is not None:
+            deadline = min(deadline, task_deadline)
+        stats = {"attempts": 0, "retry_wait_seconds": 0.0, "error": None, "gave_up": None}
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                stats["gave_up"] = "deadline"
+                break
+            stats["attempts"] += 1
+            try:
+                result = request_fn(min(self.request_timeout, remaining))
+                stats["error"] = None
+                stats["elapsed_seconds"] = round(time.time() - start, 3)
+                return result, stats
+            except Exception as e:
+                stats["error"] = f"{type(e).__name__}: {e}"
+                if not is_retryable(e):
+                    stats["gave_up"] = "fatal"
+                    print(f"LLM call failed with a non-retryable error: {stats['error']}")
+                    break
+                if stats["attempts"] >= self.max_attempts:
+                    stats["gave_up"] = "max_attempts"
+                    break
+                wait = self.backoff(stats["attempts"] - 1)
+                if time.time() + wait >= deadline:
+                    stats["gave_up"] = "deadline"
+                    break
+                print(f"Error calling LLM ({stats['error']}), retry {stats['attempts']}/{self.max_attempts - 1} in {wait:.1f}s")
+                time.sleep(wait)
+                stats["retry_wait_seconds"] = round(stats["retry_wait_seconds"] + wait, 3)
+
+        stats["elapsed_seconds"] = round(time.time() - start, 3)
+        print(f"Give up calling LLM after {stats['attempts']} attempt(s) ({stats['gave_up']}): {stats['error']}")
+        return None, stats
@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+
+# 比较用缩略图尺寸（宽, 高），手机竖屏截图按比例缩小
+THUMBNAIL_SIZE = (54, 120)
+
+
+def frame_thumbnail(frame, size=THUMBNAIL_SIZE):
+    """返回帧的灰度缩略图（float32 数组），结果缓存在 Frame 上"""
+    def _thumbnail(image):
+        return np.asarray(image.convert("L").resize(size), dtype=np.float32)
+    return frame.encoded(("thumbnail", size), _thumbnail)
+
+
+def frame_difference(frame_a, frame_b, size=THUMBNAIL_SIZE):
+    """
+    两帧之间的差异程度：灰度缩略图逐像素平均绝对差，归一化到 [0, 1]
+    """
+    a = frame_thumbnail(frame_a, size)
+    b = frame_thumbnail(frame_b, size)
+    return float(np.mean(np.abs(a - b)) / 255.0)
+
+
+def _full_frame(controller, frame):
+    """轮询得到的是低成本预览帧时，再采集一次完整截图作为结果"""
+    if frame is None or not frame.preview:
+        return frame
+    full = controller.capture()
+    return full if full is not None else frame
+
+
+def wait_for_stable_screen(controller, min_wait=0.3, max_wait=3.0, interval=0.15,
+                           stable_frames=2, threshold=0.005):
+    """
+    等待屏幕稳定：先等待 min_wait，之后持续采集低成本预览帧（capture_preview），
+    当连续 stable_frames 帧两两差异都小于 threshold 时认为界面已稳定，此时才采集一次完整截图
+    :param controller: 提供 capture() 的控制器，可选提供 capture_preview()
+    :return: (frame, settle_time, stable)
+             settle_time 为界面停止变化的时刻（稳定序列第一帧的采集时间）距开始的秒数；
+             超过 max_wait 仍未稳定时返回最后一帧、已等待的时间且 stable 为 False；
+             截图始终失败时 frame 为 None
+    """
+    start = time.time()
+    if min_wait > 0:
+        time.sleep(min_wait)
+
+    poll = getattr(controller, "capture_preview", controller.capture)
+    prev = poll()
+    streak_start = prev.timestamp if prev is not None else None
+    similar = 0
+    polls = 1
+    while True:
+        elapsed = time.time() - start
+        if prev is not None and similar >= stable_frames - 1:
+            settle_time = max(0.0, streak_start - start)
+            print(f"[SETTLE] stable at {settle_time:.2f}s, detected after {elapsed:.2f}s ({polls} polls)")
+            return _full_frame(controller, prev), settle_time, True
+        if elapsed >= max_wait:
+            print(f"[SETTLE] not stable within {max_wait:.2f}s ({polls} polls), use latest frame")
+            return _full_frame(controller, prev), elapsed, False
+
+        time.sleep(interval)
+        cur = poll()
+        polls += 1
+        if cur is None:
+            continue
+        if prev is None:
+            prev, streak_start = cur, cur.timestamp
+            continue
+        if cur.timestamp <= prev.timestamp:
+            # 帧流还没有产生新帧，继续等待
+            continue
+        diff = frame_difference(prev, cur)
+        if diff < threshold:
+            similar += 1
+        else:
+            similar, streak_start = 0, cur.timestamp
+        prev = cur
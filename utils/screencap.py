@@ -0,0 +1,62 @@
+import struct
+
+import numpy as np
+from PIL import Image
+
+# screencap 原始输出的像素格式（android.graphics.PixelFormat）
+PIXEL_FORMAT_RGBA_8888 = 1
+PIXEL_FORMAT_RGBX_8888 = 2
+PIXEL_FORMAT_RGB_888 = 3
+PIXEL_FORMAT_BGRA_8888 = 5
+
+# 像素格式 -> (PIL 模式, 原始数据模式, 每像素字节数)
+_RAW_FORMATS = {
+    PIXEL_FORMAT_RGBA_8888: ("RGBA", "RGBA", 4),
+    PIXEL_FORMAT_RGBX_8888: ("RGBX", "RGBX", 4),
+    PIXEL_FORMAT_RGB_888: ("RGB", "RGB", 3),
+    PIXEL_FORMAT_BGRA_8888: ("RGBA", "BGRA", 4),
+}
+
+# 旧版本 screencap 头部为 width/height/format 共 12 字节，
+# Android 9 起追加 4 字节 dataspace，部分 ROM 还会多出若干保留字段
+_HEADER_SIZES = (12, 16, 20, 24)
+
+
+def parse_raw_header(data):
+    """
+    解析 `screencap`（不带 -p）输出的头部
+    :return: (width, height, pixel_format, header_size)
+    """
+    if len(data) < 12:
+        raise ValueError(f"raw screencap output too short: {len(data)} bytes")
+    width, height, pixel_format = struct.unpack_from("<III", data, 0)
+    if pixel_format not in _RAW_FORMATS:
+        raise ValueError(f"unsupported screencap pixel format: {pixel_format}")
+    bpp = _RAW_FORMATS[pixel_format][2]
+    header_size = len(data) - width * height * bpp
+    if header_size not in _HEADER_SIZES:
+        raise ValueError(
+            f"unexpected raw screencap size: {len(data)} bytes for {width}x{height} format={pixel_format}"
+        )
+    return width, height, pixel_format, header_size
+
+
+def raw_to_array(data):
+    """
+    将原始帧缓冲区包装为 NumPy 数组（只读视图，不拷贝像素数据）
+    :return: 形状为 (height, width, channels) 的 uint8 数组
+    """
+    width, height, pixel_format, header_size = parse_raw_header(data)
+    bpp = _RAW_FORMATS[pixel_format][2]
+    return np.frombuffer(data, dtype=np.uint8, offset=header_size).reshape(height, width, bpp)
+
+
+def raw_to_image(data):
+    """
+    将原始帧缓冲区包装为 PIL.Image
+    RGBA/RGBX/RGB 格式直接引用原缓冲区，不拷贝像素数据
+    """
+    width, height, pixel_format, header_size = parse_raw_header(data)
+    mode, raw_mode, _ = _RAW_FORMATS[pixel_format]
+    buffer = memoryview(data)[header_size:]
+    return Image.frombuffer(mode, (width, height), buffer, "raw", raw_mode, 0, 1)
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+# 没有历史数据时的默认等待窗口 (开始检测, 最长等待)，单位秒
+DEFAULT_SETTLE_WINDOWS = {
+    "open_app": (1.0, 8.0),
+    "default": (0.3, 3.0),
+}
+
+# 任务第一步的稳定时间（应用启动、开屏和弹窗）单独记在该动作名下，不混入普通动作的统计
+LAUNCH_ACTION = "launch"
+
+# 动作名归一化（Executor 输出的别名）
+ACTION_ALIASES = {
+    "open": "open_app",
+    "long_press": "click",
+}
+
+
+def normalize_action(action):
+    return ACTION_ALIASES.get(action, action)
+
+
+class SettleTimeModel:
+    """
+    按 (前台应用包名, 动作类型) 记录每次动作后界面稳定所需的时间，并持久化到 JSON 文件
+    之后用历史 p50 作为开始检测稳定的时间，用 p99 作为最长等待时间
+    """
+
+    def __init__(self, path, max_samples=200, min_samples=5, start_factor=0.75, max_wait_cap=15.0):
+        """
+        :param path: 统计文件路径
+        :param max_samples: 每个键保留的最近样本数
+        :param min_samples: 样本数少于该值时使用默认窗口
+        :param start_factor: 开始检测时间 = p50 * start_factor；略早于 p50 开始，
+                             使更快的稳定时间也能被测到，估计值可以向下修正
+        :param max_wait_cap: 最长等待时间的上限
+        """
+        self.path = path
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.start_factor = start_factor
+        self.max_wait_cap = max_wait_cap
+        self.samples = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def _key(package, action):
+        return f"{package or '*'}|{normalize_action(action)}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.samples = json.load(f).get("samples", {})
+        except Exception as e:
+            print(f"Warning: Failed to load settle statistics {self.path}: {e}")
+            self.samples = {}
+
+    def save(self):
+        save_dir = os.path.dirname(self.path)
+        if save_dir and not os.path.exists(save_dir):
+            os.makedirs(save_dir, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            data = {"samples": self.samples}
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def record(self, package, action, seconds):
+        """记录一次测得的稳定时间，同时计入该动作类型跨应用的汇总"""
+        with self._lock:
+            for key in (self._key(package, action), self._key(None, action)):
+                values = self.samples.setdefault(key, [])
+                values.append(round(float(seconds), 3))
+                del values[:-self.max_samples]
+        try:
+            self.save()
+        except Exception as e:
+            print(f"Warning: Failed to save settle statistics {self.path}: {e}")
+
+    def percentiles(self, package, action):
+        """
+        :return: (p50, p99, 样本数)；先查具体应用，样本不足时退回该动作类型的汇总，仍不足返回 None
+        """
+        with self._lock:
+            for key in (self._key(package, action), self._key(None, action)):
+                values = self.samples.get(key, [])
+                if len(values) >= self.min_samples:
+                    return float(np.percentile(values, 50)), float(np.percentile(values, 99)), len(values)
+        return None
+
+    def window(self, package, action, default=None):
+        """
+        :return: (min_wait, max_wait)，用于 wait_for_stable_screen
+        """
+        stats = self.percentiles(package, action)
+        if stats is None:
+            if default is not None:
+                return default
+            action = normalize_action(action)
+            return DEFAULT_SETTLE_WINDOWS.get(action, DEFAULT_SETTLE_WINDOWS["default"])
+        p50, p99, _ = stats
+        min_wait = p50 * self.start_factor
+        max_wait = min(max(p99, min_wait + 0.5), self.max_wait_cap)
+        return min_wait, max_wait
@@ -0,0 +1,58 @@
+import re
+
+# 形如 "### Action ###" 或 "### Action" 的整行标题
+_HEADER_RE = re.compile(r"^###\s*([A-Za-z][A-Za-z ]*?)\s*(?:###)?[ \t]*\n", re.MULTILINE)
+
+# 各角色输出的分段（按顺序）；可以据此提前结束生成的角色才列出
+# Manager 的 Plan 与 Notetaker 的 Important Notes 是多行的末尾段，无法判断何时写完
+ROLE_SECTIONS = {
+    "executor": ("Thought", "Action", "Description"),
+    "reflector": ("Outcome", "Error Description"),
+}
+
+
+class SectionStreamParser:
+    """
+    增量解析 "### 段名 ###" 分段格式的流式输出，判断所需分段是否都已写完
+    非末尾分段在下一个标题出现时写完；末尾分段在有内容且出现空行（或新的标题）时写完
+    """
+
+    def __init__(self, sections, required=None):
+        self.sections = tuple(sections)
+        self.required = tuple(required or sections)
+        self.text = ""
+
+    def feed(self, delta):
+        """追加一段新输出，返回所需分段是否都已写完"""
+        self.text += delta
+        return self.complete()
+
+    def _headers(self):
+        return [(m.group(1).strip(), m.start(), m.end()) for m in _HEADER_RE.finditer(self.text)]
+
+    def section_end(self, name):
+        """分段已写完时返回其结束位置，否则返回 None"""
+        headers = self._headers()
+        for i, (header, _, end) in enumerate(headers):
+            if header != name:
+                continue
+            if i + 1 < len(headers):
+                return headers[i + 1][1]
+            if name == self.sections[-1]:
+                content = self.text[end:]
+                body_start = end + len(content) - len(content.lstrip("\n"))
+                blank = self.text.find("\n\n", body_start)
+                if blank != -1 and self.text[body_start:blank].strip():
+                    return blank + 1
+            return None
+        return None
+
+    def complete(self):
+        return all(self.section_end(name) is not None for name in self.required)
+
+    def result(self):
+        """返回截至所需分段写完处的文本（去掉提前结束时多收到的尾部内容）"""
+        ends = [self.section_end(name) for name in self.required]
+        if any(end is None for end in ends):
+            return self.text
+        return self.text[:max(ends)]
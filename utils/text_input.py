@@ -0,0 +1,69 @@
+"""
+批量文本输入：把待输入文本切分成各后端一次命令即可接受的最少片段
+- Android `input text` 只能可靠地输入可打印 ASCII，且会把 "%s" 解释为空格
+- 非 ASCII（中文等）需要通过 ADB Keyboard 的广播输入
+- 换行统一转为回车按键
+"""
+
+# 回车键码
+ENTER_KEYCODES = {
+    "android": 66,
+    "harmonyos": 2054,
+}
+
+# 单条命令承载的最大字符数，过长的命令在部分设备上会被截断
+MAX_RUN_LENGTH = 200
+
+
+def _is_plain_ascii(char):
+    return " " <= char <= "~"
+
+
+def split_runs(text, dialect="android", max_run=MAX_RUN_LENGTH):
+    """
+    将文本切分为输入片段
+    :return: [(kind, payload)]，kind 为 'text'（ASCII 片段）、'ime'（需输入法广播的片段）或 'enter'
+    """
+    runs = []
+    text = text.replace("\\n", "\n").replace("\r\n", "\n")
+    for i, line in enumerate(text.split("\n")):
+        if i > 0:
+            runs.append(("enter", None))
+        if not line:
+            continue
+        if dialect != "android":
+            # HarmonyOS 的 inputText 可以直接输入任意字符
+            runs.extend(("text", line[k:k + max_run]) for k in range(0, len(line), max_run))
+            continue
+
+        kind, buf = None, ""
+        for j, char in enumerate(line):
+            char_kind = "text" if _is_plain_ascii(char) else "ime"
+            if buf and (char_kind != kind or len(buf) >= max_run):
+                runs.append((kind, buf))
+                buf = ""
+            kind = char_kind
+            buf += char
+            # 字面量 "%s" 会被 input text 当作空格，在 % 之后断开
+            if char == "%" and line[j + 1:j + 2] == "s":
+                runs.append((kind, buf))
+                buf = ""
+        if buf:
+            runs.append((kind, buf))
+    return runs
+
+
+def fill_batch(batch, text, max_run=MAX_RUN_LENGTH):
+    """
+    将文本按片段追加到 GestureBatch 中
+    :return: 追加的片段数
+    """
+    runs = split_runs(text, batch.dialect, max_run)
+    for kind, payload in runs:
+        if kind == "enter":
+            batch.keyevent(ENTER_KEYCODES[batch.dialect])
+        elif kind == "ime":
+            batch.ime_text(payload)
+        else:
+            batch.text(payload)
+    return len(runs)
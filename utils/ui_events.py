@@ -0,0 +1,126 @@
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+
+# 默认订阅的无障碍事件：窗口切换、窗口内容变化、Toast/通知、滚动
+DEFAULT_EVENT_TYPES = (
+    "TYPE_WINDOW_STATE_CHANGED",
+    "TYPE_WINDOW_CONTENT_CHANGED",
+    "TYPE_WINDOWS_CHANGED",
+    "TYPE_NOTIFICATION_STATE_CHANGED",
+    "TYPE_VIEW_SCROLLED",
+)
+
+_EVENT_TYPE_RE = re.compile(r"EventType:\s*(\w+)")
+_PACKAGE_RE = re.compile(r"PackageName:\s*([\w.]+)")
+
+
+class UiEventListener:
+    """
+    通过 `adb shell uiautomator events` 订阅设备的无障碍事件流，
+    用于判断“界面发生了变化并且已经安静了一段时间”，代替定时等待或轮询截图
+
+    注意：设备同一时间只允许一个 UiAutomation 连接，事件流可能与 uiautomator2 的服务互相抢占；
+    事件进程退出后 is_running() 返回 False，调用方应回退到截图轮询
+    """
+
+    def __init__(self, adb_path, device_id=None, event_types=DEFAULT_EVENT_TYPES, history_size=200):
+        self.adb_path = adb_path
+        self.device_id = device_id
+        self.event_types = set(event_types)
+        self.process = None
+        self.events = deque(maxlen=history_size)  # (seq, 接收时间, 事件类型, 包名)
+        self.seq = 0
+        self.last_event_time = 0.0
+        self._cond = threading.Condition()
+        self._reader = None
+
+    def start(self, probe_timeout=1.0):
+        """启动事件进程，probe_timeout 秒内进程没有退出则认为可用，成功返回 True"""
+        self.stop()
+        args = [self.adb_path]
+        if self.device_id:
+            args += ["-s", self.device_id]
+        try:
+            self.process = subprocess.Popen(
+                args + ["shell", "uiautomator", "events"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+            )
+        except Exception as e:
+            print(f"[UI_EVENTS] Warning: failed to start event listener: {e}")
+            self.process = None
+            return False
+        self._reader = threading.Thread(target=self._read_loop, args=(self.process,), daemon=True)
+        self._reader.start()
+        try:
+            self.process.wait(timeout=probe_timeout)
+        except subprocess.TimeoutExpired:
+            return True
+        print("[UI_EVENTS] Warning: event listener exited immediately, UI events unavailable")
+        self.process = None
+        return False
+
+    def _read_loop(self, process):
+        for raw_line in iter(process.stdout.readline, b""):
+            line = raw_line.decode("utf-8", errors="replace")
+            match = _EVENT_TYPE_RE.search(line)
+            if not match or match.group(1) not in self.event_types:
+                continue
+            package = _PACKAGE_RE.search(line)
+            now = time.time()
+            with self._cond:
+                self.seq += 1
+                self.last_event_time = now
+                self.events.append((self.seq, now, match.group(1), package.group(1) if package else None))
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=2)
+            except Exception:
+                pass
+            self.process = None
+
+    def mark(self):
+        """返回当前事件序号，作为 wait_for_quiet 的起点"""
+        with self._cond:
+            return self.seq
+
+    def events_since(self, mark):
+        with self._cond:
+            return [e for e in self.events if e[0] > mark]
+
+    def wait_for_quiet(self, mark, quiet_ms=300, timeout=3.0, first_event_timeout=1.0):
+        """
+        等待 mark 之后出现界面事件，并且最后一个事件之后 quiet_ms 毫秒内没有新事件
+        :param first_event_timeout: 这段时间内没有任何事件则认为动作没有引起界面变化
+        :return: (changed, settle_time)；changed 为 False 表示没有收到任何事件，
+                 settle_time 为最后一个事件距开始的秒数（未安静下来时为已等待时间）
+        """
+        start = time.time()
+        quiet = quiet_ms / 1000.0
+        with self._cond:
+            while True:
+                now = time.time()
+                changed = self.seq > mark
+                if not changed:
+                    if now - start >= first_event_timeout or not self.is_running():
+                        return False, now - start
+                    self._cond.wait(first_event_timeout - (now - start))
+                    continue
+                if now - self.last_event_time >= quiet:
+                    return True, max(0.0, self.last_event_time - start)
+                if now - start >= timeout or not self.is_running():
+                    return True, now - start
+                self._cond.wait(min(quiet - (now - self.last_event_time), timeout - (now - start)))